@@ -0,0 +1,94 @@
+# alert_rules.py
+"""
+Declarative alert rules evaluated over the whole fleet at once.
+
+A rule is a dict such as
+
+    {'name': 'compute-utilization-high', 'metric': 'utilization_pct', 'op': '>',
+     'threshold': 90, 'category': 'COMPUTE', 'severity': 'HIGH'}
+
+Resource fields are loaded into NumPy columns and each rule becomes one vectorized
+comparison over them. Alerts are identified by a fingerprint (rule name and resource id),
+which is how firing conditions are matched with open alerts.
+"""
+import re
+import numpy as np
+
+OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+METRICS = ['utilization_pct', 'current_utilization', 'total_capacity']
+
+
+def validate_rule(rule, alert_types, severity_levels):
+    """Return a normalized copy of rule, raising ValueError if it is malformed"""
+    try:
+        normalized = {
+            'name': str(rule['name']),
+            'metric': rule['metric'],
+            'op': rule['op'],
+            'threshold': float(rule['threshold']),
+            'category': rule.get('category'),
+            'severity': rule.get('severity', 'MEDIUM'),
+            'alert_type': rule.get('alert_type', 'CAPACITY'),
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid alert rule {rule!r}: {str(e)}")
+
+    if not normalized['name'] or ':' in normalized['name']:
+        raise ValueError("Alert rule name must be non-empty and must not contain ':'")
+    if normalized['metric'] not in METRICS:
+        raise ValueError(f"Alert rule metric must be one of {METRICS}")
+    if normalized['op'] not in OPERATORS:
+        raise ValueError(f"Alert rule op must be one of {list(OPERATORS)}")
+    if normalized['severity'] not in severity_levels:
+        raise ValueError(f"Severity must be one of {severity_levels}")
+    if normalized['alert_type'] not in alert_types:
+        raise ValueError(f"Alert type must be one of {alert_types}")
+    return normalized
+
+
+def fingerprint(rule_name, resource_id):
+    return f"rule:{rule_name}:{resource_id}"
+
+
+def fingerprint_query(rule_names):
+    """Fingerprint condition matching exactly the alerts of the named rules"""
+    return {'$in': [re.compile('^' + re.escape(f"rule:{name}:") + '[0-9a-f]{24}$') for name in rule_names]}
+
+
+def resource_columns(resources):
+    """NumPy columns for a list of resource documents"""
+    count = len(resources)
+    current = np.fromiter((resource.get('current_utilization') or 0 for resource in resources), np.float64, count)
+    capacity = np.fromiter((resource.get('total_capacity') or 0 for resource in resources), np.float64, count)
+    utilization_pct = np.zeros(count)
+    np.divide(current * 100, capacity, out=utilization_pct, where=capacity > 0)
+    columns = {
+        'utilization_pct': utilization_pct,
+        'current_utilization': current,
+        'total_capacity': capacity,
+    }
+    # Categories are compared as integer codes
+    categories, codes = np.unique(
+        np.array([resource.get('category') or '' for resource in resources], dtype=str),
+        return_inverse=True
+    )
+    columns['categories'] = {category: code for code, category in enumerate(categories)}
+    columns['category'] = codes
+    return columns
+
+
+def evaluate(rules, columns):
+    """Yield (rule, positions) for every rule, positions being the indexes of matching resources"""
+    for rule in rules:
+        mask = OPERATORS[rule['op']](columns[rule['metric']], rule['threshold'])
+        if rule['category']:
+            mask &= columns['category'] == columns['categories'].get(rule['category'], -1)
+        yield rule, np.flatnonzero(mask)
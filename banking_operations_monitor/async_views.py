@@ -0,0 +1,194 @@
+# async_views.py
+"""
+Async versions of the read-heavy endpoints, served on AsyncMongoClient.
+
+urls.py routes resource_detail, service_detail, pricing_list, alerts_list and
+health_check here instead of views.py when settings.ASYNC_API_VIEWS is on, which is
+meant for ASGI deployments: a request waiting on MongoDB then holds no worker thread,
+and the independent sub-queries of a request run concurrently. Responses match the
+sync views, rendered with MongoJSONRenderer.
+"""
+import functools
+import logging
+import pymongo
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotAllowed
+
+from .models import ResourceManager, ServiceManager, PricingManager, AlertManager
+from .database import get_async_db
+from .fieldsets import parse_fields, wants, sparse
+from .metrics import PrometheusMetrics
+from .renderers import MongoJSONRenderer
+from .views import serialize_document, page_params, next_page_link
+
+logger = logging.getLogger(__name__)
+
+renderer = MongoJSONRenderer()
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderer.render(data), content_type=renderer.media_type, status=status)
+
+
+def paginated_response(request, data, next_cursor):
+    """json_response for one page, linking to the next page (if any) in a Link header"""
+    response = json_response(data)
+    if next_cursor:
+        response['Link'] = next_page_link(request, request.GET, next_cursor)
+    return response
+
+
+def asgi_only(view):
+    """
+    Refuse to run outside an ASGI server. Under WSGI, Django runs each async view on its
+    own event loop, which would need a new AsyncMongoClient per request.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            raise ImproperlyConfigured("ASYNC_API_VIEWS requires an ASGI server, e.g. "
+                                       "uvicorn banking_operations_monitor.asgi:application")
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def get_only(view):
+    """Reject anything but GET/HEAD, like @api_view(['GET'])"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@asgi_only
+@get_only
+async def resource_detail(request, pk):
+    """
+    Get detailed information about a specific resource (fields=a,b for only those fields)
+    """
+    try:
+        fields = parse_fields(request.GET.get('fields', None))
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+
+    try:
+        # Resource, pricing and dependent services are queried concurrently
+        resource = await ResourceManager.afind_detail(pk, fields=fields)
+        if not resource:
+            return HttpResponse(status=404)
+
+        pricing = resource.pop('pricing', None)
+        pricing_data = serialize_document(pricing) if pricing else None
+        service_data = resource.pop('dependent_services', [])
+
+        data = serialize_document(resource)
+        if wants(fields, 'utilization_pct'):
+            data['utilization_pct'] = ResourceManager.utilization_percentage(resource)
+        data['pricing'] = pricing_data
+        data['dependent_services'] = service_data
+
+        return json_response(sparse(data, fields))
+    except Exception as e:
+        logger.error(f"Error retrieving resource details: {str(e)}")
+        return json_response({'error': str(e)}, status=500)
+
+
+@asgi_only
+@get_only
+async def service_detail(request, pk):
+    """
+    Get detailed information about a specific service (fields=a,b for only those fields)
+    """
+    try:
+        fields = parse_fields(request.GET.get('fields', None))
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+
+    try:
+        # Service, resource dependencies and active alerts are queried concurrently
+        service = await ServiceManager.afind_detail(pk, fields=fields)
+        if not service:
+            return HttpResponse(status=404)
+
+        resource_data = service.pop('resource_dependencies', [])
+        alert_data = [serialize_document(alert) for alert in service.pop('active_alerts', [])]
+
+        data = serialize_document(service)
+        data['resource_dependencies'] = resource_data
+        data['active_alerts'] = alert_data
+
+        return json_response(sparse(data, fields))
+    except Exception as e:
+        logger.error(f"Error retrieving service details: {str(e)}")
+        return json_response({'error': str(e)}, status=500)
+
+
+@asgi_only
+@get_only
+async def pricing_list(request):
+    """
+    List pricing information for all resources, one page at a time
+    """
+    try:
+        limit, cursor, fields = page_params(request.GET)
+        pricing_data, next_cursor = await PricingManager.afind_with_resources(
+            category=request.GET.get('category', None),
+            limit=limit,
+            cursor=cursor,
+            fields=fields
+        )
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+
+    data = [sparse(serialize_document(pricing), fields) for pricing in pricing_data]
+
+    return paginated_response(request, data, next_cursor)
+
+
+@asgi_only
+@get_only
+async def alerts_list(request):
+    """
+    List active (or, with resolved=true, resolved) alerts, newest first, one page at a time
+    """
+    severity = request.GET.get('severity', None)
+    resolved = request.GET.get('resolved', 'false').lower() == 'true'
+
+    try:
+        limit, cursor, fields = page_params(request.GET)
+        alerts, next_cursor = await AlertManager.afind_page(resolved=resolved, severity=severity, limit=limit,
+                                                            cursor=cursor, fields=fields)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+
+    # Resource and service names are looked up concurrently
+    if wants(fields, 'resource_name') or wants(fields, 'service_name'):
+        await AlertManager.aattach_names(alerts)
+
+    data = [sparse(serialize_document(alert), fields) for alert in alerts]
+
+    return paginated_response(request, data, next_cursor)
+
+
+@asgi_only
+async def health_check(request):
+    """
+    Health check endpoint that checks system health and updates Prometheus metrics
+    """
+    try:
+        with pymongo.timeout(getattr(settings, 'HEALTH_CHECK_TIMEOUT', 1)):
+            await get_async_db().client.admin.command('ping')
+
+        PrometheusMetrics.update_mongodb_status(status=True)
+        PrometheusMetrics.update_health_status(endpoint='health', status=True)
+
+        return HttpResponse("OK")
+    except Exception as e:
+        PrometheusMetrics.update_mongodb_status(status=False)
+        PrometheusMetrics.update_health_status(endpoint='health', status=False)
+
+        return HttpResponse(f"ERROR: {str(e)}", status=500)
@@ -0,0 +1,195 @@
+# cache.py
+"""
+In-process caches for documents the managers look up by _id or name.
+
+EntityCache is a per-worker LRU cache with a TTL. Writes made through the managers
+invalidate their own worker's entries; ChangeStreamInvalidator optionally follows the
+collections' change stream to invalidate entries written by other workers.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+import bson
+from django.conf import settings
+from .metrics import PrometheusMetrics
+
+logger = logging.getLogger(__name__)
+
+ENTITY_CACHE_SIZE = int(getattr(settings, 'ENTITY_CACHE_SIZE', 0))
+ENTITY_CACHE_TTL = float(getattr(settings, 'ENTITY_CACHE_TTL', 30))
+ENTITY_CACHE_CHANGE_STREAM = bool(getattr(settings, 'ENTITY_CACHE_CHANGE_STREAM', False))
+
+# Collection name -> EntityCaches holding its documents, cleared when publish_snapshot replaces it
+entity_caches = {}
+
+
+class EntityCache:
+    """
+    In-process LRU cache with a TTL for documents looked up by _id, and optionally by
+    aliases such as their name.
+    
+    Documents are kept BSON-encoded, so every hit decodes a fresh copy that callers are
+    free to mutate. Invalidating an _id also drops its aliases. A max_size or ttl of 0
+    disables the cache. name is the collection the documents come from; publishing a
+    snapshot of it clears the cache.
+    """
+    
+    def __init__(self, name, max_size=None, ttl=None):
+        self.name = name
+        self.max_size = ENTITY_CACHE_SIZE if max_size is None else max_size
+        self.ttl = ENTITY_CACHE_TTL if ttl is None else ttl
+        self.enabled = self.max_size > 0 and self.ttl > 0
+        # _id -> (expires_at, encoded document, aliases), least recently used first
+        self.entries = OrderedDict()
+        self.aliases = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.invalidator = None
+        entity_caches.setdefault(name, []).append(self)
+        PrometheusMetrics.register_entity_cache(self)
+    
+    def get(self, entity_id):
+        """Cached document for entity_id, or None"""
+        if not self.enabled:
+            return None
+        with self.lock:
+            raw = self._lookup(entity_id)
+        self._record(raw is not None)
+        return bson.decode(raw) if raw is not None else None
+    
+    def get_by_alias(self, alias):
+        """Cached document stored under alias, or None"""
+        if not self.enabled:
+            return None
+        with self.lock:
+            entity_id = self.aliases.get(alias)
+            raw = self._lookup(entity_id) if entity_id is not None else None
+        self._record(raw is not None)
+        return bson.decode(raw) if raw is not None else None
+    
+    def put(self, document, *aliases):
+        """Cache document under its _id and any aliases (None aliases are skipped)"""
+        if not self.enabled or document is None:
+            return
+        if self.invalidator is not None:
+            self.invalidator.start()
+        
+        raw = bson.encode(document)
+        aliases = tuple(alias for alias in aliases if alias is not None)
+        with self.lock:
+            self._remove(document['_id'])
+            self.entries[document['_id']] = (time.monotonic() + self.ttl, raw, aliases)
+            for alias in aliases:
+                self.aliases[alias] = document['_id']
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+    
+    def invalidate(self, *entity_ids, source='write'):
+        """Drop entity_ids, counting the invalidation by source (write or change_stream)"""
+        with self.lock:
+            for entity_id in entity_ids:
+                self._remove(entity_id)
+        PrometheusMetrics.track_entity_cache_invalidation(self.name, source, len(entity_ids))
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.aliases.clear()
+    
+    def size(self):
+        return len(self.entries)
+    
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def _lookup(self, entity_id):
+        # Called with the lock held
+        entry = self.entries.get(entity_id)
+        if entry is not None and entry[0] <= time.monotonic():
+            self._remove(entity_id)
+            entry = None
+        if entry is None:
+            return None
+        self.entries.move_to_end(entity_id)
+        return entry[1]
+    
+    def _record(self, hit):
+        # Each lookup is counted once, for hit_ratio and for Prometheus
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        PrometheusMetrics.track_entity_cache(self.name, hit=hit)
+    
+    def _remove(self, entity_id):
+        # Called with the lock held
+        entry = self.entries.pop(entity_id, None)
+        if entry is not None:
+            for alias in entry[2]:
+                if self.aliases.get(alias) == entity_id:
+                    del self.aliases[alias]
+
+
+class ChangeStreamInvalidator:
+    """
+    Cross-worker invalidation for EntityCaches: a background thread watches the change
+    stream of the cached collections and invalidates the documents other processes
+    write. Change streams need a replica set or sharded cluster.
+    
+    - caches: {collection name: EntityCache}
+    - database: callable returning the database to watch
+    """
+    
+    RETRY_INTERVAL = 5
+    
+    def __init__(self, caches, database, enabled=None):
+        self.caches = caches
+        self.database = database
+        self.enabled = ENTITY_CACHE_CHANGE_STREAM if enabled is None else enabled
+        self.thread = None
+        self.lock = threading.Lock()
+        for cache in caches.values():
+            cache.invalidator = self
+    
+    def start(self):
+        # Started on first use so forked worker processes each get their own thread
+        if not self.enabled or (self.thread is not None and self.thread.is_alive()):
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='entity-cache-invalidator', daemon=True)
+                self.thread.start()
+    
+    def clear(self):
+        for cache in self.caches.values():
+            cache.clear()
+    
+    def _run(self):
+        names = list(self.caches)
+        # A rename onto a cached collection (e.g. a published snapshot) is reported under
+        # the source collection, with the cached one in `to`
+        pipeline = [{'$match': {'$or': [{'ns.coll': {'$in': names}}, {'to.coll': {'$in': names}}]}}]
+        while True:
+            try:
+                with self.database().watch(pipeline) as stream:
+                    # Anything cached before the stream was open may have missed a change
+                    self.clear()
+                    for change in stream:
+                        cache = self.caches.get(change.get('ns', {}).get('coll'))
+                        if 'documentKey' in change:
+                            if cache is not None:
+                                cache.invalidate(change['documentKey']['_id'], source='change_stream')
+                        elif cache is None and change.get('to', {}).get('coll') in self.caches:
+                            # Another collection was renamed over this one
+                            self.caches[change['to']['coll']].clear()
+                        else:
+                            # drop, rename, invalidate: the whole collection changed
+                            self.clear()
+            except Exception as e:
+                logger.warning(f"Entity cache change stream failed, retrying: {str(e)}")
+                self.clear()
+                time.sleep(self.RETRY_INTERVAL)
@@ -1,6 +1,9 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient, monitoring
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+import asyncio
 import os
+from .metrics import PrometheusMetrics
 
 # Get MongoDB connection details from settings or environment variables
 MONGODB_HOST = getattr(settings, 'MONGODB_HOST', os.environ.get('MONGODB_HOST', 'localhost'))
@@ -9,22 +12,172 @@ MONGODB_USERNAME = getattr(settings, 'MONGODB_USERNAME', os.environ.get('MONGODB
 MONGODB_PASSWORD = getattr(settings, 'MONGODB_PASSWORD', os.environ.get('MONGODB_PASSWORD', ''))
 MONGODB_DATABASE = getattr(settings, 'MONGODB_DATABASE', os.environ.get('MONGODB_DATABASE', 'banking_ops'))
 
-# Establish MongoDB connection
-client = MongoClient(
-    host=MONGODB_HOST,
-    port=MONGODB_PORT,
-    username=MONGODB_USERNAME or None,
-    password=MONGODB_PASSWORD or None,
-    authSource='admin' if MONGODB_USERNAME else None
-)
+# Connection pool tuning, see settings.py
+MONGODB_POOL_OPTIONS = {
+    'maxPoolSize': getattr(settings, 'MONGODB_MAX_POOL_SIZE', 100),
+    'minPoolSize': getattr(settings, 'MONGODB_MIN_POOL_SIZE', 0),
+    'maxIdleTimeMS': getattr(settings, 'MONGODB_MAX_IDLE_TIME_MS', None),
+    'connectTimeoutMS': getattr(settings, 'MONGODB_CONNECT_TIMEOUT_MS', 20000),
+    'serverSelectionTimeoutMS': getattr(settings, 'MONGODB_SERVER_SELECTION_TIMEOUT_MS', 30000),
+    'socketTimeoutMS': getattr(settings, 'MONGODB_SOCKET_TIMEOUT_MS', None),
+    'waitQueueTimeoutMS': getattr(settings, 'MONGODB_WAIT_QUEUE_TIMEOUT_MS', None),
+    'compressors': getattr(settings, 'MONGODB_COMPRESSORS', '') or None,
+}
 
-# Get database
-db = client[MONGODB_DATABASE]
+
+class ConnectionPoolListenerBase(monitoring.ConnectionPoolListener):
+    """Connection pool listener that ignores every event a subclass does not override"""
+
+    def _ignore(self, event):
+        pass
+
+    pool_created = pool_ready = pool_cleared = pool_closed = _ignore
+    connection_created = connection_ready = connection_closed = _ignore
+    connection_check_out_started = connection_checked_out = _ignore
+    connection_check_out_failed = connection_checked_in = _ignore
+
+
+class PoolMetricsListener(ConnectionPoolListenerBase):
+    """Export connection pool checkout waits to Prometheus"""
+
+    def connection_check_out_started(self, event):
+        PrometheusMetrics.track_pool_checkout_started()
+
+    def connection_checked_out(self, event):
+        PrometheusMetrics.track_pool_checkout(event.duration)
+
+    def connection_check_out_failed(self, event):
+        PrometheusMetrics.track_pool_checkout(event.duration, failed_reason=event.reason)
+
+
+def create_client(client_class=MongoClient, **overrides):
+    """
+    Create a MongoClient (or AsyncMongoClient) from the connection and pool settings.
+
+    Keyword arguments override individual client options.
+    """
+    options = {
+        'host': MONGODB_HOST,
+        'port': MONGODB_PORT,
+        'username': MONGODB_USERNAME or None,
+        'password': MONGODB_PASSWORD or None,
+        'authSource': 'admin' if MONGODB_USERNAME else None,
+        'event_listeners': [PoolMetricsListener()],
+    }
+    options.update(MONGODB_POOL_OPTIONS)
+    options.update(overrides)
+    # Unset options fall back to the driver defaults
+    return client_class(**{key: value for key, value in options.items() if value is not None})
+
+
+# Establish the shared MongoDB connection pool; every module uses this client
+client = create_client()
+
+# The database every module works on. db and collection() resolve it on each use, so
+# bind_database can point the whole application at another database in one place.
+_default_database = client[MONGODB_DATABASE]
+_binding = {'database': _default_database, 'async_database': None}
+_bind_listeners = []
+
+
+class BoundDatabase:
+    """Stand-in for the bound pymongo Database, forwarding attribute and item access to it"""
+
+    def __getattr__(self, name):
+        return getattr(_binding['database'], name)
+
+    def __getitem__(self, name):
+        return _binding['database'][name]
+
+
+class BoundCollection:
+    """Stand-in for a collection of the bound database, forwarding attribute access to it"""
+
+    def __init__(self, name):
+        self.name = name
+        self._bound = (None, None)
+
+    def __getattr__(self, attr):
+        database, collection = self._bound
+        if database is not _binding['database']:
+            database = _binding['database']
+            collection = database[self.name]
+            self._bound = (database, collection)
+        return getattr(collection, attr)
+
+
+def collection(name):
+    """Collection of the bound database, for module-level collection handles"""
+    return BoundCollection(name)
+
+
+def bind_database(database, async_database=None):
+    """
+    Point db, every collection() handle and get_async_db at another database (e.g. a
+    scratch one) and return the previous binding, restored with bind_database(**previous).
+
+    Without async_database, get_async_db raises while another database is bound instead
+    of silently reaching the configured one.
+    """
+    previous = dict(_binding)
+    _binding.update(database=database, async_database=async_database)
+    for listener in _bind_listeners:
+        listener()
+    return previous
+
+
+def on_bind(listener):
+    """Call listener (no arguments) whenever bind_database changes the database, e.g. to drop caches"""
+    _bind_listeners.append(listener)
+    return listener
+
+
+db = BoundDatabase()
 
 # Define collections
-resources = db.resources
-services = db.services
-dependencies = db.dependencies
-pricing = db.pricing
-alerts = db.alerts
-usage_history = db.usage_history
\ No newline at end of file
+resources = collection('resources')
+services = collection('services')
+dependencies = collection('dependencies')
+pricing = collection('pricing')
+alerts = collection('alerts')
+usage_history = collection('usage_history')
+
+
+# AsyncMongoClient for the async views, bound to the event loop it was created on
+_async_client = None
+_async_client_loop = None
+# Close tasks of replaced clients, referenced until they finish
+_closing_clients = set()
+
+
+def get_async_db():
+    """
+    Database on the AsyncMongoClient for the running event loop.
+
+    Under an ASGI server there is one loop per process, so this is a second shared pool
+    next to client. The client is created on first use because it must be created
+    inside the loop it will run on. A client left behind on another loop is closed when
+    it is replaced; async_views refuses to run outside ASGI, where that would happen on
+    every request.
+    """
+    global _async_client, _async_client_loop
+    if _binding['database'] is not _default_database:
+        if _binding['async_database'] is None:
+            raise ImproperlyConfigured("bind_database was given no async database for the async code paths")
+        return _binding['async_database']
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        if _async_client is not None:
+            # The previous loop is gone (e.g. asyncio.run in a script or test); release its pool
+            task = loop.create_task(_async_client.close())
+            _closing_clients.add(task)
+            task.add_done_callback(_closing_clients.discard)
+        _async_client = create_client(AsyncMongoClient)
+        _async_client_loop = loop
+    return _async_client[MONGODB_DATABASE]
+
+
+async def aggregate_list(collection, pipeline):
+    """Run an aggregation on an async collection and return all result documents"""
+    cursor = await collection.aggregate(pipeline)
+    return await cursor.to_list()
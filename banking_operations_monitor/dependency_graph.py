@@ -0,0 +1,279 @@
+# dependency_graph.py
+"""
+Dependency graph engine for expanding service demand into base resources.
+
+A node depends on other nodes with a quantity per unit; nodes without dependencies
+are base resources. The graph is built once, checked for cycles and topologically
+sorted, and each node's base-resource vector (base resources needed for one unit of
+that node) is memoized, so expanding demand is a single pass over the edges.
+"""
+from collections import defaultdict
+
+
+class DependencyCycleError(ValueError):
+    """Raised when the dependency graph contains a cycle"""
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        super().__init__(f"Dependency cycle detected: {' -> '.join(str(node) for node in cycle)}")
+
+
+class DependencyGraph:
+    def __init__(self):
+        # node -> {child: quantity per unit of node}
+        self.children = {}
+        # node -> set of nodes that depend on it
+        self.parents = defaultdict(set)
+        self._order = None
+        self._vectors = None
+
+    def set_dependencies(self, node, dependencies):
+        """Replace the dependencies of a node with an iterable of (child, quantity) pairs"""
+        for child in self.children.get(node, {}):
+            self.parents[child].discard(node)
+
+        edges = defaultdict(float)
+        for child, quantity in dependencies:
+            edges[child] += float(quantity)
+            self.parents[child].add(node)
+
+        self.children[node] = dict(edges)
+        self._invalidate()
+
+    def set_edge(self, parent, child, quantity):
+        """Add or change a single parent -> child dependency, rejecting edges that would close a cycle"""
+        if parent == child:
+            raise DependencyCycleError([parent, child])
+        if parent in self.descendants(child):
+            raise DependencyCycleError([parent] + self._path(child, parent))
+        self.children.setdefault(parent, {})[child] = float(quantity)
+        self.parents[child].add(parent)
+        self._invalidate()
+
+    def remove_edge(self, parent, child):
+        """Remove a parent -> child dependency, returning its quantity (0 if it did not exist)"""
+        quantity = self.children.get(parent, {}).pop(child, 0.0)
+        self.parents[child].discard(parent)
+        self._invalidate()
+        return quantity
+
+    def _invalidate(self):
+        self._order = None
+        self._vectors = None
+
+    @property
+    def nodes(self):
+        """All nodes that appear in the graph"""
+        nodes = set(self.children)
+        for edges in self.children.values():
+            nodes.update(edges)
+        return nodes
+
+    @property
+    def edge_count(self):
+        return sum(len(edges) for edges in self.children.values())
+
+    def is_base(self, node):
+        """A node is a base resource when it has no dependency entry of its own"""
+        return node not in self.children
+
+    def descendants(self, node):
+        """Set of node and every node it depends on, directly or indirectly"""
+        seen = {node}
+        stack = [node]
+        while stack:
+            for child in self.children.get(stack.pop(), {}):
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return seen
+
+    def _path(self, start, end):
+        """Dependency path from start to end, assuming end is a descendant of start"""
+        previous = {start: None}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            if node == end:
+                break
+            for child in self.children.get(node, {}):
+                if child not in previous:
+                    previous[child] = node
+                    stack.append(child)
+        path = [end]
+        while previous[path[-1]] is not None:
+            path.append(previous[path[-1]])
+        path.reverse()
+        return path
+
+    def ordered_descendants(self, node):
+        """node and its descendants in topological order, visiting only that sub-graph"""
+        nodes = self.descendants(node)
+        in_degree = {member: 0 for member in nodes}
+        for member in nodes:
+            for child in self.children.get(member, {}):
+                in_degree[child] += 1
+
+        ready = [node]
+        order = []
+        while ready:
+            member = ready.pop()
+            order.append(member)
+            for child in self.children.get(member, {}):
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    ready.append(child)
+        return order
+
+    def topological_order(self):
+        """Return nodes ordered so every node comes before its dependencies"""
+        if self._order is not None:
+            return self._order
+
+        nodes = self.nodes
+        in_degree = {node: 0 for node in nodes}
+        for edges in self.children.values():
+            for child in edges:
+                in_degree[child] += 1
+
+        ready = [node for node, degree in in_degree.items() if degree == 0]
+        order = []
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for child in self.children.get(node, {}):
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    ready.append(child)
+
+        if len(order) < len(nodes):
+            remaining = {node for node, degree in in_degree.items() if degree > 0}
+            raise DependencyCycleError(self._find_cycle(remaining))
+
+        self._order = order
+        return order
+
+    def _find_cycle(self, remaining):
+        """Walk parent links inside the unsorted remainder until a node repeats"""
+        node = next(iter(remaining))
+        path = []
+        seen = {}
+        while node not in seen:
+            seen[node] = len(path)
+            path.append(node)
+            node = next(parent for parent in self.parents[node] if parent in remaining)
+        cycle = path[seen[node]:] + [node]
+        cycle.reverse()
+        return cycle
+
+    def base_vectors(self):
+        """Memoized map of node -> {base resource: quantity per unit of node}"""
+        if self._vectors is not None:
+            return self._vectors
+
+        vectors = {}
+        # Dependencies come after their dependents, so walk the order backwards
+        for node in reversed(self.topological_order()):
+            if self.is_base(node):
+                vectors[node] = {node: 1.0}
+                continue
+            vector = defaultdict(float)
+            for child, quantity in self.children[node].items():
+                for base, per_unit in vectors[child].items():
+                    vector[base] += quantity * per_unit
+            vectors[node] = dict(vector)
+
+        self._vectors = vectors
+        return vectors
+
+    def base_vector(self, node):
+        """Base resources needed for one unit of node"""
+        return self.base_vectors().get(node, {node: 1.0})
+
+    def expand(self, demand):
+        """Expand {node: quantity} demand into total {base resource: quantity} requirements"""
+        totals = defaultdict(float)
+        for node, quantity in demand.items():
+            for base, per_unit in self.base_vector(node).items():
+                totals[base] += quantity * per_unit
+        return dict(totals)
+
+
+class RequirementsEngine:
+    """
+    Total requirements for a top-level demand over a DependencyGraph, kept up to date
+    incrementally.
+
+    flow[node] is the total quantity of node needed to satisfy the demand; the flow of a
+    base resource is its total requirement. A changed edge or demand only pushes the
+    delta through the descendants of the node it touches, so the cost depends on the
+    affected sub-graph rather than on the whole graph. Each update returns the changed
+    rows as {base resource: new total}, with None for nodes that stopped being bases.
+    """
+
+    def __init__(self, graph, demand=None):
+        self.graph = graph
+        self.demand = dict(demand or {})
+        self.flow = {}
+        self.recompute()
+
+    def recompute(self):
+        """Full pass over the graph in topological order"""
+        flow = defaultdict(float)
+        for node, quantity in self.demand.items():
+            flow[node] += quantity
+        for node in self.graph.topological_order():
+            if node not in flow:
+                continue
+            for child, quantity in self.graph.children.get(node, {}).items():
+                flow[child] += flow[node] * quantity
+        self.flow = dict(flow)
+        return self.totals()
+
+    def totals(self):
+        """Current {base resource: total requirement}"""
+        return {node: units for node, units in self.flow.items() if self.graph.is_base(node)}
+
+    def set_edge(self, parent, child, quantity):
+        """Add or change a dependency and return the changed requirement rows"""
+        was_base = self.graph.is_base(parent)
+        previous = self.graph.children.get(parent, {}).get(child, 0.0)
+        self.graph.set_edge(parent, child, quantity)
+
+        changes = {}
+        if was_base and parent in self.flow:
+            changes[parent] = None
+        if parent in self.flow:
+            changes.update(self._propagate(child, self.flow[parent] * (float(quantity) - previous)))
+        return changes
+
+    def remove_edge(self, parent, child):
+        """Remove a dependency and return the changed requirement rows"""
+        quantity = self.graph.remove_edge(parent, child)
+        if parent not in self.flow or not quantity:
+            return {}
+        return self._propagate(child, -self.flow[parent] * quantity)
+
+    def set_demand(self, node, quantity):
+        """Change the top-level demand for a node and return the changed requirement rows"""
+        delta = float(quantity) - self.demand.get(node, 0.0)
+        self.demand[node] = float(quantity)
+        return self._propagate(node, delta)
+
+    def _propagate(self, start, delta):
+        pending = {start: delta}
+        changes = {}
+        for node in self.graph.ordered_descendants(start):
+            if node not in pending:
+                continue
+            node_delta = pending.pop(node)
+            # Already-reached nodes with no delta leave their descendants unchanged
+            if node_delta == 0 and node in self.flow:
+                continue
+            self.flow[node] = self.flow.get(node, 0.0) + node_delta
+            if self.graph.is_base(node):
+                changes[node] = self.flow[node]
+                continue
+            for child, quantity in self.graph.children[node].items():
+                pending[child] = pending.get(child, 0.0) + node_delta * quantity
+        return changes
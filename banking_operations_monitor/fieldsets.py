@@ -0,0 +1,54 @@
+# fieldsets.py
+"""
+Sparse fieldsets for the fields= query parameter of list and detail endpoints.
+
+A request names the output fields it wants, e.g. fields=name,utilization_pct. Stored
+fields become a MongoDB projection in the manager query. Derived fields (computed in
+the worker or joined by $lookup) map to the stored fields they are computed from and
+are only computed or joined when requested. 'id' is always returned.
+"""
+
+
+def parse_fields(value):
+    """Requested field names from a comma-separated fields= value, or None (all fields) when absent"""
+    if value is None:
+        return None
+    fields = {field.strip() for field in value.split(',') if field.strip()}
+    if not fields:
+        raise ValueError('fields must name at least one field')
+    for field in fields:
+        if field.startswith('$') or '.' in field:
+            raise ValueError(f"Invalid field name: {field}")
+    # id is the serialized _id, which is always returned
+    fields.discard('id')
+    return fields
+
+
+def wants(fields, field):
+    """Whether field is requested (every field is when fields is None)"""
+    return fields is None or field in fields
+
+
+def projection(fields, derived=None, required=()):
+    """
+    MongoDB projection for the requested fields, or None to fetch whole documents.
+
+    - fields: requested field names, as returned by parse_fields
+    - derived: maps derived field names to the stored fields they are computed from
+    - required: stored fields the query itself needs (sort keys, join keys)
+    """
+    if fields is None:
+        return None
+    derived = derived or {}
+    stored = set(required)
+    for field in fields:
+        stored.update(derived.get(field, (field,)))
+    # _id alone when only id or joined fields were requested
+    return {field: 1 for field in sorted(stored)} or {'_id': 1}
+
+
+def sparse(data, fields):
+    """Serialized document without the fields that were fetched but not requested"""
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key == 'id' or key in fields}
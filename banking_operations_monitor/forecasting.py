@@ -0,0 +1,83 @@
+# forecasting.py
+"""
+Vectorized capacity-exhaustion forecasting.
+
+Usage history for the whole fleet is passed as flat arrays of (series index, time,
+value) points. Every series gets a least-squares linear trend from segmented sums
+(np.bincount), so the fit is a handful of array passes whatever the number of resources.
+"""
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+
+
+def fit_trends(index, times, values, count):
+    """
+    Least-squares line per series.
+
+    - index: series index of each point (0 <= index < count)
+    - times: point times in days, relative to a common origin
+    - values: point values
+    - count: number of series
+
+    Returns (points, slope, intercept) arrays of length count; slope and intercept are
+    NaN for series with fewer than two distinct times.
+    """
+    index = np.asarray(index, dtype=np.intp)
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+
+    points = np.bincount(index, minlength=count).astype(np.float64)
+    sum_t = np.bincount(index, weights=times, minlength=count)
+    sum_y = np.bincount(index, weights=values, minlength=count)
+    sum_tt = np.bincount(index, weights=times * times, minlength=count)
+    sum_ty = np.bincount(index, weights=times * values, minlength=count)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = points * sum_tt - sum_t * sum_t
+        slope = (points * sum_ty - sum_t * sum_y) / denominator
+        intercept = (sum_y - slope * sum_t) / points
+    undetermined = (points < 2) | (np.abs(denominator) <= 1e-12 * np.maximum(points * sum_tt, 1.0))
+    slope[undetermined] = np.nan
+    intercept[undetermined] = np.nan
+    return points, slope, intercept
+
+
+def days_to_exhaustion(level, slope, capacity):
+    """
+    Days until a trend starting at level (at time 0) and growing by slope per day reaches
+    capacity: 0 when already at or above capacity, inf when not growing or undetermined.
+    """
+    level = np.asarray(level, dtype=np.float64)
+    slope = np.asarray(slope, dtype=np.float64)
+    capacity = np.asarray(capacity, dtype=np.float64)
+
+    days = np.full(level.shape, np.inf)
+    growing = np.isfinite(level) & (slope > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days[growing] = (capacity[growing] - level[growing]) / slope[growing]
+    days[np.isfinite(level) & (level >= capacity)] = 0.0
+    return np.maximum(days, 0.0)
+
+
+def forecast_exhaustion(index, timestamps, values, capacities, now):
+    """
+    Fit every series and project when it reaches its capacity.
+
+    - index, values: as for fit_trends
+    - timestamps: point times as Unix seconds
+    - capacities: capacity per series
+    - now: Unix seconds the forecast is made from
+
+    Returns a dict of per-series arrays: points, slope (per day), level (trend value at
+    now) and days (days from now until capacity is reached).
+    """
+    capacities = np.asarray(capacities, dtype=np.float64)
+    times = (np.asarray(timestamps, dtype=np.float64) - now) / SECONDS_PER_DAY
+    points, slope, intercept = fit_trends(index, times, values, len(capacities))
+    return {
+        'points': points,
+        'slope': slope,
+        'level': intercept,
+        'days': days_to_exhaustion(intercept, slope, capacities)
+    }
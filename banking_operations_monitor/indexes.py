@@ -0,0 +1,141 @@
+# indexes.py
+"""
+Index catalog: every index the managers in models.py and the pipelines in services.py
+rely on, keyed by collection. apply_index_catalog creates them idempotently; the
+ensure_indexes management command applies the catalog and audit_query_plans checks that
+manager queries are served by it.
+"""
+import logging
+from django.conf import settings
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Days of raw usage history kept in the usage_history time-series collection
+USAGE_HISTORY_RETENTION_DAYS = getattr(settings, 'USAGE_HISTORY_RETENTION_DAYS', 90)
+
+INDEX_CATALOG = {
+    'resources': [
+        # find_by_name, bulk_import upserts, name lookups
+        IndexModel([('name', ASCENDING)], unique=True),
+        # find_page(category=...) in _id order
+        IndexModel([('category', ASCENDING), ('_id', ASCENDING)]),
+    ],
+    'services': [
+        IndexModel([('name', ASCENDING)], unique=True),
+        # find_page(criticality=..., status=...) in _id order
+        IndexModel([('criticality', ASCENDING), ('_id', ASCENDING)]),
+        IndexModel([('status', ASCENDING), ('_id', ASCENDING)]),
+    ],
+    'dependencies': [
+        # find_by_service and the service_detail join
+        IndexModel([('service_id', ASCENDING), ('resource_id', ASCENDING)], unique=True),
+        # find_by_resource, the resource_detail join and cascade deletes
+        IndexModel([('resource_id', ASCENDING)]),
+    ],
+    'pricing': [
+        # find_by_resource, update/delete and the resource_detail join
+        IndexModel([('resource_id', ASCENDING)]),
+    ],
+    'usage_history': [
+        # find_by_resource, newest first
+        IndexModel([('resource_id', ASCENDING), ('timestamp', DESCENDING)]),
+        # delete_old_entries
+        IndexModel([('timestamp', ASCENDING)]),
+    ],
+    'usage_rollups': [
+        # series() and rollup upserts
+        IndexModel([('resource_id', ASCENDING), ('granularity', ASCENDING), ('bucket', ASCENDING)], unique=True),
+        # Fleet-wide reads for capacity forecasting
+        IndexModel([('granularity', ASCENDING), ('bucket', ASCENDING)]),
+        IndexModel([('expires_at', ASCENDING)], expireAfterSeconds=0),
+    ],
+    'alerts': [
+        # find_page in LIST_ORDER (newest first, then _id), with and without filters
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('is_resolved', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('is_resolved', ASCENDING), ('severity', ASCENDING), ('created_at', DESCENDING),
+                    ('_id', DESCENDING)]),
+        IndexModel([('alert_type', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)]),
+        # find_by_resource / find_by_service and the service_detail join
+        IndexModel([('resource_id', ASCENDING), ('created_at', DESCENDING)]),
+        IndexModel([('service_id', ASCENDING), ('created_at', DESCENDING)]),
+        # At most one open alert per fingerprint
+        IndexModel(
+            [('fingerprint', ASCENDING)],
+            unique=True,
+            partialFilterExpression={'is_resolved': False, 'fingerprint': {'$exists': True}}
+        ),
+    ],
+    'resource_utilization': [
+        IndexModel([('Resource', ASCENDING)], unique=True),
+    ],
+    'resource_dependencies': [
+        IndexModel([('Resource', ASCENDING)], unique=True),
+    ],
+    # Model behind the incremental requirement updates
+    'requirement_edges': [
+        IndexModel([('parent', ASCENDING), ('child', ASCENDING)], unique=True),
+    ],
+    'requirement_nodes': [
+        IndexModel([('name', ASCENDING)], unique=True),
+    ],
+    'resource_pricing': [
+        IndexModel([('Item Name', ASCENDING)], unique=True),
+    ],
+    'resource_report_ledger': [
+        IndexModel([('path', ASCENDING)], unique=True),
+    ],
+    'pricing_cache': [
+        IndexModel([('datacenter', ASCENDING), ('resource_id', ASCENDING)], unique=True),
+    ],
+}
+
+
+def ensure_usage_history_collection(database):
+    """Create usage_history as a time-series collection keyed by resource, if it does not exist"""
+    if 'usage_history' in database.list_collection_names():
+        return
+    try:
+        database.create_collection(
+            'usage_history',
+            timeseries={'timeField': 'timestamp', 'metaField': 'resource_id', 'granularity': 'minutes'},
+            expireAfterSeconds=USAGE_HISTORY_RETENTION_DAYS * 86400
+        )
+    except CollectionInvalid:
+        # Created concurrently by another process
+        pass
+    except OperationFailure as e:
+        logger.warning(f"usage_history created as a regular collection: {str(e)}")
+
+
+def apply_index_catalog(database, catalog=None):
+    """
+    Create every catalog index that does not exist yet.
+
+    Existing indexes with the same name are left alone. An index that cannot be built,
+    e.g. a unique index over duplicate data or a name clash with different options, is
+    logged and reported rather than raised.
+
+    Returns a dict of 'created', 'existing' and 'failed' lists of (collection, index name),
+    with the error message as a third element for failures.
+    """
+    ensure_usage_history_collection(database)
+
+    result = {'created': [], 'existing': [], 'failed': []}
+    for collection_name, indexes in (catalog or INDEX_CATALOG).items():
+        collection = database[collection_name]
+        existing = set(collection.index_information())
+        for index in indexes:
+            name = index.document['name']
+            if name in existing:
+                result['existing'].append((collection_name, name))
+                continue
+            try:
+                collection.create_indexes([index])
+                result['created'].append((collection_name, name))
+            except OperationFailure as e:
+                logger.error(f"Could not create index {name} on {collection_name}: {str(e)}")
+                result['failed'].append((collection_name, name, str(e)))
+    return result
@@ -0,0 +1,181 @@
+# ingest.py
+"""
+Usage telemetry ingest: parsing batches of samples posted to the ingest endpoint and
+buffering them in-process so they are written to MongoDB in large batches.
+"""
+import csv
+import json
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from bson import ObjectId
+from django.conf import settings
+from .metrics import PrometheusMetrics
+
+logger = logging.getLogger(__name__)
+
+# Buffered samples are flushed when this many are waiting or the oldest has waited this many seconds
+USAGE_INGEST_FLUSH_SIZE = int(getattr(settings, 'USAGE_INGEST_FLUSH_SIZE', 5000))
+USAGE_INGEST_FLUSH_INTERVAL = float(getattr(settings, 'USAGE_INGEST_FLUSH_INTERVAL', 1.0))
+USAGE_INGEST_MAX_ATTEMPTS = int(getattr(settings, 'USAGE_INGEST_MAX_ATTEMPTS', 5))
+
+
+def parse_usage_timestamp(value):
+    """Naive UTC datetime from an ISO 8601 string or epoch seconds; None means now"""
+    if value is None or value == '':
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+    try:
+        timestamp = datetime.fromisoformat(value) if isinstance(value, str) else None
+    except ValueError:
+        timestamp = None
+    if timestamp is None:
+        return datetime.fromtimestamp(float(value), timezone.utc).replace(tzinfo=None)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def parse_usage_samples(body, content_type):
+    """
+    Parse a batch of usage samples.
+    
+    - body: request body as bytes
+    - content_type: 'text/csv' for resource_id,utilization,timestamp rows (header optional),
+      anything else is read as NDJSON objects with the same keys
+    
+    Returns (samples, rejected) where samples are (resource_id, utilization, timestamp) tuples
+    and rejected counts malformed rows, including non-finite (inf/nan) utilizations.
+    """
+    text = body.decode('utf-8') if isinstance(body, bytes) else body
+    is_csv = 'csv' in (content_type or '')
+    rows = csv.reader(text.splitlines()) if is_csv else text.splitlines()
+    
+    samples = []
+    rejected = 0
+    for row in rows:
+        try:
+            if not is_csv:
+                if not row.strip():
+                    continue
+                row = json.loads(row)
+            if isinstance(row, dict):
+                resource_id, utilization, timestamp = row['resource_id'], row['utilization'], row.get('timestamp')
+            else:
+                if not row or row[0] == 'resource_id':
+                    continue
+                resource_id, utilization = row[0], row[1]
+                timestamp = row[2] if len(row) > 2 else None
+            resource_id, utilization = ObjectId(resource_id), float(utilization)
+            if not math.isfinite(utilization):
+                raise ValueError(f"utilization must be a finite number, got {utilization}")
+            timestamp = parse_usage_timestamp(timestamp)
+        except Exception:
+            rejected += 1
+            continue
+        samples.append((resource_id, utilization, timestamp))
+    return samples, rejected
+
+
+class UsageIngestBuffer:
+    """
+    In-process buffer for usage samples.
+    
+    Samples are handed to writer (a callable taking a list of samples) in batches, either
+    by the request that fills the buffer to flush_size or by a background thread once
+    the oldest sample has waited flush_interval seconds.
+    
+    A batch whose write fails goes back into the buffer and is retried with exponential
+    backoff, up to max_attempts writes, before it is dropped. Delivery is at least once:
+    a write that failed part-way may be repeated.
+    """
+    
+    def __init__(self, writer, flush_size=None, flush_interval=None, max_attempts=None):
+        self.writer = writer
+        self.flush_size = flush_size or USAGE_INGEST_FLUSH_SIZE
+        self.flush_interval = flush_interval or USAGE_INGEST_FLUSH_INTERVAL
+        self.max_attempts = max_attempts or USAGE_INGEST_MAX_ATTEMPTS
+        self.samples = []
+        self.oldest = None
+        self.attempts = 0
+        self.retry_at = 0.0
+        self.last_lag = 0.0
+        self.lock = threading.Lock()
+        self.flusher = None
+    
+    def add(self, samples):
+        """Buffer samples, flushing in the caller's thread once the buffer is full"""
+        if not samples:
+            return
+        self._start_flusher()
+        with self.lock:
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            self.samples.extend(samples)
+            full = len(self.samples) >= self.flush_size and time.monotonic() >= self.retry_at
+        if full:
+            self.flush()
+    
+    def lag(self):
+        """Seconds the oldest buffered sample has been waiting, or the lag of the last flush"""
+        with self.lock:
+            if self.oldest is None:
+                return self.last_lag
+            return time.monotonic() - self.oldest
+    
+    def pending(self):
+        with self.lock:
+            return len(self.samples)
+    
+    def flush(self):
+        """Write everything buffered; returns the number of samples written"""
+        with self.lock:
+            samples, self.samples = self.samples, []
+            oldest, self.oldest = self.oldest, None
+            attempts, self.attempts = self.attempts + 1, 0
+        if not samples:
+            return 0
+        
+        start_time = time.monotonic()
+        try:
+            self.writer(samples)
+        except Exception as e:
+            duration = time.monotonic() - start_time
+            if attempts >= self.max_attempts:
+                logger.error(f"Dropped {len(samples)} usage samples after {attempts} failed writes: {str(e)}")
+                PrometheusMetrics.track_usage_flush(duration, len(samples), 0, failed=True, dropped=True)
+                return 0
+            
+            logger.warning(f"Failed to write {len(samples)} usage samples (attempt {attempts}), retrying: {str(e)}")
+            PrometheusMetrics.track_usage_flush(duration, len(samples), 0, failed=True)
+            with self.lock:
+                # Back in front of anything buffered meanwhile, which shares the retries
+                self.samples[:0] = samples
+                self.oldest = oldest if self.oldest is None else min(oldest, self.oldest)
+                self.attempts = attempts
+                self.retry_at = time.monotonic() + self.flush_interval * 2 ** attempts
+            return 0
+        
+        now = time.monotonic()
+        self.last_lag = now - oldest
+        PrometheusMetrics.track_usage_flush(now - start_time, len(samples), self.last_lag)
+        return len(samples)
+    
+    def _start_flusher(self):
+        # Started on first use so forked worker processes each get their own thread
+        if self.flusher is not None and self.flusher.is_alive():
+            return
+        with self.lock:
+            if self.flusher is None or not self.flusher.is_alive():
+                self.flusher = threading.Thread(target=self._run, name='usage-ingest-flusher', daemon=True)
+                self.flusher.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval / 4)
+            with self.lock:
+                now = time.monotonic()
+                due = self.oldest is not None and now - self.oldest >= self.flush_interval and now >= self.retry_at
+            if due:
+                self.flush()
@@ -0,0 +1,274 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from django.core.management.base import BaseCommand, CommandError
+from pymongo import MongoClient, monitoring
+from banking_operations_monitor import models
+from banking_operations_monitor.database import bind_database
+from banking_operations_monitor.indexes import apply_index_catalog
+from banking_operations_monitor.models import (
+    ResourceManager,
+    ServiceManager,
+    DependencyManager,
+    PricingManager,
+    UsageHistoryManager,
+    AlertManager
+)
+
+# Plan stages that mean a query is not served by an index
+FORBIDDEN_STAGES = {'COLLSCAN': 'collection scan', 'SORT': 'in-memory sort'}
+
+
+class QueryRecorder(monitoring.CommandListener):
+    """Collects read commands sent while recording is on"""
+
+    AUDITED_COMMANDS = {'find', 'aggregate', 'count', 'distinct'}
+
+    def __init__(self):
+        self.recording = False
+        self.commands = []
+
+    def started(self, event):
+        if self.recording and event.command_name in self.AUDITED_COMMANDS:
+            self.commands.append(dict(event.command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def explainable(command):
+    """Drop the session and driver fields that cannot be sent inside explain"""
+    return {key: value for key, value in command.items() if not key.startswith('$') and key != 'lsid'}
+
+
+def plan_violations(explain):
+    """Forbidden stages in the winning plans of an explain result, plus in-memory $sort stages"""
+    violations = []
+
+    def walk(node, in_winning_plan):
+        if isinstance(node, dict):
+            if in_winning_plan and node.get('stage') in FORBIDDEN_STAGES:
+                violations.append(FORBIDDEN_STAGES[node['stage']])
+            for key, value in node.items():
+                if key == 'rejectedPlans':
+                    continue
+                walk(value, in_winning_plan or key == 'winningPlan')
+        elif isinstance(node, list):
+            for value in node:
+                walk(value, in_winning_plan)
+
+    walk(explain, False)
+    # A $sort left in the aggregation pipeline was not absorbed into an index scan
+    for stage in explain.get('stages', []):
+        if '$sort' in stage:
+            violations.append('in-memory sort')
+    return violations
+
+
+def join_queries(database, command):
+    """
+    The query each $lookup of an aggregate command runs on the joined collection, recursively.
+
+    Explaining the outer pipeline does not show how a joined collection is read, so each
+    join is rewritten as the aggregation it runs per input document: an equality match on
+    foreignField (with a value present in the joined collection) followed by the lookup's
+    own sub-pipeline.
+    """
+    joins = []
+    for stage in command.get('pipeline', []):
+        lookup = stage.get('$lookup')
+        if lookup is None:
+            continue
+        pipeline = list(lookup.get('pipeline', []))
+        if 'foreignField' in lookup:
+            field = lookup['foreignField']
+            sample = database[lookup['from']].find_one({field: {'$exists': True}}, {field: 1}) or {}
+            pipeline.insert(0, {'$match': {field: sample.get(field)}})
+        joined = {'aggregate': lookup['from'], 'pipeline': pipeline, 'cursor': {}}
+        joins.append(joined)
+        joins.extend(join_queries(database, joined))
+    return joins
+
+
+def seed(database, count=200):
+    """Insert a small, varied data set and return ids to query with"""
+    now = datetime.now()
+    categories = ResourceManager.CATEGORY_CHOICES
+    resources = [
+        {
+            '_id': ObjectId(),
+            'name': f'audit-resource-{i}',
+            'category': categories[i % len(categories)],
+            'current_utilization': float(i % 100),
+            'total_capacity': 100.0,
+            'created_at': now,
+            'last_updated': now
+        }
+        for i in range(count)
+    ]
+    services = [
+        {
+            '_id': ObjectId(),
+            'name': f'audit-service-{i}',
+            'status': ServiceManager.STATUS_CHOICES[i % len(ServiceManager.STATUS_CHOICES)],
+            'criticality': ServiceManager.CRITICALITY_CHOICES[i % len(ServiceManager.CRITICALITY_CHOICES)],
+            'created_at': now,
+            'updated_at': now
+        }
+        for i in range(count // 4)
+    ]
+    database.resources.insert_many(resources)
+    database.services.insert_many(services)
+    database.dependencies.insert_many([
+        {
+            'service_id': service['_id'],
+            'resource_id': resources[(i * 7 + j) % count]['_id'],
+            'quantity_required': 1.0,
+            'is_critical': j == 0
+        }
+        for i, service in enumerate(services) for j in range(4)
+    ])
+    database.pricing.insert_many([
+        {'resource_id': resource['_id'], 'negotiated_price': 10.0, 'last_price_update': now}
+        for resource in resources
+    ])
+    database.alerts.insert_many([
+        {
+            'title': f'audit-alert-{i}',
+            'alert_type': AlertManager.ALERT_TYPES[i % len(AlertManager.ALERT_TYPES)],
+            'severity': AlertManager.SEVERITY_LEVELS[i % len(AlertManager.SEVERITY_LEVELS)],
+            'resource_id': resources[i % count]['_id'],
+            'service_id': services[i % len(services)]['_id'],
+            'created_at': now - timedelta(minutes=i),
+            'is_resolved': i % 3 == 0,
+            'resolved_at': None
+        }
+        for i in range(count * 2)
+    ])
+    UsageHistoryManager.create_many([
+        (resources[i % 10]['_id'], float(i % 100), now - timedelta(minutes=i))
+        for i in range(count * 5)
+    ], update_resources=False)
+    return {'resource': resources[0], 'service': services[0]}
+
+
+def audited_calls(seeded):
+    """(label, call) for every manager read that should be index-backed.
+
+    Fleet-wide reads (forecasting, alert rule evaluation, CSV imports) read whole
+    collections on purpose and are not audited.
+    """
+    resource = seeded['resource']
+    service = seeded['service']
+    now = datetime.now()
+
+    def second_page(find_page, **filters):
+        # Fetching page one records its query too; both must be index-backed
+        return lambda: find_page(limit=10, cursor=find_page(limit=10, **filters)[1], **filters)
+
+    return [
+        ('ResourceManager.find_by_id', lambda: ResourceManager.find_by_id(resource['_id'])),
+        ('ResourceManager.find_by_name', lambda: ResourceManager.find_by_name(resource['name'])),
+        ('ResourceManager.find_detail', lambda: ResourceManager.find_detail(resource['_id'])),
+        ('ResourceManager.find_all', lambda: ResourceManager.find_all()),
+        ('ResourceManager.find_all(category)', lambda: ResourceManager.find_all(category='COMPUTE')),
+        ('ResourceManager.find_page(cursor)', second_page(ResourceManager.find_page)),
+        ('ResourceManager.find_page(category, cursor)', second_page(ResourceManager.find_page, category='COMPUTE')),
+        ('ServiceManager.find_by_id', lambda: ServiceManager.find_by_id(service['_id'])),
+        ('ServiceManager.find_by_name', lambda: ServiceManager.find_by_name(service['name'])),
+        ('ServiceManager.find_detail', lambda: ServiceManager.find_detail(service['_id'])),
+        ('ServiceManager.find_all', lambda: ServiceManager.find_all()),
+        ('ServiceManager.find_all(criticality)', lambda: ServiceManager.find_all(criticality='HIGH')),
+        ('ServiceManager.find_all(status)', lambda: ServiceManager.find_all(status='DEGRADED')),
+        ('ServiceManager.find_page(criticality, cursor)', second_page(ServiceManager.find_page, criticality='HIGH')),
+        ('DependencyManager.find_by_service', lambda: DependencyManager.find_by_service(service['_id'])),
+        ('DependencyManager.find_by_resource', lambda: DependencyManager.find_by_resource(resource['_id'])),
+        ('PricingManager.find_by_resource', lambda: PricingManager.find_by_resource(resource['_id'])),
+        ('PricingManager.find_all', lambda: PricingManager.find_all()),
+        ('PricingManager.find_with_resources', lambda: PricingManager.find_with_resources()),
+        ('PricingManager.find_with_resources(category)',
+         lambda: PricingManager.find_with_resources(category='COMPUTE')),
+        ('PricingManager.find_with_resources(cursor)', second_page(PricingManager.find_with_resources)),
+        ('UsageHistoryManager.find_by_resource', lambda: UsageHistoryManager.find_by_resource(
+            resource['_id'], start_time=now - timedelta(days=1))),
+        ('UsageHistoryManager.series', lambda: UsageHistoryManager.series(
+            resource['_id'], now - timedelta(hours=6), now)),
+        ('AlertManager.find_by_id', lambda: AlertManager.find_by_id(ObjectId())),
+        ('AlertManager.find_all', lambda: AlertManager.find_all()),
+        ('AlertManager.find_all(resolved)', lambda: AlertManager.find_all(resolved=False)),
+        ('AlertManager.find_all(resolved, severity)',
+         lambda: AlertManager.find_all(resolved=False, severity='HIGH')),
+        ('AlertManager.find_all(alert_type)', lambda: AlertManager.find_all(alert_type='CAPACITY')),
+        ('AlertManager.find_page(resolved, cursor)', second_page(AlertManager.find_page, resolved=False)),
+        ('AlertManager.find_page(resolved, severity, cursor)',
+         second_page(AlertManager.find_page, resolved=False, severity='HIGH')),
+        ('AlertManager.find_by_resource', lambda: AlertManager.find_by_resource(resource['_id'], resolved=False)),
+        ('AlertManager.find_by_service', lambda: AlertManager.find_by_service(service['_id'])),
+        ('AlertManager.attach_names', lambda: AlertManager.attach_names(
+            [{'resource_id': resource['_id'], 'service_id': service['_id']}])),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Seed a scratch database on a local mongod, run every manager query against it and '
+            'fail if any query plan uses a collection scan or an in-memory sort')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uri', default='mongodb://localhost:27017',
+                            help='MongoDB to audit against; its scratch database is dropped')
+        parser.add_argument('--database', default='banking_ops_query_audit',
+                            help='Scratch database name')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch database afterwards')
+
+    def handle(self, *args, **options):
+        recorder = QueryRecorder()
+        client = MongoClient(options['uri'], event_listeners=[recorder], serverSelectionTimeoutMS=5000)
+        database = client[options['database']]
+        client.drop_database(database.name)
+
+        failures = []
+
+        def audit(label, command):
+            explain = database.command({'explain': explainable(command), 'verbosity': 'queryPlanner'})
+            violations = plan_violations(explain)
+            collection = next(iter(command.values()))
+            if violations:
+                failures.append(f"{label} on {collection}: {', '.join(sorted(set(violations)))}")
+                self.stdout.write(self.style.ERROR(f"FAIL {label} on {collection}: {', '.join(violations)}"))
+            else:
+                self.stdout.write(f"ok   {label} on {collection}")
+
+        # Rebinds every module's collections (and drops the entity caches) for the audit
+        previous = bind_database(database)
+        try:
+            result = apply_index_catalog(database)
+            for collection, name, error in result['failed']:
+                failures.append(f"index {collection}.{name}: {error}")
+            seeded = seed(database)
+
+            for label, call in audited_calls(seeded):
+                # A cache hit would send no query to audit
+                models.resource_cache.clear()
+                models.service_cache.clear()
+                recorder.commands = []
+                recorder.recording = True
+                try:
+                    call()
+                finally:
+                    recorder.recording = False
+
+                for command in recorder.commands:
+                    audit(label, command)
+                    for joined in join_queries(database, command):
+                        audit(f"{label} join", joined)
+        finally:
+            bind_database(**previous)
+            if not options['keep']:
+                client.drop_database(database.name)
+            client.close()
+
+        if failures:
+            raise CommandError(f"{len(failures)} queries are not index-backed:\n" + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All audited queries are index-backed'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from banking_operations_monitor.database import db
+from banking_operations_monitor.indexes import apply_index_catalog
+
+
+class Command(BaseCommand):
+    help = 'Create any missing indexes from the index catalog (safe to run repeatedly)'
+
+    def handle(self, *args, **options):
+        result = apply_index_catalog(db)
+
+        for collection, name in result['created']:
+            self.stdout.write(f"created  {collection}.{name}")
+        self.stdout.write(f"{len(result['created'])} created, {len(result['existing'])} already present")
+
+        if result['failed']:
+            for collection, name, error in result['failed']:
+                self.stderr.write(f"failed   {collection}.{name}: {error}")
+            raise CommandError(f"{len(result['failed'])} indexes could not be created")
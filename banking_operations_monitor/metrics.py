@@ -1,6 +1,171 @@
 # metrics.py
-from prometheus_client import Counter, Gauge, Histogram, Summary, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, Histogram, Summary, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from django.conf import settings
 from django.http import HttpResponse
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def metric_label(name):
+    """Label value used for resource and item names"""
+    return str(name or '').replace(' ', '_').lower()
+
+
+def metric_value(value):
+    """Numeric sample value, or None for missing, zero or non-numeric values"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not value or math.isnan(value):
+        return None
+    return value
+
+
+class BusinessMetricsCollector:
+    """
+    Serves bank_resource_utilization, bank_resource_price and bank_resource_monthly_usage
+    from an in-memory snapshot.
+
+    The pipelines push changes into the snapshot as they publish, so a scrape only reads
+    memory. The snapshot is also reloaded through the loader, which returns (utilization
+    records, pricing records), once it is older than `refresh_interval` seconds, so
+    processes that did not run a pipeline catch up. Scrapes refresh in the background
+    and never wait on MongoDB; if the loader fails the last snapshot keeps being served.
+    """
+
+    def __init__(self, loader=None, refresh_interval=None):
+        self.loader = loader
+        if refresh_interval is None:
+            refresh_interval = getattr(settings, 'BUSINESS_METRICS_REFRESH_INTERVAL', 60)
+        self.refresh_interval = refresh_interval
+        self.loaded = False
+        self.loaded_at = None
+        self.utilization = {}
+        self.pricing = {}
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reload the snapshot through the loader, keeping the current one if that fails"""
+        try:
+            utilization, pricing = self.loader()
+            utilization = {record.get('Resource', ''): record.get('Utilization', 0) for record in utilization}
+            pricing = {record.get('Item Name', ''): self._pricing_sample(record) for record in pricing}
+        except Exception as e:
+            logger.warning(f"Business metrics snapshot not refreshed: {str(e)}")
+            return False
+        with self._lock:
+            self.utilization = utilization
+            self.pricing = pricing
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+        return True
+
+    def _refresh_if_stale(self, block=False):
+        if self.loader is None:
+            return
+        with self._lock:
+            fresh = self.loaded_at is not None and time.monotonic() - self.loaded_at < self.refresh_interval
+            if fresh or self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        if block:
+            run()
+        else:
+            threading.Thread(target=run, daemon=True).start()
+
+    @staticmethod
+    def _pricing_sample(record):
+        return (record.get('Category', ''), metric_value(record.get('negotiated_price')),
+                metric_value(record.get('monthly_usage')))
+
+    def set_utilization(self, records):
+        """Replace utilization with [{'Resource', 'Utilization'}] records"""
+        utilization = {record['Resource']: record['Utilization'] for record in records}
+        with self._lock:
+            self.utilization = utilization
+
+    def add_utilization(self, deltas):
+        """Apply {resource: delta} changes; ignored until the snapshot is loaded"""
+        with self._lock:
+            if not self.loaded:
+                return
+            for resource, delta in deltas.items():
+                self.utilization[resource] = self.utilization.get(resource, 0) + delta
+
+    def update_pricing(self, record):
+        """Insert or replace one resource_pricing record"""
+        with self._lock:
+            self.pricing[record.get('Item Name', '')] = self._pricing_sample(record)
+
+    def retain_pricing(self, item_names):
+        """Drop pricing for items not in item_names"""
+        item_names = set(item_names)
+        with self._lock:
+            self.pricing = {name: sample for name, sample in self.pricing.items() if name in item_names}
+
+    def samples(self, block=False):
+        """Current (metric name, labels, value) samples; block waits for a due refresh"""
+        self._refresh_if_stale(block)
+        with self._lock:
+            utilization = list(self.utilization.items())
+            pricing = list(self.pricing.items())
+
+        samples = [
+            ('bank_resource_utilization', {'resource': metric_label(resource)}, value)
+            for resource, value in utilization
+        ]
+        for name, (category, price, monthly_usage) in pricing:
+            labels = {'item': metric_label(name), 'category': category}
+            if price is not None:
+                samples.append(('bank_resource_price', labels, price))
+            if monthly_usage is not None:
+                samples.append(('bank_resource_monthly_usage', labels, monthly_usage))
+        return samples
+
+    def lines(self):
+        """Sample lines in Prometheus text exposition format, with label values escaped"""
+        text = generate_latest(_FamilyRegistry(self.collect(block=True))).decode('utf-8')
+        return [line for line in text.splitlines() if not line.startswith('#')]
+
+    def describe(self):
+        # Describing without samples keeps registration from triggering the loader
+        return [
+            GaugeMetricFamily('bank_resource_utilization', 'Consolidated resource utilization', labels=['resource']),
+            GaugeMetricFamily('bank_resource_price', 'Negotiated resource price', labels=['item', 'category']),
+            GaugeMetricFamily('bank_resource_monthly_usage', 'Monthly resource usage', labels=['item', 'category']),
+        ]
+
+    def collect(self, block=False):
+        families = {family.name: family for family in self.describe()}
+        for metric, labels, value in self.samples(block):
+            families[metric].add_metric(list(labels.values()), value)
+        return list(families.values())
+
+
+class _FamilyRegistry:
+    """Stand-in registry so generate_latest can render a given list of metric families"""
+
+    def __init__(self, families):
+        self.families = families
+
+    def collect(self):
+        return self.families
+
 
 class PrometheusMetrics:
     # Request count metric
@@ -14,7 +179,8 @@ class PrometheusMetrics:
     REQUEST_LATENCY = Histogram(
         'http_request_latency_seconds',
         'HTTP request latency in seconds',
-        ['method', 'endpoint']
+        ['method', 'endpoint'],
+        buckets=getattr(settings, 'PROMETHEUS_LATENCY_BUCKETS', None) or Histogram.DEFAULT_BUCKETS
     )
     
     # Exception count metric
@@ -45,17 +211,123 @@ class PrometheusMetrics:
         ['service']
     )
     
+    # Vendor pricing cache lookups
+    PRICING_CACHE_REQUESTS = Counter(
+        'app_pricing_cache_requests_total',
+        'Vendor pricing cache lookups by result (hit, miss, stale)',
+        ['result']
+    )
+    
+    # Collection snapshot publishing
+    SNAPSHOT_PUBLISH_LATENCY = Histogram(
+        'app_snapshot_publish_seconds',
+        'Time to write, index and swap in a collection snapshot',
+        ['collection']
+    )
+    
+    SNAPSHOT_DOCUMENTS = Gauge(
+        'app_snapshot_documents',
+        'Documents in the last published snapshot',
+        ['collection']
+    )
+    
+    SNAPSHOT_LAST_PUBLISHED = Gauge(
+        'app_snapshot_last_published_timestamp_seconds',
+        'Unix time of the last published snapshot',
+        ['collection']
+    )
+    
+    # MongoDB connection pool
+    MONGODB_POOL_CHECKOUT = Histogram(
+        'app_mongodb_pool_checkout_seconds',
+        'Time spent waiting to check a connection out of the MongoDB pool',
+        [],
+        buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+    )
+    
+    MONGODB_POOL_CHECKOUT_FAILURES = Counter(
+        'app_mongodb_pool_checkout_failures_total',
+        'Failed MongoDB pool checkouts by reason',
+        ['reason']
+    )
+    
+    MONGODB_POOL_CHECKOUTS_WAITING = Gauge(
+        'app_mongodb_pool_checkouts_waiting',
+        'MongoDB pool checkouts started and not yet completed or failed',
+        []
+    )
+    
+    # Usage telemetry ingest
+    USAGE_INGEST_SAMPLES = Counter(
+        'app_usage_ingest_samples_total',
+        'Usage samples by ingest result (accepted, rejected, written, failed, dropped)',
+        ['result']
+    )
+    
+    USAGE_INGEST_FLUSH_LATENCY = Histogram(
+        'app_usage_ingest_flush_seconds',
+        'Time to write a batch of buffered usage samples',
+        []
+    )
+    
+    USAGE_INGEST_LAG = Gauge(
+        'app_usage_ingest_lag_seconds',
+        'Time the oldest sample in the last flushed batch spent buffered',
+        []
+    )
+    
+    # In-process entity caches in front of the managers' find_by_id/find_by_name
+    ENTITY_CACHE_REQUESTS = Counter(
+        'app_entity_cache_requests_total',
+        'Entity cache lookups by result (hit, miss)',
+        ['cache', 'result']
+    )
+    
+    ENTITY_CACHE_INVALIDATIONS = Counter(
+        'app_entity_cache_invalidations_total',
+        'Entity cache invalidations by source (write, change_stream)',
+        ['cache', 'source']
+    )
+    
+    ENTITY_CACHE_SIZE = Gauge(
+        'app_entity_cache_entries',
+        'Documents held in the entity cache',
+        ['cache']
+    )
+    
+    ENTITY_CACHE_HIT_RATIO = Gauge(
+        'app_entity_cache_hit_ratio',
+        'Entity cache hits over lookups since the process started',
+        ['cache']
+    )
+    _entity_cache_counters = {}
+    
+    # Business metrics served from the pipelines' in-memory snapshot
+    BUSINESS_METRICS = BusinessMetricsCollector()
+    REGISTRY.register(BUSINESS_METRICS)
+    
     # Initialize default values
     HEALTH_CHECK.labels(endpoint='health').set(1)
     MONGODB_CONNECTION.set(1)
     
+    @staticmethod
+    def endpoint_label(request):
+        """
+        Endpoint label for a request: the URL route name rather than the raw path,
+        so detail URLs share one series. Unresolved requests share 'unmatched'.
+        """
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unmatched'
+        return match.view_name or match.route or 'unmatched'
+    
     @classmethod
     def track_request_metrics(cls, request, response=None, exception=None):
         """
         Track metrics for HTTP requests
         """
         method = request.method
-        path = request.path
+        path = cls.endpoint_label(request)
         
         if exception:
             # Track exception
@@ -94,6 +366,87 @@ class PrometheusMetrics:
         """
         cls.SERVICE_DEPENDENCY.labels(service=service).set(1 if status else 0)
     
+    @classmethod
+    def track_pricing_cache(cls, result):
+        """
+        Count a vendor pricing cache lookup (hit, miss or stale)
+        """
+        cls.PRICING_CACHE_REQUESTS.labels(result=result).inc()
+    
+    @classmethod
+    def track_snapshot_publish(cls, collection, duration, documents):
+        """
+        Record the duration and size of a collection snapshot publish
+        """
+        cls.SNAPSHOT_PUBLISH_LATENCY.labels(collection=collection).observe(duration)
+        cls.SNAPSHOT_DOCUMENTS.labels(collection=collection).set(documents)
+        cls.SNAPSHOT_LAST_PUBLISHED.labels(collection=collection).set_to_current_time()
+    
+    @classmethod
+    def track_pool_checkout_started(cls):
+        """
+        Count a MongoDB pool checkout as waiting until track_pool_checkout records it
+        """
+        cls.MONGODB_POOL_CHECKOUTS_WAITING.inc()
+    
+    @classmethod
+    def track_pool_checkout(cls, duration, failed_reason=None):
+        """
+        Record the wait for a MongoDB pool checkout, counting failures by reason
+        """
+        cls.MONGODB_POOL_CHECKOUTS_WAITING.dec()
+        cls.MONGODB_POOL_CHECKOUT.observe(duration)
+        if failed_reason is not None:
+            cls.MONGODB_POOL_CHECKOUT_FAILURES.labels(reason=failed_reason).inc()
+    
+    @classmethod
+    def track_usage_ingest(cls, accepted, rejected):
+        """
+        Count usage samples accepted into the ingest buffer and rejected while parsing
+        """
+        cls.USAGE_INGEST_SAMPLES.labels(result='accepted').inc(accepted)
+        cls.USAGE_INGEST_SAMPLES.labels(result='rejected').inc(rejected)
+    
+    @classmethod
+    def track_usage_flush(cls, duration, samples, lag, failed=False, dropped=False):
+        """
+        Record a usage ingest buffer flush (a failed one is retried unless dropped)
+        """
+        cls.USAGE_INGEST_FLUSH_LATENCY.observe(duration)
+        cls.USAGE_INGEST_SAMPLES.labels(result='failed' if failed else 'written').inc(samples)
+        if dropped:
+            cls.USAGE_INGEST_SAMPLES.labels(result='dropped').inc(samples)
+        if not failed:
+            cls.USAGE_INGEST_LAG.set(lag)
+    
+    @classmethod
+    def register_entity_cache(cls, cache):
+        """
+        Export an entity cache's size and hit ratio, read from the cache at scrape time
+        """
+        cls.ENTITY_CACHE_SIZE.labels(cache=cache.name).set_function(cache.size)
+        cls.ENTITY_CACHE_HIT_RATIO.labels(cache=cache.name).set_function(cache.hit_ratio)
+    
+    @classmethod
+    def track_entity_cache(cls, cache, hit):
+        """
+        Count an entity cache lookup
+        """
+        # Labelled children are resolved once, labels() costs more than the cache hit itself
+        key = (cache, hit)
+        counter = cls._entity_cache_counters.get(key)
+        if counter is None:
+            counter = cls._entity_cache_counters[key] = cls.ENTITY_CACHE_REQUESTS.labels(
+                cache=cache, result='hit' if hit else 'miss')
+        counter.inc()
+    
+    @classmethod
+    def track_entity_cache_invalidation(cls, cache, source, count=1):
+        """
+        Count entity cache invalidations (write or change_stream)
+        """
+        cls.ENTITY_CACHE_INVALIDATIONS.labels(cache=cache, source=source).inc(count)
+    
     @classmethod
     def metrics_view(cls, request):
         """
@@ -1,33 +1,60 @@
 # middleware.py
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from .metrics import PrometheusMetrics
 import time
 
 class PrometheusMiddleware:
+    # Runs natively in both stacks, so async views under ASGI are not bounced through a thread
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        # Paths that are not instrumented, e.g. /metrics/ and /health/
+        self.skip_paths = frozenset(getattr(settings, 'PROMETHEUS_SKIP_PATHS', ()))
+        self.is_async = iscoroutinefunction(self.get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        if request.path in self.skip_paths:
+            return self.get_response(request)
+
         # Start timing the request
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         # Process the request
         response = self.get_response(request)
 
+        self.record(request, response, start_time)
+        return response
+
+    async def __acall__(self, request):
+        if request.path in self.skip_paths:
+            return await self.get_response(request)
+
+        start_time = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, start_time)
+        return response
+
+    def record(self, request, response, start_time):
         # Track request metrics
         PrometheusMetrics.track_request_metrics(request, response)
 
-        # Record request latency
-        method = request.method
-        path = request.path
-        latency = time.time() - start_time
+        # Record request latency, labelled by route rather than raw path
+        latency = time.perf_counter() - start_time
         PrometheusMetrics.REQUEST_LATENCY.labels(
-            method=method, 
-            endpoint=path
+            method=request.method,
+            endpoint=PrometheusMetrics.endpoint_label(request)
         ).observe(latency)
 
-        return response
-
     def process_exception(self, request, exception):
         # Track metrics for exceptions
-        PrometheusMetrics.track_request_metrics(request, exception=exception)
-        return None
\ No newline at end of file
+        if request.path not in self.skip_paths:
+            PrometheusMetrics.track_request_metrics(request, exception=exception)
+        return None
@@ -1,40 +1,47 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
-from pymongo import MongoClient, ASCENDING
+from pymongo import ASCENDING, DESCENDING, InsertOne, UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError
+from django.conf import settings
 import os
+import re
+import math
+import asyncio
+import logging
+import numpy as np
+import pandas as pd
 from decimal import Decimal
+from .forecasting import forecast_exhaustion
+from . import alert_rules
+from . import pagination
+from . import fieldsets
+from .services import update_dependency_requirements, mark_requirements_stale, RequirementsStaleError
+from .ingest import UsageIngestBuffer
+from .cache import EntityCache, ChangeStreamInvalidator
+from .database import db, collection, on_bind, get_async_db, aggregate_list
 
-# MongoDB connection settings
-MONGODB_HOST = os.environ.get('MONGODB_HOST', 'mongodb')
-MONGODB_PORT = int(os.environ.get('MONGODB_PORT', 27017))
-MONGODB_DATABASE = os.environ.get('MONGODB_DATABASE', 'banking_operations_monitor')
-MONGODB_USERNAME = os.environ.get('MONGODB_USERNAME', '')
-MONGODB_PASSWORD = os.environ.get('MONGODB_PASSWORD', '')
-
-# Establish MongoDB connection
-client = MongoClient(
-    host=MONGODB_HOST,
-    port=MONGODB_PORT,
-    username=MONGODB_USERNAME or None,
-    password=MONGODB_PASSWORD or None,
-    authSource='admin' if MONGODB_USERNAME else None
-)
-
-# Get database
-db = client[MONGODB_DATABASE]
+logger = logging.getLogger(__name__)
 
 # Define collections
-resources_collection = db.resources
-services_collection = db.services
-dependencies_collection = db.dependencies
-pricing_collection = db.pricing
-usage_history_collection = db.usage_history
-alerts_collection = db.alerts
+resources_collection = collection('resources')
+services_collection = collection('services')
+dependencies_collection = collection('dependencies')
+pricing_collection = collection('pricing')
+usage_history_collection = collection('usage_history')
+usage_rollups_collection = collection('usage_rollups')
+alerts_collection = collection('alerts')
 
-# Create indexes
-resources_collection.create_index([("name", ASCENDING)], unique=True)
-services_collection.create_index([("name", ASCENDING)], unique=True)
-dependencies_collection.create_index([("service_id", ASCENDING), ("resource_id", ASCENDING)], unique=True)
+# Read-through caches for find_by_id/find_by_name, invalidated by the managers' writes and,
+# with ENTITY_CACHE_CHANGE_STREAM, by other workers' writes
+resource_cache = EntityCache('resources')
+service_cache = EntityCache('services')
+cache_invalidator = ChangeStreamInvalidator(
+    {resources_collection.name: resource_cache, services_collection.name: service_cache},
+    lambda: db
+)
+# Entries read from another database must not be served once the binding changes
+on_bind(resource_cache.clear)
+on_bind(service_cache.clear)
 
 # Resource Management
 class ResourceManager:
@@ -42,6 +49,22 @@ class ResourceManager:
         'COMPUTE', 'STORAGE', 'NETWORK', 'LICENSE', 'SERVICE', 'OTHER'
     ]
     
+    # Bulk import batch size for bulk_write
+    IMPORT_BATCH_SIZE = 1000
+    
+    # Capacity forecasting defaults, see settings.py
+    FORECAST_HORIZON_DAYS = getattr(settings, 'CAPACITY_FORECAST_HORIZON_DAYS', 30)
+    FORECAST_LOOKBACK_DAYS = getattr(settings, 'CAPACITY_FORECAST_LOOKBACK_DAYS', 14)
+    FORECAST_GRANULARITY = getattr(settings, 'CAPACITY_FORECAST_GRANULARITY', 'day')
+    FORECAST_MIN_POINTS = 3
+    
+    # Fields computed by the API or joined in find_detail, with the stored fields they need
+    DERIVED_FIELDS = {
+        'utilization_pct': ('current_utilization', 'total_capacity'),
+        'pricing': (),
+        'dependent_services': ()
+    }
+    
     @staticmethod
     def create(name, category, resource_id=None, location=None, 
               current_utilization=0, total_capacity=0, unit='count'):
@@ -63,24 +86,129 @@ class ResourceManager:
     
     @staticmethod
     def find_by_id(resource_id):
-        """Find resource by ID"""
+        """Find resource by ID, through the resource cache"""
         if not isinstance(resource_id, ObjectId):
             try:
                 resource_id = ObjectId(resource_id)
             except:
                 return None
-        return resources_collection.find_one({'_id': resource_id})
+        
+        resource = resource_cache.get(resource_id)
+        if resource is None:
+            resource = resources_collection.find_one({'_id': resource_id})
+            resource_cache.put(resource, resource and resource.get('name'))
+        return resource
     
     @staticmethod
     def find_by_name(name):
-        """Find resource by name"""
-        return resources_collection.find_one({'name': name})
+        """Find resource by name, through the resource cache"""
+        resource = resource_cache.get_by_alias(name)
+        if resource is None or resource.get('name') != name:
+            resource = resources_collection.find_one({'name': name})
+            resource_cache.put(resource, name)
+        return resource
+    
+    @staticmethod
+    def find_detail(resource_id, fields=None):
+        """
+        Find resource by ID with its pricing and dependent services joined server-side;
+        with fields, only those fields are fetched and only requested joins are run
+        """
+        if not isinstance(resource_id, ObjectId):
+            try:
+                resource_id = ObjectId(resource_id)
+            except:
+                return None
+        
+        pipeline = [{'$match': {'_id': resource_id}}]
+        projection = fieldsets.projection(fields, ResourceManager.DERIVED_FIELDS)
+        if projection:
+            pipeline.append({'$project': projection})
+        
+        if fieldsets.wants(fields, 'pricing'):
+            pipeline.extend([
+                {'$lookup': {
+                    'from': pricing_collection.name,
+                    'localField': '_id',
+                    'foreignField': 'resource_id',
+                    'as': 'pricing'
+                }},
+                {'$set': {'pricing': {'$first': '$pricing'}}}
+            ])
+        
+        if fieldsets.wants(fields, 'dependent_services'):
+            pipeline.append({'$lookup': {
+                'from': dependencies_collection.name,
+                'localField': '_id',
+                'foreignField': 'resource_id',
+                'pipeline': ResourceManager.dependent_services_pipeline(),
+                'as': 'dependent_services'
+            }})
+        
+        return next(resources_collection.aggregate(pipeline), None)
+    
+    @staticmethod
+    def dependent_services_pipeline():
+        """Stages turning a resource's dependency documents into dependent service summaries"""
+        return [
+            {'$lookup': {
+                'from': services_collection.name,
+                'localField': 'service_id',
+                'foreignField': '_id',
+                'as': 'service'
+            }},
+            {'$unwind': '$service'},
+            {'$replaceWith': {
+                'service_id': {'$toString': '$service._id'},
+                'service_name': '$service.name',
+                'quantity_required': '$quantity_required',
+                'is_critical': '$is_critical',
+                'service_criticality': {'$ifNull': ['$service.criticality', 'MEDIUM']}
+            }}
+        ]
+    
+    @staticmethod
+    async def afind_detail(resource_id, fields=None):
+        """find_detail on the async driver, querying the resource, its pricing and dependent services concurrently"""
+        if not isinstance(resource_id, ObjectId):
+            try:
+                resource_id = ObjectId(resource_id)
+            except:
+                return None
+        
+        adb = get_async_db()
+        joins = {}
+        if fieldsets.wants(fields, 'pricing'):
+            joins['pricing'] = adb.pricing.find_one({'resource_id': resource_id})
+        if fieldsets.wants(fields, 'dependent_services'):
+            joins['dependent_services'] = aggregate_list(
+                adb.dependencies,
+                [{'$match': {'resource_id': resource_id}}] + ResourceManager.dependent_services_pipeline()
+            )
+        
+        projection = fieldsets.projection(fields, ResourceManager.DERIVED_FIELDS)
+        resource, *joined = await asyncio.gather(
+            adb.resources.find_one({'_id': resource_id}, projection),
+            *joins.values()
+        )
+        if resource is not None:
+            resource.update(zip(joins, joined))
+        return resource
     
     @staticmethod
     def find_all(category=None, limit=100, skip=0):
-        """Find all resources, optionally filtered by category"""
+        """Find the first limit resources, optionally filtered by category (skip is deprecated, use find_page)"""
+        if skip:
+            query = {'category': category} if category else {}
+            return pagination.find_skip(resources_collection, query, pagination.ID_ORDER, limit, skip)
+        return ResourceManager.find_page(category=category, limit=limit)[0]
+    
+    @staticmethod
+    def find_page(category=None, limit=100, cursor=None, fields=None):
+        """One page of resources in _id order after cursor, as (resources, next_cursor)"""
         query = {'category': category} if category else {}
-        return list(resources_collection.find(query).skip(skip).limit(limit))
+        projection = fieldsets.projection(fields, ResourceManager.DERIVED_FIELDS)
+        return pagination.find_page(resources_collection, query, pagination.ID_ORDER, limit, cursor, projection)
     
     @staticmethod
     def update(resource_id, **kwargs):
@@ -99,10 +227,12 @@ class ResourceManager:
             if key in kwargs:
                 kwargs[key] = float(kwargs[key])
         
-        return resources_collection.update_one(
+        result = resources_collection.update_one(
             {'_id': resource_id},
             {'$set': kwargs}
         )
+        resource_cache.invalidate(resource_id)
+        return result
     
     @staticmethod
     def delete(resource_id):
@@ -114,12 +244,108 @@ class ResourceManager:
                 return None
         
         # Delete related data
+        edges = [(dep['service_id'], resource_id, None)
+                 for dep in dependencies_collection.find({'resource_id': resource_id}, {'service_id': 1})]
         dependencies_collection.delete_many({'resource_id': resource_id})
+        DependencyManager.sync_requirements_many(edges)
         pricing_collection.delete_many({'resource_id': resource_id})
         usage_history_collection.delete_many({'resource_id': resource_id})
         alerts_collection.delete_many({'resource_id': resource_id})
         
-        return resources_collection.delete_one({'_id': resource_id})
+        result = resources_collection.delete_one({'_id': resource_id})
+        resource_cache.invalidate(resource_id)
+        return result
+    
+    @staticmethod
+    def _coerce_import_frame(df):
+        """Validate and coerce an import DataFrame column-wise, returning (records, rejected_count)"""
+        names = df['Resource'].astype('string').str.strip()
+        valid = names.notna() & (names != '')
+        
+        if 'Category' in df.columns:
+            categories = df['Category'].fillna('OTHER').astype(str).str.strip()
+        else:
+            categories = pd.Series('OTHER', index=df.index)
+        valid &= categories.isin(ResourceManager.CATEGORY_CHOICES)
+        
+        frame = pd.DataFrame({'name': names, 'category': categories}, index=df.index)
+        
+        if 'Resource_ID' in df.columns:
+            frame['resource_id'] = df['Resource_ID'].astype(object).where(df['Resource_ID'].notna(), None)
+        else:
+            frame['resource_id'] = None
+        
+        # Blank numeric cells default to 0, non-numeric values reject the row
+        for column, field in [('Utilization', 'current_utilization'), ('Capacity', 'total_capacity')]:
+            if column in df.columns:
+                values = pd.to_numeric(df[column], errors='coerce')
+                valid &= values.notna() | df[column].isna()
+                frame[field] = values.fillna(0).astype(float)
+            else:
+                frame[field] = 0.0
+        
+        if 'Unit' in df.columns:
+            frame['unit'] = df['Unit'].fillna('count').astype(str)
+        else:
+            frame['unit'] = 'count'
+        
+        rejected = int((~valid).sum())
+        
+        # Later rows win when a name appears more than once
+        frame = frame[valid].drop_duplicates(subset='name', keep='last')
+        frame['name'] = frame['name'].astype(object)
+        
+        return frame.to_dict('records'), rejected
+    
+    @staticmethod
+    def bulk_import(df, batch_size=None):
+        """Upsert resources from a DataFrame with unordered bulk_write batches keyed on name"""
+        if 'Resource' not in df.columns:
+            raise ValueError("Import file must contain a 'Resource' column")
+        
+        batch_size = batch_size or ResourceManager.IMPORT_BATCH_SIZE
+        summary = {'created': 0, 'updated': 0, 'rejected': 0, 'batches': []}
+        
+        for batch_number, start in enumerate(range(0, len(df), batch_size), start=1):
+            records, rejected = ResourceManager._coerce_import_frame(df.iloc[start:start + batch_size])
+            created = updated = 0
+            
+            if records:
+                now = datetime.now()
+                operations = [
+                    UpdateOne(
+                        {'name': record['name']},
+                        {
+                            '$set': dict(record, last_updated=now),
+                            '$setOnInsert': {'location': None}
+                        },
+                        upsert=True
+                    )
+                    for record in records
+                ]
+                
+                try:
+                    result = resources_collection.bulk_write(operations, ordered=False)
+                    created = result.upserted_count
+                    updated = result.matched_count
+                except BulkWriteError as e:
+                    created = e.details.get('nUpserted', 0)
+                    updated = e.details.get('nMatched', 0)
+                    rejected += len(e.details.get('writeErrors', []))
+            
+            summary['batches'].append({
+                'batch': batch_number,
+                'created': created,
+                'updated': updated,
+                'rejected': rejected
+            })
+            summary['created'] += created
+            summary['updated'] += updated
+            summary['rejected'] += rejected
+        
+        # Upserts are by name, so any cached resource may have changed
+        resource_cache.clear()
+        return summary
     
     @staticmethod
     def utilization_percentage(resource):
@@ -127,6 +353,66 @@ class ResourceManager:
         if resource.get('total_capacity', 0) > 0:
             return (resource.get('current_utilization', 0) / resource['total_capacity']) * 100
         return 0
+    
+    @staticmethod
+    def forecast_exhaustion(horizon_days=None, lookback_days=None, granularity=None):
+        """
+        Resources whose utilization trend reaches total_capacity within horizon_days.
+        
+        Usage rollups from the last lookback_days are loaded for every resource with a
+        capacity and fitted in one vectorized pass. Returns forecasts sorted by days to
+        exhaustion, soonest first.
+        """
+        horizon_days = ResourceManager.FORECAST_HORIZON_DAYS if horizon_days is None else horizon_days
+        lookback_days = lookback_days or ResourceManager.FORECAST_LOOKBACK_DAYS
+        granularity = granularity or ResourceManager.FORECAST_GRANULARITY
+        
+        resources = list(resources_collection.find(
+            {'total_capacity': {'$gt': 0}},
+            {'name': 1, 'total_capacity': 1, 'current_utilization': 1}
+        ))
+        if not resources:
+            return []
+        positions = {resource['_id']: position for position, resource in enumerate(resources)}
+        capacities = np.fromiter((resource['total_capacity'] for resource in resources), np.float64, len(resources))
+        
+        # Times are Unix seconds at the middle of each rollup bucket
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        epoch = datetime(1970, 1, 1) - UsageHistoryManager.ROLLUP_STEPS[granularity] / 2
+        index, timestamps, values = [], [], []
+        rollups = usage_rollups_collection.find(
+            {'granularity': granularity, 'bucket': {'$gte': now - timedelta(days=lookback_days)}},
+            {'_id': 0, 'resource_id': 1, 'bucket': 1, 'sum': 1, 'count': 1},
+            batch_size=10000
+        )
+        for rollup in rollups:
+            position = positions.get(rollup['resource_id'])
+            if position is None or not rollup['count']:
+                continue
+            index.append(position)
+            timestamps.append((rollup['bucket'] - epoch).total_seconds())
+            values.append(rollup['sum'] / rollup['count'])
+        
+        forecast = forecast_exhaustion(index, timestamps, values, capacities,
+                                       (now - datetime(1970, 1, 1)).total_seconds())
+        days = forecast['days']
+        days[forecast['points'] < ResourceManager.FORECAST_MIN_POINTS] = np.inf
+        selected = np.flatnonzero(days <= horizon_days)
+        selected = selected[np.argsort(days[selected], kind='stable')]
+        
+        return [
+            {
+                'resource_id': resources[position]['_id'],
+                'name': resources[position].get('name'),
+                'total_capacity': resources[position]['total_capacity'],
+                'current_utilization': resources[position].get('current_utilization', 0),
+                'trend_utilization': float(forecast['level'][position]),
+                'growth_per_day': float(forecast['slope'][position]),
+                'days_to_exhaustion': float(days[position]),
+                'exhausted_at': now + timedelta(days=float(days[position]))
+            }
+            for position in selected
+        ]
 
 # Service Management
 class ServiceManager:
@@ -138,6 +424,12 @@ class ServiceManager:
         'CRITICAL', 'HIGH', 'MEDIUM', 'LOW'
     ]
     
+    # Fields joined in find_detail
+    DERIVED_FIELDS = {
+        'resource_dependencies': (),
+        'active_alerts': ()
+    }
+    
     @staticmethod
     def create(name, service_id=None, description=None, status='OPERATIONAL', criticality='MEDIUM'):
         """Create a new service"""
@@ -159,29 +451,262 @@ class ServiceManager:
     
     @staticmethod
     def find_by_id(service_id):
-        """Find service by ID"""
+        """Find service by ID, through the service cache"""
         if not isinstance(service_id, ObjectId):
             try:
                 service_id = ObjectId(service_id)
             except:
                 return None
-        return services_collection.find_one({'_id': service_id})
+        
+        service = service_cache.get(service_id)
+        if service is None:
+            service = services_collection.find_one({'_id': service_id})
+            service_cache.put(service, service and service.get('name'))
+        return service
     
     @staticmethod
     def find_by_name(name):
-        """Find service by name"""
-        return services_collection.find_one({'name': name})
+        """Find service by name, through the service cache"""
+        service = service_cache.get_by_alias(name)
+        if service is None or service.get('name') != name:
+            service = services_collection.find_one({'name': name})
+            service_cache.put(service, name)
+        return service
+    
+    @staticmethod
+    def find_detail(service_id, fields=None):
+        """
+        Find service by ID with its resource dependencies and active alerts joined
+        server-side; with fields, only those fields are fetched and only requested joins are run
+        """
+        if not isinstance(service_id, ObjectId):
+            try:
+                service_id = ObjectId(service_id)
+            except:
+                return None
+        
+        pipeline = [{'$match': {'_id': service_id}}]
+        projection = fieldsets.projection(fields, ServiceManager.DERIVED_FIELDS)
+        if projection:
+            pipeline.append({'$project': projection})
+        
+        if fieldsets.wants(fields, 'resource_dependencies'):
+            pipeline.append({'$lookup': {
+                'from': dependencies_collection.name,
+                'localField': '_id',
+                'foreignField': 'service_id',
+                'pipeline': ServiceManager.resource_dependencies_pipeline(),
+                'as': 'resource_dependencies'
+            }})
+        
+        if fieldsets.wants(fields, 'active_alerts'):
+            pipeline.append({'$lookup': {
+                'from': alerts_collection.name,
+                'localField': '_id',
+                'foreignField': 'service_id',
+                'pipeline': [
+                    {'$match': {'is_resolved': False}},
+                    {'$sort': {'created_at': -1}}
+                ],
+                'as': 'active_alerts'
+            }})
+        
+        return next(services_collection.aggregate(pipeline), None)
+    
+    @staticmethod
+    def resource_dependencies_pipeline():
+        """Stages turning a service's dependency documents into resource dependency summaries"""
+        return [
+            {'$lookup': {
+                'from': resources_collection.name,
+                'localField': 'resource_id',
+                'foreignField': '_id',
+                'as': 'resource'
+            }},
+            {'$unwind': '$resource'},
+            {'$replaceWith': {
+                'resource_id': {'$toString': '$resource._id'},
+                'resource_name': '$resource.name',
+                'resource_category': {'$ifNull': ['$resource.category', 'OTHER']},
+                'quantity_required': '$quantity_required',
+                'is_critical': '$is_critical',
+                'utilization': {'$ifNull': ['$resource.current_utilization', 0]},
+                'capacity': {'$ifNull': ['$resource.total_capacity', 0]}
+            }}
+        ]
+    
+    @staticmethod
+    async def afind_detail(service_id, fields=None):
+        """find_detail on the async driver, querying the service, its resource dependencies and active alerts concurrently"""
+        if not isinstance(service_id, ObjectId):
+            try:
+                service_id = ObjectId(service_id)
+            except:
+                return None
+        
+        adb = get_async_db()
+        joins = {}
+        if fieldsets.wants(fields, 'resource_dependencies'):
+            joins['resource_dependencies'] = aggregate_list(
+                adb.dependencies,
+                [{'$match': {'service_id': service_id}}] + ServiceManager.resource_dependencies_pipeline()
+            )
+        if fieldsets.wants(fields, 'active_alerts'):
+            joins['active_alerts'] = adb.alerts.find(
+                {'service_id': service_id, 'is_resolved': False}
+            ).sort('created_at', -1).to_list()
+        
+        projection = fieldsets.projection(fields, ServiceManager.DERIVED_FIELDS)
+        service, *joined = await asyncio.gather(
+            adb.services.find_one({'_id': service_id}, projection),
+            *joins.values()
+        )
+        if service is not None:
+            service.update(zip(joins, joined))
+        return service
     
     @staticmethod
     def find_all(criticality=None, status=None, limit=100, skip=0):
-        """Find all services, optionally filtered"""
+        """Find the first limit services, optionally filtered (skip is deprecated, use find_page)"""
+        if skip:
+            query = {}
+            if criticality:
+                query['criticality'] = criticality
+            if status:
+                query['status'] = status
+            return pagination.find_skip(services_collection, query, pagination.ID_ORDER, limit, skip)
+        return ServiceManager.find_page(criticality=criticality, status=status, limit=limit)[0]
+    
+    @staticmethod
+    def find_page(criticality=None, status=None, limit=100, cursor=None, fields=None):
+        """One page of services in _id order after cursor, as (services, next_cursor)"""
         query = {}
         if criticality:
             query['criticality'] = criticality
         if status:
             query['status'] = status
             
-        return list(services_collection.find(query).skip(skip).limit(limit))
+        projection = fieldsets.projection(fields, ServiceManager.DERIVED_FIELDS)
+        return pagination.find_page(services_collection, query, pagination.ID_ORDER, limit, cursor, projection)
+    
+    @staticmethod
+    def bulk_import(df):
+        """
+        Upsert services and their resource dependencies from a dependency book DataFrame.
+        
+        Dependencies are read from every DependencyN/QuantityN column pair present,
+        services are upserted in one bulk_write, name->_id maps are loaded once and
+        all edges go through a single DependencyManager.bulk_upsert call.
+        """
+        if 'Service' not in df.columns:
+            raise ValueError("Import file must contain a 'Service' column")
+        
+        names = df['Service'].astype('string').str.strip()
+        if 'Criticality' in df.columns:
+            criticality = df['Criticality'].fillna('MEDIUM').astype(str).str.strip()
+        else:
+            criticality = pd.Series('MEDIUM', index=df.index)
+        valid = names.notna() & (names != '') & criticality.isin(ServiceManager.CRITICALITY_CHOICES)
+        
+        rows = pd.DataFrame({'name': names, 'criticality': criticality}, index=df.index)[valid]
+        rows['name'] = rows['name'].astype(object)
+        summary = {
+            'services_created': 0,
+            'services_updated': 0,
+            'dependencies_created': 0,
+            'dependencies_updated': 0,
+            'rejected': int((~valid).sum()),
+            'missing_resources': []
+        }
+        
+        if rows.empty:
+            return summary
+        
+        # Upsert services, later rows win for repeated names
+        services = rows.drop_duplicates(subset='name', keep='last')
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {'name': record['name']},
+                {
+                    '$set': {
+                        'criticality': record['criticality'],
+                        'status': 'OPERATIONAL',
+                        'last_updated': now
+                    },
+                    '$setOnInsert': {'service_id': None, 'description': None}
+                },
+                upsert=True
+            )
+            for record in services.to_dict('records')
+        ]
+        try:
+            result = services_collection.bulk_write(operations, ordered=False)
+            summary['services_created'] = result.upserted_count
+            summary['services_updated'] = result.matched_count
+        except BulkWriteError as e:
+            summary['services_created'] = e.details.get('nUpserted', 0)
+            summary['services_updated'] = e.details.get('nMatched', 0)
+            summary['rejected'] += len(e.details.get('writeErrors', []))
+        # Upserts are by name, so any cached service may have changed
+        service_cache.clear()
+        
+        # Reshape every DependencyN/QuantityN pair into one long edge list
+        pairs = []
+        for column in df.columns:
+            match = re.fullmatch(r'Dependency(\d+)', str(column))
+            if match:
+                quantity_column = f'Quantity{match.group(1)}'
+                quantities = df[quantity_column] if quantity_column in df.columns else pd.Series(None, index=df.index)
+                pairs.append(pd.DataFrame({
+                    'service': rows['name'],
+                    'criticality': rows['criticality'],
+                    'resource': df.loc[rows.index, column],
+                    'quantity': pd.to_numeric(quantities.loc[rows.index], errors='coerce')
+                }))
+        
+        if not pairs:
+            return summary
+        
+        edges = pd.concat(pairs, ignore_index=True)
+        edges = edges[edges['resource'].notna()]
+        edges['resource'] = edges['resource'].astype(str).str.strip()
+        edges['quantity'] = edges['quantity'].fillna(1.0).astype(float)
+        
+        # Resolve names to ids with one query per collection
+        service_ids = {
+            doc['name']: doc['_id']
+            for doc in services_collection.find({'name': {'$in': services['name'].tolist()}}, {'name': 1})
+        }
+        resource_ids = {
+            doc['name']: doc['_id']
+            for doc in resources_collection.find({'name': {'$in': edges['resource'].unique().tolist()}}, {'name': 1})
+        }
+        
+        edges['service_id'] = edges['service'].map(service_ids)
+        edges['resource_id'] = edges['resource'].map(resource_ids)
+        
+        missing = edges['resource_id'].isna()
+        if missing.any():
+            summary['missing_resources'] = sorted(edges.loc[missing, 'resource'].unique().tolist())
+        
+        edges = edges[~missing & edges['service_id'].notna()]
+        edges = edges.drop_duplicates(subset=['service', 'resource'], keep='last')
+        
+        result = DependencyManager.bulk_upsert([
+            {
+                'service_id': edge['service_id'],
+                'resource_id': edge['resource_id'],
+                'quantity_required': edge['quantity'],
+                'is_critical': edge['criticality'] == 'CRITICAL'
+            }
+            for edge in edges.to_dict('records')
+        ])
+        summary['dependencies_created'] = result['created']
+        summary['dependencies_updated'] = result['updated']
+        summary['rejected'] += result['rejected']
+        
+        return summary
     
     @staticmethod
     def update(service_id, **kwargs):
@@ -195,10 +720,12 @@ class ServiceManager:
         # Add last_updated timestamp
         kwargs['last_updated'] = datetime.now()
         
-        return services_collection.update_one(
+        result = services_collection.update_one(
             {'_id': service_id},
             {'$set': kwargs}
         )
+        service_cache.invalidate(service_id)
+        return result
     
     @staticmethod
     def delete(service_id):
@@ -210,10 +737,15 @@ class ServiceManager:
                 return None
         
         # Delete related data
+        edges = [(service_id, dep['resource_id'], None)
+                 for dep in dependencies_collection.find({'service_id': service_id}, {'resource_id': 1})]
         dependencies_collection.delete_many({'service_id': service_id})
+        DependencyManager.sync_requirements_many(edges)
         alerts_collection.delete_many({'service_id': service_id})
         
-        return services_collection.delete_one({'_id': service_id})
+        result = services_collection.delete_one({'_id': service_id})
+        service_cache.invalidate(service_id)
+        return result
 
 # Service Resource Dependency Management
 class DependencyManager:
@@ -246,10 +778,94 @@ class DependencyManager:
             upsert=True
         )
         
+        DependencyManager.sync_requirements(service_id, resource_id, dependency['quantity_required'])
+        
         if result.upserted_id:
             return result.upserted_id
         return None
     
+    @staticmethod
+    def sync_requirements(service_id, resource_id, quantity_required=None):
+        """Push one edge change into the incremental resource requirements (None removes the edge)"""
+        return DependencyManager.sync_requirements_many([(service_id, resource_id, quantity_required)])
+    
+    @staticmethod
+    def sync_requirements_many(edges):
+        """
+        Push (service_id, resource_id, quantity_required) edge changes into the requirements in
+        one pass. If they cannot be applied, the requirements are marked stale until the next
+        full dependency analysis instead of silently lagging behind the dependencies.
+        """
+        if not edges:
+            return None
+        
+        # Requirements are keyed by name, resolved with one query per collection
+        service_names = {
+            doc['_id']: doc['name']
+            for doc in services_collection.find({'_id': {'$in': list({edge[0] for edge in edges})}}, {'name': 1})
+        }
+        resource_names = {
+            doc['_id']: doc['name']
+            for doc in resources_collection.find({'_id': {'$in': list({edge[1] for edge in edges})}}, {'name': 1})
+        }
+        named = [
+            (service_names[service_id], resource_names[resource_id], quantity_required)
+            for service_id, resource_id, quantity_required in edges
+            if service_id in service_names and resource_id in resource_names
+        ]
+        if not named:
+            return None
+        
+        try:
+            return update_dependency_requirements(named)
+        except RequirementsStaleError as e:
+            logger.warning(f"Requirements not updated for {len(named)} dependency changes: {str(e)}")
+            return None
+        except Exception as e:
+            # The dependency itself is already written, so the requirements now lag behind it
+            mark_requirements_stale(f"{len(named)} dependency changes not applied: {str(e)}")
+            return None
+    
+    @staticmethod
+    def bulk_upsert(edges):
+        """Upsert many dependencies with one unordered bulk_write on (service_id, resource_id)"""
+        summary = {'created': 0, 'updated': 0, 'rejected': 0}
+        if not edges:
+            return summary
+        
+        operations = [
+            UpdateOne(
+                {'service_id': edge['service_id'], 'resource_id': edge['resource_id']},
+                {'$set': {
+                    'service_id': edge['service_id'],
+                    'resource_id': edge['resource_id'],
+                    'quantity_required': float(edge.get('quantity_required', 1.0)),
+                    'is_critical': bool(edge.get('is_critical', False))
+                }},
+                upsert=True
+            )
+            for edge in edges
+        ]
+        
+        failed = set()
+        try:
+            result = dependencies_collection.bulk_write(operations, ordered=False)
+            summary['created'] = result.upserted_count
+            summary['updated'] = result.matched_count
+        except BulkWriteError as e:
+            summary['created'] = e.details.get('nUpserted', 0)
+            summary['updated'] = e.details.get('nMatched', 0)
+            summary['rejected'] = len(e.details.get('writeErrors', []))
+            failed = {error['index'] for error in e.details.get('writeErrors', [])}
+        
+        DependencyManager.sync_requirements_many([
+            (edge['service_id'], edge['resource_id'], float(edge.get('quantity_required', 1.0)))
+            for i, edge in enumerate(edges)
+            if i not in failed
+        ])
+        
+        return summary
+    
     @staticmethod
     def find_by_service(service_id):
         """Find all dependencies for a service"""
@@ -291,10 +907,15 @@ class DependencyManager:
         if 'quantity_required' in kwargs:
             kwargs['quantity_required'] = float(kwargs['quantity_required'])
             
-        return dependencies_collection.update_one(
+        result = dependencies_collection.update_one(
             {'service_id': service_id, 'resource_id': resource_id},
             {'$set': kwargs}
         )
+        
+        if 'quantity_required' in kwargs and result.matched_count:
+            DependencyManager.sync_requirements(service_id, resource_id, kwargs['quantity_required'])
+        
+        return result
     
     @staticmethod
     def delete(service_id, resource_id):
@@ -311,12 +932,23 @@ class DependencyManager:
             except:
                 return None
                 
-        return dependencies_collection.delete_one(
+        result = dependencies_collection.delete_one(
             {'service_id': service_id, 'resource_id': resource_id}
         )
+        
+        if result.deleted_count:
+            DependencyManager.sync_requirements(service_id, resource_id)
+        
+        return result
 
 # Resource Pricing Management
 class PricingManager:
+    # Fields joined from the resource in find_with_resources
+    DERIVED_FIELDS = {
+        'resource_name': (),
+        'category': ()
+    }
+    
     @staticmethod
     def create(resource_id, list_price=None, negotiated_price=None, 
               recent_purchase_price=None, recent_quote_price=None,
@@ -367,8 +999,64 @@ class PricingManager:
     
     @staticmethod
     def find_all(limit=100, skip=0):
-        """Find all pricing data"""
-        return list(pricing_collection.find().skip(skip).limit(limit))
+        """Find the first limit pricing documents (skip is deprecated, use find_with_resources)"""
+        if skip:
+            return pagination.find_skip(pricing_collection, {}, pagination.ID_ORDER, limit, skip)
+        return pagination.find_page(pricing_collection, {}, pagination.ID_ORDER, limit)[0]
+    
+    @staticmethod
+    def find_with_resources(category=None, limit=100, cursor=None, fields=None):
+        """
+        One page of pricing data after cursor, joined with resource name/category and
+        filtered server-side, as (pricing, next_cursor)
+        """
+        pipeline = PricingManager.with_resources_pipeline(category, limit, cursor, fields)
+        return pagination.split_page(list(pricing_collection.aggregate(pipeline)), pagination.ID_ORDER, limit)
+    
+    @staticmethod
+    async def afind_with_resources(category=None, limit=100, cursor=None, fields=None):
+        """find_with_resources on the async driver"""
+        pipeline = PricingManager.with_resources_pipeline(category, limit, cursor, fields)
+        pricing = await aggregate_list(get_async_db().pricing, pipeline)
+        return pagination.split_page(pricing, pagination.ID_ORDER, limit)
+    
+    @staticmethod
+    def with_resources_pipeline(category, limit, cursor, fields):
+        """Aggregation pipeline for find_with_resources, fetching limit + 1 documents"""
+        # Matching and sorting first lets the _id index seek to the page; later stages keep the order
+        pipeline = [
+            {'$match': pagination.page_filter({}, pagination.ID_ORDER, cursor)},
+            {'$sort': {'_id': ASCENDING}}
+        ]
+        
+        projection = fieldsets.projection(fields, PricingManager.DERIVED_FIELDS, required=('resource_id',))
+        if projection:
+            pipeline.append({'$project': projection})
+        
+        pipeline.extend([
+            {'$lookup': {
+                'from': resources_collection.name,
+                'localField': 'resource_id',
+                'foreignField': '_id',
+                'pipeline': [{'$project': {'name': 1, 'category': 1}}],
+                'as': 'resource'
+            }},
+            {'$unwind': '$resource'}
+        ])
+        
+        if category:
+            pipeline.append({'$match': {'resource.category': category}})
+        
+        pipeline.extend([
+            {'$limit': limit + 1},
+            {'$set': {
+                'resource_name': '$resource.name',
+                'category': {'$ifNull': ['$resource.category', 'OTHER']}
+            }},
+            {'$unset': 'resource'}
+        ])
+        
+        return pipeline
     
     @staticmethod
     def update(resource_id, **kwargs):
@@ -406,6 +1094,25 @@ class PricingManager:
 
 # Resource Usage History Management
 class UsageHistoryManager:
+    # Rollup granularities from finest to coarsest, with their bucket width and retention
+    ROLLUP_GRANULARITIES = ['minute', 'hour', 'day']
+    ROLLUP_STEPS = {
+        'minute': timedelta(minutes=1),
+        'hour': timedelta(hours=1),
+        'day': timedelta(days=1)
+    }
+    ROLLUP_RETENTION = {
+        'minute': timedelta(days=7),
+        'hour': timedelta(days=400),
+        'day': None
+    }
+    
+    # Rollups keep a log-scale histogram of samples; quantiles read from it are within 1%
+    SKETCH_GAMMA = 1.02
+    
+    # Default number of points returned by series()
+    SERIES_MAX_POINTS = 500
+    
     @staticmethod
     def create(resource_id, utilization, timestamp=None):
         """Create usage history entry"""
@@ -416,7 +1123,7 @@ class UsageHistoryManager:
                 return None
         
         if timestamp is None:
-            timestamp = datetime.now()
+            timestamp = datetime.now(timezone.utc).replace(tzinfo=None)
             
         history = {
             'resource_id': resource_id,
@@ -424,7 +1131,217 @@ class UsageHistoryManager:
             'timestamp': timestamp
         }
         
-        return usage_history_collection.insert_one(history).inserted_id
+        inserted_id = usage_history_collection.insert_one(history).inserted_id
+        UsageHistoryManager.update_rollups([history])
+        return inserted_id
+    
+    @staticmethod
+    def create_many(samples, update_resources=True):
+        """
+        Insert (resource_id, utilization, timestamp) samples and fold them into the rollups.
+        
+        With update_resources, each resource's current_utilization is set to its latest
+        sample, unless the resource already holds a newer one.
+        
+        Returns counts of inserted and rejected samples.
+        """
+        history = []
+        rejected = 0
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        for resource_id, utilization, timestamp in samples:
+            if not isinstance(resource_id, ObjectId):
+                try:
+                    resource_id = ObjectId(resource_id)
+                except:
+                    rejected += 1
+                    continue
+            try:
+                utilization = float(utilization)
+            except (TypeError, ValueError):
+                rejected += 1
+                continue
+            # inf/nan cannot be folded into the rollup sketches
+            if not math.isfinite(utilization):
+                rejected += 1
+                continue
+            history.append({
+                'resource_id': resource_id,
+                'utilization': utilization,
+                'timestamp': timestamp or now
+            })
+        
+        if history:
+            usage_history_collection.insert_many(history, ordered=False)
+            UsageHistoryManager.update_rollups(history)
+            if update_resources:
+                UsageHistoryManager.update_current_utilization(history)
+        return {'inserted': len(history), 'rejected': rejected}
+    
+    @staticmethod
+    def update_current_utilization(history):
+        """Set current_utilization on resources from their latest usage history sample"""
+        latest = {}
+        for sample in history:
+            previous = latest.get(sample['resource_id'])
+            if previous is None or sample['timestamp'] >= previous['timestamp']:
+                latest[sample['resource_id']] = sample
+        
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {'_id': resource_id, 'utilization_sampled_at': {'$not': {'$gt': sample['timestamp']}}},
+                {'$set': {
+                    'current_utilization': sample['utilization'],
+                    'utilization_sampled_at': sample['timestamp'],
+                    'last_updated': now
+                }}
+            )
+            for resource_id, sample in latest.items()
+        ]
+        if operations:
+            resources_collection.bulk_write(operations, ordered=False)
+            resource_cache.invalidate(*latest)
+        return len(operations)
+    
+    @staticmethod
+    def truncate(timestamp, granularity):
+        """Start of the rollup bucket containing timestamp"""
+        timestamp = timestamp.replace(second=0, microsecond=0)
+        if granularity in ('hour', 'day'):
+            timestamp = timestamp.replace(minute=0)
+        if granularity == 'day':
+            timestamp = timestamp.replace(hour=0)
+        return timestamp
+    
+    @staticmethod
+    def sketch_quantile(hist, count, quantile):
+        """Approximate quantile from a rollup histogram"""
+        if not hist or not count:
+            return None
+        gamma = UsageHistoryManager.SKETCH_GAMMA
+        rank = quantile * count
+        seen = hist.get('z', 0)
+        if seen >= rank:
+            return 0.0
+        bins = sorted(int(key) for key in hist if key != 'z')
+        for index in bins:
+            seen += hist[str(index)]
+            if seen >= rank:
+                return 2 * gamma ** index / (gamma + 1)
+        return 2 * gamma ** bins[-1] / (gamma + 1) if bins else 0.0
+    
+    @staticmethod
+    def update_rollups(history):
+        """Fold usage history documents into the minute, hour and day rollups"""
+        # Aggregate samples into minute buckets, then fold those into the coarser levels;
+        # non-positive values share histogram bin 'z'
+        log_gamma = math.log(UsageHistoryManager.SKETCH_GAMMA)
+        minutes = {}
+        for sample in history:
+            value = sample['utilization']
+            sketch_bin = str(math.ceil(math.log(value) / log_gamma)) if value > 0 else 'z'
+            key = (sample['resource_id'], 'minute', sample['timestamp'].replace(second=0, microsecond=0))
+            bucket = minutes.get(key)
+            if bucket is None:
+                minutes[key] = {'count': 1, 'sum': value, 'min': value, 'max': value, 'hist': {sketch_bin: 1}}
+                continue
+            bucket['count'] += 1
+            bucket['sum'] += value
+            if value < bucket['min']:
+                bucket['min'] = value
+            elif value > bucket['max']:
+                bucket['max'] = value
+            bucket['hist'][sketch_bin] = bucket['hist'].get(sketch_bin, 0) + 1
+        
+        buckets = dict(minutes)
+        for (resource_id, _, start), minute in minutes.items():
+            for granularity in UsageHistoryManager.ROLLUP_GRANULARITIES[1:]:
+                key = (resource_id, granularity, UsageHistoryManager.truncate(start, granularity))
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = {'count': minute['count'], 'sum': minute['sum'], 'min': minute['min'],
+                                    'max': minute['max'], 'hist': dict(minute['hist'])}
+                    continue
+                bucket['count'] += minute['count']
+                bucket['sum'] += minute['sum']
+                bucket['min'] = min(bucket['min'], minute['min'])
+                bucket['max'] = max(bucket['max'], minute['max'])
+                for sketch_bin, count in minute['hist'].items():
+                    bucket['hist'][sketch_bin] = bucket['hist'].get(sketch_bin, 0) + count
+        
+        operations = []
+        for (resource_id, granularity, start), bucket in buckets.items():
+            increments = {'count': bucket['count'], 'sum': bucket['sum']}
+            for sketch_bin, count in bucket['hist'].items():
+                increments[f'hist.{sketch_bin}'] = count
+            update = {
+                '$inc': increments,
+                '$min': {'min': bucket['min']},
+                '$max': {'max': bucket['max']}
+            }
+            retention = UsageHistoryManager.ROLLUP_RETENTION[granularity]
+            if retention:
+                update['$setOnInsert'] = {'expires_at': start + UsageHistoryManager.ROLLUP_STEPS[granularity] + retention}
+            operations.append(UpdateOne(
+                {'resource_id': resource_id, 'granularity': granularity, 'bucket': start},
+                update,
+                upsert=True
+            ))
+        
+        if operations:
+            usage_rollups_collection.bulk_write(operations, ordered=False)
+        return len(operations)
+    
+    @staticmethod
+    def pick_granularity(start_time, end_time, max_points=None):
+        """Finest rollup granularity that covers the window in at most max_points buckets"""
+        max_points = max_points or UsageHistoryManager.SERIES_MAX_POINTS
+        window = end_time - start_time
+        for granularity in UsageHistoryManager.ROLLUP_GRANULARITIES:
+            if window / UsageHistoryManager.ROLLUP_STEPS[granularity] <= max_points:
+                return granularity
+        return UsageHistoryManager.ROLLUP_GRANULARITIES[-1]
+    
+    @staticmethod
+    def series(resource_id, start_time, end_time=None, max_points=None, granularity=None):
+        """
+        Usage series for a resource read from the rollups.
+        
+        Unless granularity is given, the finest granularity that keeps the window within
+        max_points buckets is used. Each point has count, avg, min, max and p95.
+        """
+        if not isinstance(resource_id, ObjectId):
+            try:
+                resource_id = ObjectId(resource_id)
+            except:
+                return None
+        
+        if end_time is None:
+            end_time = datetime.now(timezone.utc).replace(tzinfo=None)
+        if granularity is None:
+            granularity = UsageHistoryManager.pick_granularity(start_time, end_time, max_points)
+        
+        rollups = usage_rollups_collection.find({
+            'resource_id': resource_id,
+            'granularity': granularity,
+            'bucket': {
+                '$gte': UsageHistoryManager.truncate(start_time, granularity),
+                '$lte': end_time
+            }
+        }).sort('bucket', ASCENDING)
+        
+        points = []
+        for rollup in rollups:
+            count = rollup['count']
+            points.append({
+                'timestamp': rollup['bucket'],
+                'count': count,
+                'avg': rollup['sum'] / count if count else None,
+                'min': rollup['min'],
+                'max': rollup['max'],
+                'p95': UsageHistoryManager.sketch_quantile(rollup.get('hist'), count, 0.95)
+            })
+        return {'granularity': granularity, 'points': points}
     
     @staticmethod
     def find_by_resource(resource_id, start_time=None, end_time=None, limit=100):
@@ -446,14 +1363,18 @@ class UsageHistoryManager:
         if end_time:
             query['timestamp']['$lte'] = end_time
             
-        return list(usage_history_collection.find(query).sort('timestamp', -1).limit(limit))
+        # Served in index order by the (resource_id, timestamp) index
+        return list(usage_history_collection.find(query).sort('timestamp', DESCENDING).limit(limit))
     
     @staticmethod
     def delete_old_entries(days_to_keep=90):
         """Delete entries older than specified days"""
-        cutoff_date = datetime.now() - timedelta(days=days_to_keep)
+        cutoff_date = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days_to_keep)
         return usage_history_collection.delete_many({'timestamp': {'$lt': cutoff_date}})
 
+# Buffered writer used by the usage ingest endpoint
+usage_ingest_buffer = UsageIngestBuffer(UsageHistoryManager.create_many)
+
 # Alert Management
 class AlertManager:
     ALERT_TYPES = [
@@ -464,6 +1385,15 @@ class AlertManager:
         'CRITICAL', 'HIGH', 'MEDIUM', 'LOW', 'INFO'
     ]
     
+    # Listing order, newest first; _id breaks ties between alerts created together
+    LIST_ORDER = [('created_at', DESCENDING), ('_id', DESCENDING)]
+    
+    # Names added by attach_names, with the ids they are looked up by
+    DERIVED_FIELDS = {
+        'resource_name': ('resource_id',),
+        'service_name': ('service_id',)
+    }
+    
     @staticmethod
     def create(title, description, alert_type, severity, 
               resource_id=None, service_id=None):
@@ -514,7 +1444,30 @@ class AlertManager:
     
     @staticmethod
     def find_all(resolved=None, severity=None, alert_type=None, limit=100, skip=0):
-        """Find all alerts, optionally filtered"""
+        """Find the newest limit alerts, optionally filtered (skip is deprecated, use find_page)"""
+        if skip:
+            query = AlertManager.list_query(resolved, severity, alert_type)
+            return pagination.find_skip(alerts_collection, query, AlertManager.LIST_ORDER, limit, skip)
+        return AlertManager.find_page(resolved=resolved, severity=severity, alert_type=alert_type, limit=limit)[0]
+    
+    @staticmethod
+    def find_page(resolved=None, severity=None, alert_type=None, limit=100, cursor=None, fields=None):
+        """One page of alerts, newest first, after cursor, as (alerts, next_cursor)"""
+        query = AlertManager.list_query(resolved, severity, alert_type)
+        projection = fieldsets.projection(fields, AlertManager.DERIVED_FIELDS)
+        return pagination.find_page(alerts_collection, query, AlertManager.LIST_ORDER, limit, cursor, projection)
+    
+    @staticmethod
+    async def afind_page(resolved=None, severity=None, alert_type=None, limit=100, cursor=None, fields=None):
+        """find_page on the async driver"""
+        query = AlertManager.list_query(resolved, severity, alert_type)
+        projection = fieldsets.projection(fields, AlertManager.DERIVED_FIELDS)
+        return await pagination.afind_page(get_async_db().alerts, query, AlertManager.LIST_ORDER, limit, cursor,
+                                           projection)
+    
+    @staticmethod
+    def list_query(resolved=None, severity=None, alert_type=None):
+        """Filter for find_page"""
         query = {}
         
         if resolved is not None:
@@ -526,7 +1479,7 @@ class AlertManager:
         if alert_type:
             query['alert_type'] = alert_type
             
-        return list(alerts_collection.find(query).sort('created_at', -1).skip(skip).limit(limit))
+        return query
     
     @staticmethod
     def find_by_resource(resource_id, resolved=None):
@@ -560,6 +1513,203 @@ class AlertManager:
             
         return list(alerts_collection.find(query).sort('created_at', -1))
     
+    @staticmethod
+    def load_rules(rules=None):
+        """Validated alert rules, from settings.ALERT_RULES by default"""
+        if rules is None:
+            rules = getattr(settings, 'ALERT_RULES', [])
+        return [
+            alert_rules.validate_rule(rule, AlertManager.ALERT_TYPES, AlertManager.SEVERITY_LEVELS)
+            for rule in rules
+        ]
+    
+    @staticmethod
+    def evaluate_rules(rules=None):
+        """
+        Evaluate alert rules over all resources in one pass.
+        
+        Conditions without an open alert get one, and open alerts of the evaluated rules
+        whose condition no longer holds are resolved, in a single bulk_write. Alerts of
+        rules not being evaluated are left alone. Returns counts of resources evaluated,
+        firing conditions, and alerts created and resolved.
+        """
+        rules = AlertManager.load_rules(rules)
+        resources = list(resources_collection.find(
+            {}, {'name': 1, 'category': 1, 'current_utilization': 1, 'total_capacity': 1}
+        ))
+        columns = alert_rules.resource_columns(resources)
+        
+        # Fingerprints of open alerts raised by the rules being evaluated
+        rule_names = {rule['name'] for rule in rules}
+        open_alerts = {
+            alert['fingerprint']
+            for alert in alerts_collection.find(
+                {'is_resolved': False, 'fingerprint': alert_rules.fingerprint_query(rule_names)},
+                {'_id': 0, 'fingerprint': 1}
+            )
+        } if rule_names else set()
+        
+        now = datetime.now()
+        firing = set()
+        operations = []
+        for rule, positions in alert_rules.evaluate(rules, columns):
+            values = columns[rule['metric']]
+            for position in positions:
+                resource = resources[position]
+                fingerprint = alert_rules.fingerprint(rule['name'], resource['_id'])
+                firing.add(fingerprint)
+                if fingerprint in open_alerts:
+                    continue
+                operations.append(InsertOne({
+                    'title': f"{resource.get('name')}: {rule['name']}",
+                    'description': (
+                        f"{rule['metric']} is {values[position]:.2f} "
+                        f"({rule['op']} {rule['threshold']:g})"
+                    ),
+                    'alert_type': rule['alert_type'],
+                    'severity': rule['severity'],
+                    'resource_id': resource['_id'],
+                    'service_id': None,
+                    'fingerprint': fingerprint,
+                    'rule': rule['name'],
+                    'created_at': now,
+                    'is_resolved': False,
+                    'resolved_at': None
+                }))
+        created = len(operations)
+        
+        resolved = list(open_alerts - firing)
+        if resolved:
+            operations.append(UpdateMany(
+                {'fingerprint': {'$in': resolved}, 'is_resolved': False},
+                {'$set': {'is_resolved': True, 'resolved_at': now}}
+            ))
+        
+        if operations:
+            try:
+                alerts_collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Alerts opened concurrently by another evaluation hit the fingerprint index
+                duplicates = sum(1 for error in e.details.get('writeErrors', []) if error.get('code') == 11000)
+                if duplicates != len(e.details.get('writeErrors', [])):
+                    raise
+                created -= duplicates
+        
+        return {
+            'evaluated': len(resources),
+            'firing': len(firing),
+            'created': created,
+            'resolved': len(resolved)
+        }
+    
+    @staticmethod
+    def capacity_severity(days_to_exhaustion):
+        """Alert severity for a forecast time to capacity exhaustion"""
+        if days_to_exhaustion <= 1:
+            return 'CRITICAL'
+        if days_to_exhaustion <= 7:
+            return 'HIGH'
+        if days_to_exhaustion <= 14:
+            return 'MEDIUM'
+        return 'LOW'
+    
+    @staticmethod
+    def raise_capacity_alerts(forecasts, threshold_days=None):
+        """
+        Create CAPACITY alerts for forecasts exhausting within threshold_days, skipping
+        resources that already have an open CAPACITY alert. Returns the number created.
+        """
+        if threshold_days is None:
+            threshold_days = getattr(settings, 'CAPACITY_ALERT_THRESHOLD_DAYS', 14)
+        due = [
+            dict(forecast, resource_id=ObjectId(forecast['resource_id']))
+            for forecast in forecasts if forecast['days_to_exhaustion'] <= threshold_days
+        ]
+        if not due:
+            return 0
+        
+        open_alerts = {
+            alert['resource_id']
+            for alert in alerts_collection.find(
+                {
+                    'alert_type': 'CAPACITY',
+                    'is_resolved': False,
+                    'resource_id': {'$in': [forecast['resource_id'] for forecast in due]}
+                },
+                {'resource_id': 1}
+            )
+        }
+        
+        now = datetime.now()
+        alerts = [
+            {
+                'title': f"{forecast['name']} forecast to reach capacity",
+                'description': (
+                    f"Utilization is trending up {forecast['growth_per_day']:.2f}/day and is forecast to reach "
+                    f"its capacity of {forecast['total_capacity']} in {forecast['days_to_exhaustion']:.1f} days"
+                ),
+                'alert_type': 'CAPACITY',
+                'severity': AlertManager.capacity_severity(forecast['days_to_exhaustion']),
+                'resource_id': forecast['resource_id'],
+                'service_id': None,
+                'created_at': now,
+                'is_resolved': False,
+                'resolved_at': None
+            }
+            for forecast in due if forecast['resource_id'] not in open_alerts
+        ]
+        if alerts:
+            alerts_collection.insert_many(alerts, ordered=False)
+        return len(alerts)
+    
+    @staticmethod
+    def attach_names(alerts):
+        """Add resource_name/service_name to alerts with one $in query per collection"""
+        resource_ids = {alert['resource_id'] for alert in alerts if alert.get('resource_id')}
+        service_ids = {alert['service_id'] for alert in alerts if alert.get('service_id')}
+        
+        resource_names = {}
+        if resource_ids:
+            resource_names = {
+                doc['_id']: doc['name']
+                for doc in resources_collection.find({'_id': {'$in': list(resource_ids)}}, {'name': 1})
+            }
+        
+        service_names = {}
+        if service_ids:
+            service_names = {
+                doc['_id']: doc['name']
+                for doc in services_collection.find({'_id': {'$in': list(service_ids)}}, {'name': 1})
+            }
+        
+        return AlertManager._set_names(alerts, resource_names, service_names)
+    
+    @staticmethod
+    async def aattach_names(alerts):
+        """attach_names on the async driver, looking up resource and service names concurrently"""
+        async def names(collection, ids):
+            if not ids:
+                return {}
+            docs = await collection.find({'_id': {'$in': list(ids)}}, {'name': 1}).to_list()
+            return {doc['_id']: doc['name'] for doc in docs}
+        
+        adb = get_async_db()
+        resource_names, service_names = await asyncio.gather(
+            names(adb.resources, {alert['resource_id'] for alert in alerts if alert.get('resource_id')}),
+            names(adb.services, {alert['service_id'] for alert in alerts if alert.get('service_id')})
+        )
+        return AlertManager._set_names(alerts, resource_names, service_names)
+    
+    @staticmethod
+    def _set_names(alerts, resource_names, service_names):
+        for alert in alerts:
+            if alert.get('resource_id') in resource_names:
+                alert['resource_name'] = resource_names[alert['resource_id']]
+            if alert.get('service_id') in service_names:
+                alert['service_name'] = service_names[alert['service_id']]
+        
+        return alerts
+    
     @staticmethod
     def resolve(alert_id):
         """Mark alert as resolved"""
@@ -0,0 +1,113 @@
+# pagination.py
+"""
+Keyset (cursor) pagination for manager list queries.
+
+A listing is ordered by a sort spec such as [('created_at', DESCENDING), ('_id', DESCENDING)],
+always ending in _id so the order is total. Instead of skipping earlier documents, the
+next page starts strictly after the sort key of the last document returned, so with an
+index on the sort spec every page costs the same as the first one. The key is handed to
+clients as an opaque, URL-safe continuation token.
+"""
+import base64
+import binascii
+import warnings
+from bson import json_util
+from bson.errors import BSONError
+from pymongo import ASCENDING
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+ID_ORDER = [('_id', ASCENDING)]
+
+
+class InvalidCursor(ValueError):
+    """Raised for a continuation token that is malformed or belongs to another ordering"""
+
+
+def encode_cursor(sort, document):
+    """Continuation token for the position just after document in the given order"""
+    payload = {
+        'sort': [field for field, _ in sort],
+        'after': [document.get(field) for field, _ in sort]
+    }
+    data = json_util.dumps(payload, json_options=json_util.CANONICAL_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(sort, token):
+    """Sort key values stored in token, checked against the sort spec"""
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json_util.loads(data, json_options=json_util.CANONICAL_JSON_OPTIONS)
+        fields, values = payload['sort'], payload['after']
+    except (binascii.Error, UnicodeDecodeError, ValueError, BSONError, KeyError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+    if fields != [field for field, _ in sort] or len(values) != len(sort):
+        raise InvalidCursor('Cursor does not belong to this listing')
+    return values
+
+
+def after_filter(sort, values):
+    """
+    Filter matching documents strictly after values in the given order.
+
+    The leading field gets a plain range bound so an index on the sort spec can seek
+    straight to the position; the $or only breaks ties on the remaining fields.
+    """
+    (field, direction), rest = sort[0], sort[1:]
+    strict, inclusive = ('$gt', '$gte') if direction == ASCENDING else ('$lt', '$lte')
+    if not rest:
+        return {field: {strict: values[0]}}
+
+    tie_breaker = after_filter(rest, values[1:])
+    return {
+        field: {inclusive: values[0]},
+        '$or': [{field: {strict: values[0]}}, tie_breaker]
+    }
+
+
+def page_filter(query, sort, cursor=None):
+    """query restricted to documents after cursor (unchanged without one)"""
+    if not cursor:
+        return query
+    keyset = after_filter(sort, decode_cursor(sort, cursor))
+    return {'$and': [query, keyset]} if query else keyset
+
+
+def split_page(documents, sort, limit):
+    """
+    Split the limit + 1 documents fetched for a page into (page, next_cursor); next_cursor
+    is None on the last page.
+    """
+    if len(documents) <= limit:
+        return documents, None
+    page = documents[:limit]
+    return page, encode_cursor(sort, page[-1])
+
+
+def find_page(collection, query, sort, limit=DEFAULT_PAGE_SIZE, cursor=None, projection=None):
+    """One page of collection.find(query, projection) in sort order, as (documents, next_cursor)"""
+    if projection is not None:
+        # The next cursor is built from the sort keys of the last document
+        projection = dict(projection, **{field: 1 for field, _ in sort})
+    documents = list(collection.find(page_filter(query, sort, cursor), projection).sort(sort).limit(limit + 1))
+    return split_page(documents, sort, limit)
+
+
+def find_skip(collection, query, sort, limit, skip):
+    """
+    Offset paging for the deprecated skip= argument of the managers' find_all: the
+    server still walks every skipped document, so deep pages get slower. Use find_page.
+    """
+    warnings.warn('skip= is deprecated, page with find_page(cursor=...) instead', DeprecationWarning, stacklevel=3)
+    return list(collection.find(query).sort(sort).skip(skip).limit(limit))
+
+
+async def afind_page(collection, query, sort, limit=DEFAULT_PAGE_SIZE, cursor=None, projection=None):
+    """find_page for an async (AsyncMongoClient) collection"""
+    if projection is not None:
+        projection = dict(projection, **{field: 1 for field, _ in sort})
+    documents = await collection.find(page_filter(query, sort, cursor), projection).sort(sort).limit(limit + 1).to_list()
+    return split_page(documents, sort, limit)
@@ -0,0 +1,57 @@
+# renderers.py
+"""
+JSON rendering for API responses built from MongoDB documents.
+
+MongoJSONRenderer encodes response data with orjson, which handles datetimes natively
+and calls encode_bson_value only for the few BSON types it does not know (ObjectId,
+Decimal128, ...), so views can return documents as they come back from PyMongo.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import orjson
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from rest_framework.renderers import JSONRenderer
+
+# Line/paragraph separators are valid JSON but not valid JavaScript string contents
+UNSAFE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+def encode_bson_value(value):
+    """orjson default hook: values orjson cannot encode itself, converted as DRF's JSONEncoder does"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, timedelta):
+        return str(value.total_seconds())
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, 'tolist'):
+        # NumPy arrays and scalars not covered by OPT_SERIALIZE_NUMPY
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class MongoJSONRenderer(JSONRenderer):
+    """Drop-in JSONRenderer that encodes ObjectId, datetime and NumPy values in orjson"""
+
+    options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+
+        ret = orjson.dumps(data, default=encode_bson_value, option=options)
+        for separator, escaped in UNSAFE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+        return ret
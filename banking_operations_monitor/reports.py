@@ -0,0 +1,126 @@
+# reports.py
+"""
+Parsing of `resource,utilization` report files, serially or on a process pool.
+
+This module imports nothing that opens connections or starts threads, so the pool
+workers, which are spawned rather than forked, only load what parsing needs. Forking a
+web worker would copy its MongoClient and the state of its background threads into
+each child.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Resource report consolidation settings
+RESOURCE_REPORT_WORKERS = int(getattr(settings, 'RESOURCE_REPORT_WORKERS', os.cpu_count() or 1))
+RESOURCE_REPORT_CHUNK_SIZE = int(getattr(settings, 'RESOURCE_REPORT_CHUNK_SIZE', 8))
+
+_report_pool = None
+_report_pool_lock = threading.Lock()
+
+
+def add_resource_report_line(resource_utilization, line):
+    """Add one `resource,utilization` line to the map, skipping malformed lines"""
+    line = line.strip()
+    if line and ',' in line:
+        # Split the line into resource and utilization
+        parts = line.split(',', 1)
+        if len(parts) == 2:
+            resource = parts[0].strip()
+            try:
+                utilization = int(parts[1].strip())
+            except ValueError:
+                # Skip lines where utilization isn't a valid integer
+                return
+            # Add to our resource utilization dictionary
+            if resource in resource_utilization:
+                resource_utilization[resource] += utilization
+            else:
+                resource_utilization[resource] = utilization
+
+
+def parse_resource_reports(files):
+    """
+    Add up `resource,utilization` lines from the given report files.
+
+    Lines without a comma or with a non-integer utilization are skipped; a file that
+    fails to read is logged and keeps whatever lines were read before the error.
+
+    Returns the {resource: utilization} map.
+    """
+    resource_utilization = {}
+
+    for file in files:
+        try:
+            # Read the CSV file line by line
+            with open(file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    add_resource_report_line(resource_utilization, line)
+        except Exception as e:
+            logger.error(f"Error reading file {file}: {str(e)}")
+
+    return resource_utilization
+
+
+def parse_resource_report_tail(file, offset, final=False):
+    """
+    Parse the complete lines written to a report after `offset` bytes.
+
+    An unterminated last line is left for a later run, since the agent may still be
+    writing it, unless `final` says the file has stopped changing.
+    Returns ({resource: utilization}, new offset).
+    """
+    with open(file, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+
+    end = len(data) if final else data.rfind(b'\n') + 1
+    resource_utilization = {}
+    for line in data[:end].decode('utf-8').splitlines():
+        add_resource_report_line(resource_utilization, line)
+
+    return resource_utilization, offset + end
+
+
+def merge_resource_utilization(partials):
+    """Reduce partial {resource: utilization} maps into one"""
+    merged = {}
+    for partial in partials:
+        for resource, utilization in partial.items():
+            merged[resource] = merged.get(resource, 0) + utilization
+    return merged
+
+
+def get_report_pool():
+    """
+    The process pool shared by every parallel parse in this process.
+
+    Created on first use with settings.RESOURCE_REPORT_WORKERS workers and the spawn
+    start method; the workers are reused by later requests and stopped at exit.
+    """
+    global _report_pool
+    with _report_pool_lock:
+        if _report_pool is None:
+            _report_pool = ProcessPoolExecutor(
+                max_workers=RESOURCE_REPORT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _report_pool
+
+
+def parse_resource_reports_parallel(csv_files, chunk_size=None):
+    """
+    Parse report files on the shared report pool.
+
+    Files are split into chunks of `chunk_size`; each worker builds a partial map for
+    its chunk and the partial maps are merged by reduction.
+    """
+    chunk_size = chunk_size or RESOURCE_REPORT_CHUNK_SIZE
+    chunks = [csv_files[i:i + chunk_size] for i in range(0, len(csv_files), chunk_size)]
+
+    return merge_resource_utilization(get_report_pool().map(parse_resource_reports, chunks))
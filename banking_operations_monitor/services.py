@@ -6,33 +6,24 @@ import requests
 import pandas as pd
 import os
 import glob
+import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.conf import settings
 import logging
-from pymongo import MongoClient
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne, DeleteOne, IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from .metrics import PrometheusMetrics
+from .dependency_graph import DependencyGraph, DependencyCycleError, RequirementsEngine
+from .database import db, collection
+from .cache import entity_caches
+from .reports import parse_resource_reports, parse_resource_report_tail, parse_resource_reports_parallel
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# MongoDB connection
-MONGODB_HOST = getattr(settings, 'MONGODB_HOST', 'mongodb')
-MONGODB_PORT = int(getattr(settings, 'MONGODB_PORT', 27017))
-MONGODB_DATABASE = getattr(settings, 'MONGODB_DATABASE', 'banking_operations_monitor')
-MONGODB_USERNAME = getattr(settings, 'MONGODB_USERNAME', '')
-MONGODB_PASSWORD = getattr(settings, 'MONGODB_PASSWORD', '')
-
-# Establish MongoDB connection
-client = MongoClient(
-    host=MONGODB_HOST,
-    port=MONGODB_PORT,
-    username=MONGODB_USERNAME or None,
-    password=MONGODB_PASSWORD or None,
-    authSource='admin' if MONGODB_USERNAME else None
-)
-
-# Get database
-db = client[MONGODB_DATABASE]
-
 # --- Helper Functions ---
 
 def max_columns_in_csv(filepath):
@@ -52,11 +43,90 @@ def load_csv_with_max_columns(filepath):
         on_bad_lines='skip'  # Skip lines with too many fields
     )
 
+# Snapshot publishing settings
+SNAPSHOT_BATCH_SIZE = int(getattr(settings, 'SNAPSHOT_BATCH_SIZE', 5000))
+
+def index_model_from_info(name, info):
+    """
+    IndexModel recreating an index from its index_information() entry, with every option
+    (collation, text weights and languages, TTL, partial filter, ...) carried over.
+    """
+    options = {key: value for key, value in info.items() if key not in ('v', 'key', 'ns')}
+    keys = []
+    for field, direction in info['key']:
+        if field == '_fts':
+            # A text index reports its fields as _fts/_ftsx; they are listed in its weights
+            keys.extend((text_field, 'text') for text_field in info.get('weights', {}))
+        elif field != '_ftsx':
+            keys.append((field, direction))
+    return IndexModel(keys, name=name, **options)
+
+def publish_snapshot(collection_name, records, indexes=None, batch_size=None):
+    """
+    Atomically replace a collection with a new snapshot.
+    
+    Records are written in batches to a staging collection, which gets the live
+    collection's indexes plus any extra `indexes` (list of IndexModel), and is then
+    swapped in with renameCollection(dropTarget=True). Readers keep seeing the previous
+    snapshot until the swap and never see a partial one.
+    
+    Returns the number of documents published.
+    """
+    started = time.perf_counter()
+    batch_size = batch_size or SNAPSHOT_BATCH_SIZE
+    target = db[collection_name]
+    staging = db[f"{collection_name}_staging_{ObjectId()}"]
+    
+    try:
+        db.create_collection(staging.name)
+        
+        count = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                staging.insert_many(batch, ordered=False)
+                count += len(batch)
+                batch = []
+        if batch:
+            staging.insert_many(batch, ordered=False)
+            count += len(batch)
+        
+        # Rebuild the live collection's indexes on the staging copy before the swap
+        index_models = list(indexes or [])
+        for name, info in target.index_information().items():
+            if name != '_id_':
+                index_models.append(index_model_from_info(name, info))
+        if index_models:
+            staging.create_indexes(index_models)
+        
+        staging.rename(collection_name, dropTarget=True)
+    except Exception:
+        staging.drop()
+        raise
+    
+    # Documents cached from the replaced collection are gone with it
+    for cache in entity_caches.get(collection_name, ()):
+        cache.clear()
+    
+    duration = time.perf_counter() - started
+    PrometheusMetrics.track_snapshot_publish(collection_name, duration, count)
+    logger.info(f"Published {count} documents to {collection_name} in {duration:.3f}s")
+    return count
+
+# Seconds since its last modification after which a report is considered complete
+RESOURCE_REPORT_SETTLE_SECONDS = float(getattr(settings, 'RESOURCE_REPORT_SETTLE_SECONDS', 300))
+
 # Function to consolidate CSV contents
-def consolidate_resource_reports(folder_path="operations/resource_data"):
-    # Create an object to store item quantities
-    resource_utilization = {}
+def consolidate_resource_reports(folder_path="operations/resource_data", parallel=False, chunk_size=None):
+    """
+    Consolidate resource utilization reports in folder_path.
+    
+    - parallel: parse files on the shared report pool instead of the serial loop
+    - chunk_size: files per task, defaulting to settings.RESOURCE_REPORT_CHUNK_SIZE
     
+    Both modes produce the same output.
+    """
     # Get all CSV files in the specified folder
     csv_files = glob.glob(os.path.join(folder_path, "*.csv"))
     
@@ -65,29 +135,10 @@ def consolidate_resource_reports(folder_path="operations/resource_data"):
         return None
     
     # Process each CSV file
-    for file in csv_files:
-        try:
-            # Read the CSV file line by line
-            with open(file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and ',' in line:
-                        # Split the line into resource and utilization
-                        parts = line.split(',', 1)
-                        if len(parts) == 2:
-                            resource = parts[0].strip()
-                            try:
-                                utilization = int(parts[1].strip())
-                                # Add to our resource utilization dictionary
-                                if resource in resource_utilization:
-                                    resource_utilization[resource] += utilization
-                                else:
-                                    resource_utilization[resource] = utilization
-                            except ValueError:
-                                # Skip lines where utilization isn't a valid integer
-                                continue
-        except Exception as e:
-            logger.error(f"Error reading file {file}: {str(e)}")
+    if parallel:
+        resource_utilization = parse_resource_reports_parallel(csv_files, chunk_size)
+    else:
+        resource_utilization = parse_resource_reports(csv_files)
     
     # Convert to DataFrame and sort alphabetically by resource
     if resource_utilization:
@@ -102,8 +153,12 @@ def consolidate_resource_reports(folder_path="operations/resource_data"):
         logger.info(f"Consolidated resource data saved to {output_path}")
         
         # Store in MongoDB
-        db.resource_utilization.delete_many({})  # Clear previous data
-        db.resource_utilization.insert_many(df.to_dict('records'))
+        records = df.to_dict('records')
+        publish_snapshot('resource_utilization', records)
+        PrometheusMetrics.BUSINESS_METRICS.set_utilization(records)
+        # Totals are no longer tracked per file, so the next incremental run starts over
+        db.resource_report_ledger.delete_many({})
+        db.resource_report_journal.delete_many({})
         logger.info("Resource utilization data stored in MongoDB")
         
         return df
@@ -111,10 +166,204 @@ def consolidate_resource_reports(folder_path="operations/resource_data"):
         logger.warning("No valid data found in the resource files")
         return None
 
+def ingest_resource_reports(folder_path="operations/resource_data"):
+    """
+    Incrementally fold resource reports in folder_path into db.resource_utilization.
+    
+    db.resource_report_ledger records each file's identity (device, inode), size, byte
+    offset and contributed totals. Only new files and the appended tails of growing files
+    are parsed, and their deltas are applied with $inc upserts. Replaced, truncated or
+    deleted files have their previous contribution subtracted. A file's unterminated
+    last line is counted once the file has not been modified for
+    RESOURCE_REPORT_SETTLE_SECONDS.
+    
+    The deltas and ledger updates of a run are journaled first, so a run interrupted
+    between the utilization and ledger writes is completed by the next one rather than
+    applied twice.
+    
+    Returns a DataFrame of current totals, or None if there is nothing to report.
+    """
+    recover_resource_report_journal()
+    
+    csv_files = glob.glob(os.path.join(folder_path, "*.csv"))
+    ledger = {entry['path']: entry for entry in db.resource_report_ledger.find({}, {'totals': 0})}
+    
+    if not csv_files and not ledger:
+        logger.warning(f"No CSV files found in {folder_path}")
+        return None
+    ledger_bootstrapped = bool(ledger)
+    
+    # Work out which files changed before loading any per-file totals
+    changed = []
+    now = time.time()
+    for file in csv_files:
+        try:
+            stat = os.stat(file)
+        except OSError as e:
+            logger.error(f"Error reading file {file}: {str(e)}")
+            ledger.pop(file, None)
+            continue
+        entry = ledger.pop(file, None)
+        same_file = (entry is not None and entry['device'] == stat.st_dev
+                     and entry['inode'] == stat.st_ino and stat.st_size >= entry['offset'])
+        settled = now - stat.st_mtime >= RESOURCE_REPORT_SETTLE_SECONDS
+        # Unchanged files are skipped, unless an unterminated last line is now final
+        if same_file and stat.st_size == entry['size'] and (entry['offset'] == stat.st_size or not settled):
+            continue
+        changed.append((file, stat, entry, same_file, settled))
+    removed = list(ledger)
+    
+    if not changed and not removed:
+        logger.info("No new resource report data")
+        return get_resource_utilization()
+    
+    previous_totals = {
+        entry['path']: dict(entry.get('totals', []))
+        for entry in db.resource_report_ledger.find(
+            {'path': {'$in': [file for file, _, entry, _, _ in changed if entry] + removed}},
+            {'path': 1, 'totals': 1}
+        )
+    }
+    
+    deltas = {}
+    ledger_entries = []
+    
+    for file, stat, entry, same_file, settled in changed:
+        totals = previous_totals.get(file, {}) if same_file else {}
+        offset = entry['offset'] if same_file else 0
+        try:
+            partial, offset = parse_resource_report_tail(file, offset, final=settled)
+        except Exception as e:
+            logger.error(f"Error reading file {file}: {str(e)}")
+            continue
+        
+        if entry and not same_file:
+            for resource, utilization in previous_totals.get(file, {}).items():
+                deltas[resource] = deltas.get(resource, 0) - utilization
+        for resource, utilization in partial.items():
+            deltas[resource] = deltas.get(resource, 0) + utilization
+            totals[resource] = totals.get(resource, 0) + utilization
+        
+        ledger_entries.append({
+            'path': file,
+            'device': stat.st_dev,
+            'inode': stat.st_ino,
+            'size': stat.st_size,
+            'offset': offset,
+            'mtime': stat.st_mtime,
+            'totals': list(totals.items()),
+            'last_ingested': datetime.now()
+        })
+    
+    for file in removed:
+        for resource, utilization in previous_totals.get(file, {}).items():
+            deltas[resource] = deltas.get(resource, 0) - utilization
+        ledger_entries.append({'path': file, 'removed': True})
+    
+    if not ledger_bootstrapped:
+        # Totals written by a full consolidation are not tracked per file, so the
+        # first incremental run publishes its totals as a fresh snapshot
+        records = [
+            {'Resource': resource, 'Utilization': utilization}
+            for resource, utilization in sorted(deltas.items())
+        ]
+        publish_snapshot('resource_utilization', records)
+        PrometheusMetrics.BUSINESS_METRICS.set_utilization(records)
+        if ledger_entries:
+            db.resource_report_ledger.bulk_write(resource_report_ledger_writes(ledger_entries), ordered=False)
+    else:
+        journal = {
+            '_id': ObjectId(),
+            'deltas': [[resource, delta] for resource, delta in deltas.items() if delta],
+            'ledger': ledger_entries
+        }
+        db.resource_report_journal.insert_one(journal)
+        apply_resource_report_journal(journal)
+        PrometheusMetrics.BUSINESS_METRICS.add_utilization(deltas)
+    logger.info(f"Ingested {len(changed)} changed and {len(removed)} removed resource reports")
+    
+    df = get_resource_utilization()
+    if df is not None:
+        output_path = 'operations/resource_output.csv'
+        df.to_csv(output_path, index=False, header=False)
+    return df
+
+def resource_report_ledger_writes(entries):
+    """Ledger bulk_write operations for journaled entries (a `removed` entry deletes its path)"""
+    return [
+        DeleteOne({'path': entry['path']}) if entry.get('removed')
+        else UpdateOne({'path': entry['path']}, {'$set': entry}, upsert=True)
+        for entry in entries
+    ]
+
+def apply_resource_report_journal(journal):
+    """
+    Apply one journaled ingest run: utilization deltas, then ledger entries, then drop the journal.
+    
+    Each utilization document remembers the last run applied to it in `ingest_run`, so
+    applying the same journal again leaves resources it already reached unchanged.
+    """
+    run = journal['_id']
+    operations = [
+        UpdateOne(
+            {'Resource': resource},
+            [{'$set': {
+                'Utilization': {'$cond': [
+                    {'$eq': ['$ingest_run', run]},
+                    '$Utilization',
+                    {'$add': [{'$ifNull': ['$Utilization', 0]}, delta]}
+                ]},
+                'ingest_run': run
+            }}],
+            upsert=True
+        )
+        for resource, delta in journal['deltas']
+    ]
+    if operations:
+        db.resource_utilization.bulk_write(operations, ordered=False)
+    if journal['ledger']:
+        db.resource_report_ledger.bulk_write(resource_report_ledger_writes(journal['ledger']), ordered=False)
+    db.resource_report_journal.delete_one({'_id': run})
+
+def recover_resource_report_journal():
+    """Finish ingest runs that were interrupted after journaling"""
+    for journal in db.resource_report_journal.find().sort('_id', 1):
+        logger.warning(f"Completing interrupted resource report ingest {journal['_id']}")
+        apply_resource_report_journal(journal)
+
+def get_resource_utilization():
+    """Current consolidated utilization from MongoDB, sorted by resource"""
+    records = list(db.resource_utilization.find({}, {'_id': 0, 'Resource': 1, 'Utilization': 1}))
+    if not records:
+        return None
+    return pd.DataFrame(records, columns=['Resource', 'Utilization']).sort_values('Resource').reset_index(drop=True)
+
 
 
 # --- Dependency Chain Analysis ---
 
+def build_dependency_graph(df_dependency_book):
+    """
+    Build a DependencyGraph from a dependency book DataFrame.
+    
+    Each row holds a service followed by (resource, quantity) column pairs; a missing
+    quantity counts as 0 and the first empty resource column ends the row.
+    """
+    graph = DependencyGraph()
+    max_fields_dependency_book = df_dependency_book.shape[1]
+    for row in df_dependency_book.itertuples(index=False, name=None):
+        resources = []
+        for i in range(1, max_fields_dependency_book, 2):
+            if pd.isna(row[i]):
+                break
+            if i + 1 < max_fields_dependency_book and not pd.isna(row[i+1]):
+                qty = float(row[i+1])
+            else:
+                qty = 0
+            resources.append((row[i], qty))
+        graph.set_dependencies(row[0], resources)
+    return graph
+
 def generate_dependency_chain(total_csv, dependency_book_csv, resource_location_csv, output_csv):
     """
     Generate the comprehensive list of base resources needed for all operations.
@@ -131,22 +380,8 @@ def generate_dependency_chain(total_csv, dependency_book_csv, resource_location_
     df_dependency_book = load_csv_with_max_columns(dependency_book_csv)
     df_resource_location = load_csv_with_max_columns(resource_location_csv)
     
-    # Build dependency dictionary from dependency_book.csv
-    max_fields_dependency_book = df_dependency_book.shape[1]
-    dependencies = {}
-    for _, row in df_dependency_book.iterrows():
-        service = row[0]
-        resources = []
-        for i in range(1, max_fields_dependency_book, 2):
-            if pd.isna(row[i]):
-                break
-            resource = row[i]
-            if i + 1 < max_fields_dependency_book and not pd.isna(row[i+1]):
-                qty = float(row[i+1])
-            else:
-                qty = 0
-            resources.append((resource, qty))
-        dependencies[service] = resources
+    # Build the dependency graph once from dependency_book.csv
+    graph = build_dependency_graph(df_dependency_book)
 
     # Build top-level dictionary from total_services_dependencies.csv
     top_level = {}
@@ -155,17 +390,8 @@ def generate_dependency_chain(total_csv, dependency_book_csv, resource_location_
         qty = float(row[1])
         top_level[service] = qty
 
-    # Recursively compute base resource requirements
-    requirements = defaultdict(float)
-    def compute_requirements(service, multiplier):
-        if service in dependencies:
-            for resource, qty in dependencies[service]:
-                compute_requirements(resource, qty * multiplier)
-        else:
-            requirements[service] += multiplier
-
-    for service, qty in top_level.items():
-        compute_requirements(service, qty)
+    # Expand top-level demand through the memoized base-resource vectors
+    requirements = graph.expand(top_level)
 
     df_requirements = pd.DataFrame(list(requirements.items()), columns=["Resource", "Total Requirement"])
 
@@ -181,14 +407,255 @@ def generate_dependency_chain(total_csv, dependency_book_csv, resource_location_
     df_output = pd.merge(df_requirements, df_resource_location, on="Resource", how="left")
     df_output = df_output.sort_values("Resource")
     
-    # Save to CSV and MongoDB
+    # Save to CSV and MongoDB, together with the model later edge and demand changes start
+    # from; the lease keeps incremental writes from other processes out of the swap
     df_output.to_csv(output_csv, index=False)
-    db.resource_dependencies.delete_many({})
-    db.resource_dependencies.insert_many(df_output.to_dict('records'))
+    locations = dict(zip(df_resource_location["Resource"], df_resource_location["Location Info"]))
+    with requirements_lock, RequirementsLease() as lease:
+        publish_snapshot('resource_dependencies', df_output.to_dict('records'))
+        save_requirements_model(graph, top_level, locations)
+        requirements_state['engine'] = RequirementsEngine(graph, top_level)
+        requirements_state['locations'] = locations
+        requirements_state['version'] = lease.bump(rebuilt=True)
     logger.info(f"Dependency chain analysis saved to {output_csv} and MongoDB")
     
     return df_output
 
+# --- Incremental Requirement Updates ---
+
+# Requirement writes from all processes are serialized by a lease on db.requirements_state;
+# a holder that dies keeps it for at most REQUIREMENTS_LEASE_TTL seconds
+REQUIREMENTS_LEASE_TTL = int(getattr(settings, 'REQUIREMENTS_LEASE_TTL', 120))
+REQUIREMENTS_LEASE_TIMEOUT = float(getattr(settings, 'REQUIREMENTS_LEASE_TIMEOUT', 10))
+
+# This process's engine, valid while `version` matches db.requirements_state
+requirements_state = {'engine': None, 'locations': {}, 'version': None}
+requirements_lock = threading.Lock()
+
+class RequirementsStaleError(RuntimeError):
+    """Raised for incremental requirement changes while the persisted requirements are stale"""
+
+class RequirementsLease:
+    """
+    Cross-process lease on the db.requirements_state document.
+    
+    The document also holds `version`, bumped after every requirements write, so a
+    process holding the lease can tell whether its in-memory engine is still current.
+    `version` is None until a full dependency analysis has run. `stale` holds the reason
+    an incremental update failed part-way; only the next full analysis clears it.
+    """
+    
+    STATE_ID = 'requirements'
+    
+    def __init__(self, ttl=None, timeout=None):
+        self.ttl = REQUIREMENTS_LEASE_TTL if ttl is None else ttl
+        self.timeout = REQUIREMENTS_LEASE_TIMEOUT if timeout is None else timeout
+        self.owner = ObjectId()
+        self.version = None
+        self.stale = None
+    
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            now = datetime.now()
+            try:
+                # Upserting the missing state document and taking a free or expired lease are one
+                # atomic write; a held lease makes the upsert collide on _id instead
+                state = db.requirements_state.find_one_and_update(
+                    {'_id': self.STATE_ID, '$or': [{'lease_owner': None}, {'lease_expires_at': {'$lt': now}}]},
+                    {'$set': {'lease_owner': self.owner, 'lease_expires_at': now + timedelta(seconds=self.ttl)}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                self.version = state.get('version')
+                self.stale = state.get('stale')
+                return self
+            except DuplicateKeyError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError("Timed out waiting for the requirements lease")
+                time.sleep(0.05)
+    
+    def bump(self, rebuilt=False):
+        """Record a completed write and return the new version; rebuilt (a full analysis) also clears `stale`"""
+        update = {'$inc': {'version': 1}}
+        if rebuilt:
+            update['$unset'] = {'stale': '', 'stale_since': ''}
+        state = db.requirements_state.find_one_and_update(
+            {'_id': self.STATE_ID, 'lease_owner': self.owner},
+            update,
+            return_document=ReturnDocument.AFTER
+        )
+        if state is None:
+            raise RuntimeError("Requirements lease expired before the write completed")
+        self.version = state['version']
+        return self.version
+    
+    def __exit__(self, exc_type, exc, traceback):
+        db.requirements_state.update_one(
+            {'_id': self.STATE_ID, 'lease_owner': self.owner},
+            {'$set': {'lease_owner': None}}
+        )
+
+def mark_requirements_stale(reason):
+    """
+    Record that db.resource_dependencies no longer matches the dependencies, e.g. after a
+    failed incremental update. Incremental changes are refused until a full analysis has run.
+    """
+    logger.error(f"Resource requirements marked stale: {reason}")
+    requirements_state['version'] = None
+    try:
+        db.requirements_state.update_one(
+            # The first failure's reason is kept until the analysis clears it
+            {'_id': RequirementsLease.STATE_ID, 'version': {'$ne': None}, 'stale': {'$exists': False}},
+            {'$set': {'stale': reason, 'stale_since': datetime.now()}}
+        )
+    except Exception as e:
+        logger.error(f"Could not mark resource requirements stale: {str(e)}")
+
+def save_requirements_model(graph, demand, locations):
+    """
+    Persist the dependency graph, top-level demand and resource locations of a full run
+    to db.requirement_edges / db.requirement_nodes, for load_requirements_model.
+    """
+    publish_snapshot('requirement_edges', (
+        {'parent': parent, 'child': child, 'quantity': quantity}
+        for parent, edges in graph.children.items()
+        for child, quantity in edges.items()
+    ))
+    
+    # Nodes with a dependency entry are never base resources, even with no edges left
+    nodes = {}
+    for node in graph.children:
+        nodes.setdefault(node, {'name': node})['composite'] = True
+    for node, quantity in demand.items():
+        nodes.setdefault(node, {'name': node})['demand'] = quantity
+    for resource, location in locations.items():
+        nodes.setdefault(resource, {'name': resource})['location'] = location
+    publish_snapshot('requirement_nodes', nodes.values())
+
+def load_requirements_model():
+    """Rebuild (engine, locations) from the model persisted by the last full run and later changes"""
+    graph = DependencyGraph()
+    dependencies = {}
+    demand = {}
+    locations = {}
+    for node in db.requirement_nodes.find({}, {'_id': 0}):
+        if node.get('composite'):
+            dependencies.setdefault(node['name'], [])
+        if 'demand' in node:
+            demand[node['name']] = node['demand']
+        if 'location' in node:
+            locations[node['name']] = node['location']
+    for edge in db.requirement_edges.find({}, {'_id': 0}):
+        dependencies.setdefault(edge['parent'], []).append((edge['child'], edge['quantity']))
+    for node, edges in dependencies.items():
+        graph.set_dependencies(node, edges)
+    return RequirementsEngine(graph, demand), locations
+
+def write_requirement_changes(changes):
+    """
+    Write changed requirement rows to db.resource_dependencies in one bulk_write.
+    
+    - changes: {resource: new total}, where None removes the row
+    """
+    operations = []
+    for resource, total in changes.items():
+        if total is None:
+            operations.append(DeleteOne({"Resource": resource}))
+        else:
+            operations.append(UpdateOne(
+                {"Resource": resource},
+                {
+                    "$set": {"Total Requirement": total},
+                    "$setOnInsert": {"Location Info": requirements_state['locations'].get(resource)}
+                },
+                upsert=True
+            ))
+    if operations:
+        db.resource_dependencies.bulk_write(operations, ordered=False)
+    return changes
+
+def apply_requirement_changes(edges=(), demand=()):
+    """
+    Apply dependency edge and top-level demand changes to the resource requirements.
+    
+    - edges: (service, resource, quantity per unit) triples, quantity None removes the edge
+    - demand: (service, quantity) pairs
+    
+    Runs under the requirements lease against an engine that is first rebuilt from the
+    persisted model if another process has written since, then persists the changed
+    edges, demand and requirement rows. Edges that would close a cycle are logged and
+    skipped. Returns the changed rows, or None when no full analysis has run yet; raises
+    RequirementsStaleError while an earlier failure has left the requirements stale.
+    """
+    with requirements_lock, RequirementsLease() as lease:
+        if lease.version is None:
+            return None
+        if lease.stale:
+            raise RequirementsStaleError(f"Resource requirements are stale until the next dependency analysis: {lease.stale}")
+        if requirements_state['version'] != lease.version:
+            requirements_state['engine'], requirements_state['locations'] = load_requirements_model()
+            requirements_state['version'] = lease.version
+        engine = requirements_state['engine']
+        
+        changes = {}
+        edge_writes = []
+        node_writes = []
+        try:
+            for service, resource, quantity in edges:
+                if quantity is None:
+                    changes.update(engine.remove_edge(service, resource))
+                    edge_writes.append(DeleteOne({'parent': service, 'child': resource}))
+                    continue
+                try:
+                    changes.update(engine.set_edge(service, resource, quantity))
+                except DependencyCycleError as e:
+                    logger.error(f"Requirements not updated for {service} -> {resource}: {str(e)}")
+                    continue
+                edge_writes.append(UpdateOne(
+                    {'parent': service, 'child': resource},
+                    {'$set': {'quantity': float(quantity)}},
+                    upsert=True
+                ))
+                node_writes.append(UpdateOne({'name': service}, {'$set': {'composite': True}}, upsert=True))
+            for service, quantity in demand:
+                changes.update(engine.set_demand(service, quantity))
+                node_writes.append(UpdateOne({'name': service}, {'$set': {'demand': float(quantity)}}, upsert=True))
+            
+            if edge_writes:
+                db.requirement_edges.bulk_write(edge_writes, ordered=False)
+            if node_writes:
+                db.requirement_nodes.bulk_write(node_writes, ordered=False)
+            write_requirement_changes(changes)
+            requirements_state['version'] = lease.bump()
+        except Exception as e:
+            # Part of the change may be persisted and the engine may be ahead of it
+            mark_requirements_stale(f"incremental update failed: {str(e)}")
+            raise
+        return changes
+
+def update_dependency_requirement(service, resource, quantity_required=None):
+    """
+    Apply one dependency edge change to the resource requirements incrementally.
+    
+    - quantity_required: new quantity per unit of service, or None to remove the edge
+    
+    Returns the changed rows, or None when no full analysis has run yet.
+    """
+    return apply_requirement_changes(edges=[(service, resource, quantity_required)])
+
+def update_dependency_requirements(edges):
+    """Apply many (service, resource, quantity_required) edge changes in one pass, see update_dependency_requirement"""
+    return apply_requirement_changes(edges=edges)
+
+def update_top_level_demand(service, quantity):
+    """
+    Change the top-level demand for a service and update the affected requirements.
+    
+    Returns the changed rows, or None when no full analysis has run yet.
+    """
+    return apply_requirement_changes(demand=[(service, quantity)])
+
 # --- Service List Generation ---
 
 def get_service_list(total_csv):
@@ -201,35 +668,90 @@ def get_service_list(total_csv):
     df_services = df_services.sort_values(by=0)
     df_services.rename(columns={0: "Service", 1: "Required Resources"}, inplace=True)
     
-    # Store in MongoDB
-    db.services.delete_many({})
-    db.services.insert_many(df_services.to_dict('records'))
+    # Store in MongoDB; kept apart from the services managed by ServiceManager, whose
+    # unique name index these rows do not satisfy
+    publish_snapshot('service_list', df_services.to_dict('records'))
     logger.info("Service list updated in MongoDB")
     
     return df_services
 
 # --- Vendor API Integration ---
 
-def fetch_vendor_pricing(resource_id, datacenter, pricing_columns):
+PRICING_API_URL = getattr(settings, 'PRICING_API_URL', 'https://pricing.internal-api.bank/v2/pricing')
+PRICING_FETCH_MAX_IN_FLIGHT = int(getattr(settings, 'PRICING_FETCH_MAX_IN_FLIGHT', 16))
+PRICING_FETCH_RATE_LIMIT = float(getattr(settings, 'PRICING_FETCH_RATE_LIMIT', 20))
+PRICING_FETCH_BURST = int(getattr(settings, 'PRICING_FETCH_BURST', 20))
+PRICING_FETCH_TIMEOUT = float(getattr(settings, 'PRICING_FETCH_TIMEOUT', 10))
+PRICING_CACHE_TTL = int(getattr(settings, 'PRICING_CACHE_TTL', 86400))
+PRICING_CACHE_STALE_TTL = int(getattr(settings, 'PRICING_CACHE_STALE_TTL', 3600))
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` acquisitions per second with bursts up to `capacity`."""
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, self.rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available. A non-positive rate never blocks."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def fetch_vendor_pricing_conditional(resource_id, datacenter, pricing_columns, etag=None, last_modified=None,
+                                     session=None, base_url=None, timeout=None):
     """
-    Query vendor API for pricing data on a given resource.
+    Query vendor API for pricing data, revalidating with If-None-Match / If-Modified-Since
+    when an ETag / Last-Modified value from a previous response is supplied.
     
-    Returns a dictionary with pricing data (or None values on failure).
+    Returns a dictionary with:
+    - status: 'modified', 'not_modified' or 'error'
+    - pricing: pricing data for 'modified' (None values otherwise)
+    - etag / last_modified: validators sent by the upstream, if any
     """
-    url = f"https://pricing.internal-api.bank/v2/pricing/{datacenter}/{resource_id}"
+    url = f"{base_url or PRICING_API_URL}/{datacenter}/{resource_id}"
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    
+    result = {
+        'status': 'error',
+        'pricing': {col: None for col in pricing_columns},
+        'etag': None,
+        'last_modified': None
+    }
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
+        response = (session or requests).get(url, headers=headers, timeout=timeout or PRICING_FETCH_TIMEOUT)
+        result['etag'] = response.headers.get('ETag')
+        result['last_modified'] = response.headers.get('Last-Modified')
+        if response.status_code == 304:
+            result['status'] = 'not_modified'
+        elif response.status_code == 200:
             data = response.json()
             if "results" in data and len(data["results"]) > 0:
-                result = data["results"][0]
-                return {
-                    "list_price": result.get("standard", {}).get("listPrice", None),
-                    "negotiated_price": result.get("standard", {}).get("ourPrice", None),
-                    "recent_purchase": result.get("standard", {}).get("recentPurchase", None),
-                    "recent_quote": result.get("standard", {}).get("recentQuote", None),
-                    "average_market_price": result.get("standard", {}).get("marketAverage", None),
-                    "monthly_usage": result.get("standard", {}).get("monthlyUsage", None),
+                standard = data["results"][0].get("standard", {})
+                result['status'] = 'modified'
+                result['pricing'] = {
+                    "list_price": standard.get("listPrice", None),
+                    "negotiated_price": standard.get("ourPrice", None),
+                    "recent_purchase": standard.get("recentPurchase", None),
+                    "recent_quote": standard.get("recentQuote", None),
+                    "average_market_price": standard.get("marketAverage", None),
+                    "monthly_usage": standard.get("monthlyUsage", None),
                 }
             else:
                 logger.warning(f"No results found for resource ID {resource_id}")
@@ -237,7 +759,195 @@ def fetch_vendor_pricing(resource_id, datacenter, pricing_columns):
             logger.error(f"Error fetching data for resource ID {resource_id}. Status code: {response.status_code}")
     except Exception as e:
         logger.error(f"Exception for resource ID {resource_id}: {e}")
-    return {col: None for col in pricing_columns}
+    return result
+
+def fetch_vendor_pricing(resource_id, datacenter, pricing_columns, session=None, base_url=None, timeout=None):
+    """
+    Query vendor API for pricing data on a given resource.
+    
+    - session: optional requests.Session to reuse connections
+    - base_url: pricing API root, defaults to settings.PRICING_API_URL
+    - timeout: per-request timeout in seconds, defaults to settings.PRICING_FETCH_TIMEOUT
+    
+    Returns a dictionary with pricing data (or None values on failure).
+    """
+    return fetch_vendor_pricing_conditional(
+        resource_id, datacenter, pricing_columns,
+        session=session, base_url=base_url, timeout=timeout
+    )['pricing']
+
+class PricingCache:
+    """
+    Persistent vendor pricing cache stored in MongoDB, keyed by (datacenter, resource_id).
+    
+    Entries younger than `ttl` seconds are fresh and served without contacting the vendor.
+    Entries up to `stale_ttl` seconds past expiry are stale: they are still served but get
+    revalidated. Older or missing entries are misses and must be fetched. Revalidation is
+    conditional whenever the upstream supplied an ETag or Last-Modified header, and a failed
+    revalidation keeps serving the cached data.
+    """
+    
+    HIT = 'hit'
+    STALE = 'stale'
+    MISS = 'miss'
+    
+    def __init__(self, collection, ttl=None, stale_ttl=None):
+        self.collection = collection
+        self.ttl = PRICING_CACHE_TTL if ttl is None else ttl
+        self.stale_ttl = PRICING_CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+        self.revalidating = set()
+        self.lock = threading.Lock()
+    
+    def state(self, entry, now=None):
+        """Classify a cache entry as hit, stale or miss"""
+        if not entry or not entry.get('fetched_at'):
+            return self.MISS
+        age = ((now or datetime.now()) - entry['fetched_at']).total_seconds()
+        if age < self.ttl:
+            return self.HIT
+        if age < self.ttl + self.stale_ttl:
+            return self.STALE
+        return self.MISS
+    
+    def load(self, datacenter, resource_ids):
+        """Load cache entries for many resources in one query, keyed by resource_id"""
+        return {
+            entry['resource_id']: entry
+            for entry in self.collection.find({'datacenter': datacenter, 'resource_id': {'$in': list(resource_ids)}})
+        }
+    
+    def revalidate(self, resource_id, datacenter, pricing_columns, entry=None, **kwargs):
+        """Fetch (conditionally when possible) and store pricing for one resource"""
+        entry = entry or {}
+        response = fetch_vendor_pricing_conditional(
+            resource_id, datacenter, pricing_columns,
+            etag=entry.get('etag'),
+            last_modified=entry.get('last_modified'),
+            **kwargs
+        )
+        
+        if response['status'] == 'error':
+            return entry.get('pricing') or response['pricing']
+        
+        update = {
+            'fetched_at': datetime.now(),
+            'etag': response['etag'] or entry.get('etag'),
+            'last_modified': response['last_modified'] or entry.get('last_modified')
+        }
+        if response['status'] == 'modified':
+            update['pricing'] = response['pricing']
+        
+        self.collection.update_one(
+            {'datacenter': datacenter, 'resource_id': resource_id},
+            {'$set': update},
+            upsert=True
+        )
+        
+        if response['status'] == 'not_modified' and entry.get('pricing'):
+            return entry['pricing']
+        return response['pricing']
+    
+    def get(self, resource_id, datacenter, pricing_columns, **kwargs):
+        """Return pricing for one resource, serving stale data while revalidating in the background"""
+        entry = self.collection.find_one({'datacenter': datacenter, 'resource_id': resource_id})
+        state = self.state(entry)
+        PrometheusMetrics.track_pricing_cache(state)
+        
+        if state == self.HIT:
+            return entry['pricing']
+        
+        if state == self.STALE:
+            self.revalidate_in_background([(resource_id, resource_id)], datacenter, pricing_columns,
+                                          {resource_id: entry}, base_url=kwargs.get('base_url'),
+                                          timeout=kwargs.get('timeout'))
+            return entry['pricing']
+        
+        return self.revalidate(resource_id, datacenter, pricing_columns, entry, **kwargs)
+    
+    def revalidate_in_background(self, items, datacenter, pricing_columns, entries, on_result=None,
+                                 base_url=None, timeout=None):
+        """
+        Revalidate stale entries on a daemon thread through the rate-limited concurrent fetcher.
+        
+        - items: (key, resource_id) pairs; resources already being revalidated are skipped
+        - entries: cached entries keyed by resource_id, used for conditional requests
+        - on_result: optional callable(key, pricing_data) run as each revalidation completes
+        - base_url / timeout: forwarded to the vendor fetch
+        """
+        with self.lock:
+            claimed = [(key, item_id) for key, item_id in items if (datacenter, item_id) not in self.revalidating]
+            self.revalidating.update((datacenter, item_id) for _, item_id in claimed)
+        if not claimed:
+            return None
+        
+        def revalidate(item_id, **kwargs):
+            try:
+                return self.revalidate(item_id, datacenter, pricing_columns, entries.get(item_id), **kwargs)
+            finally:
+                with self.lock:
+                    self.revalidating.discard((datacenter, item_id))
+        
+        def background():
+            try:
+                for key, pricing_data in fetch_pricing_concurrently(claimed, datacenter, pricing_columns,
+                                                                    timeout=timeout, base_url=base_url,
+                                                                    fetch=revalidate):
+                    if on_result:
+                        on_result(key, pricing_data)
+            except Exception as e:
+                logger.error(f"Background pricing revalidation failed: {e}")
+            finally:
+                # Items never reached (e.g. after an error) must not stay claimed
+                with self.lock:
+                    self.revalidating.difference_update((datacenter, item_id) for _, item_id in claimed)
+        
+        thread = threading.Thread(target=background, daemon=True)
+        thread.start()
+        return thread
+
+pricing_cache = PricingCache(collection('pricing_cache'))
+
+def fetch_pricing_concurrently(items, datacenter, pricing_columns, max_in_flight=None,
+                               rate_limit=None, burst=None, timeout=None, base_url=None, fetch=None):
+    """
+    Fetch vendor pricing for many items on a thread pool.
+    
+    - items: iterable of (key, item_id) pairs; key is passed back with the result
+    - max_in_flight: maximum concurrent requests (settings.PRICING_FETCH_MAX_IN_FLIGHT)
+    - rate_limit / burst: token bucket shared by all workers (settings.PRICING_FETCH_RATE_LIMIT/BURST)
+    - timeout / base_url: forwarded to the fetch function
+    - fetch: optional callable(item_id, **kwargs) used instead of fetch_vendor_pricing
+    
+    Yields (key, pricing_data) pairs in completion order so results can be written as they arrive.
+    """
+    bucket = TokenBucket(
+        PRICING_FETCH_RATE_LIMIT if rate_limit is None else rate_limit,
+        burst or PRICING_FETCH_BURST
+    )
+    local = threading.local()
+    sessions = []
+    sessions_lock = threading.Lock()
+    
+    def worker(item_id):
+        # One session per worker thread keeps connections alive between requests
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+            with sessions_lock:
+                sessions.append(local.session)
+        bucket.acquire()
+        if fetch:
+            return fetch(item_id, session=local.session, base_url=base_url, timeout=timeout)
+        return fetch_vendor_pricing(item_id, datacenter, pricing_columns,
+                                    session=local.session, base_url=base_url, timeout=timeout)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max_in_flight or PRICING_FETCH_MAX_IN_FLIGHT) as executor:
+            futures = {executor.submit(worker, item_id): key for key, item_id in items}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    finally:
+        for session in sessions:
+            session.close()
 
 def fetch_pricing_for_all_resources(resources_csv, services_csv, resource_ids_json, output_csv, datacenter="PRIMARY"):
     """
@@ -295,52 +1005,99 @@ def fetch_pricing_for_all_resources(resources_csv, services_csv, resource_ids_js
     for col in pricing_columns:
         df_combined[col] = None
 
-    # Fetch pricing data for each item
+    # Serve fresh and stale items from the pricing cache; only expired ones are fetched now
+    items = []
     for idx, row in df_combined.iterrows():
-        item_id = row["Item ID"]
-        if item_id is not None:
-            pricing_data = fetch_vendor_pricing(item_id, datacenter, pricing_columns)
-            for key, value in pricing_data.items():
-                df_combined.at[idx, key] = value
-            time.sleep(0.5)  # Rate limiting
+        if row["Item ID"] is not None:
+            items.append((idx, row["Item ID"]))
         else:
             logger.warning(f"Skipping pricing query for '{row['Item Name']}' due to missing ID.")
-
-    # Save to CSV and MongoDB
+    
+    def store(idx, pricing_data):
+        for key, value in pricing_data.items():
+            df_combined.at[idx, key] = value
+        record = df_combined.loc[idx].to_dict()
+        db.resource_pricing.update_one(
+            {"Item Name": record["Item Name"]},
+            {"$set": record},
+            upsert=True
+        )
+        PrometheusMetrics.BUSINESS_METRICS.update_pricing(record)
+    
+    def record_name(idx):
+        return df_combined.at[idx, "Item Name"]
+    
+    def refresh(item_name, pricing_data):
+        # Stale items were served from the cache; update their rows once revalidated
+        record = db.resource_pricing.find_one_and_update(
+            {"Item Name": item_name},
+            {"$set": pricing_data},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if record:
+            PrometheusMetrics.BUSINESS_METRICS.update_pricing(record)
+    
+    cached = pricing_cache.load(datacenter, {item_id for _, item_id in items})
+    stale = []
+    expired = []
+    for idx, item_id in items:
+        entry = cached.get(item_id)
+        state = pricing_cache.state(entry)
+        PrometheusMetrics.track_pricing_cache(state)
+        if state == PricingCache.MISS:
+            expired.append((idx, item_id))
+        else:
+            store(idx, entry['pricing'])
+            if state == PricingCache.STALE:
+                stale.append((record_name(idx), item_id))
+    
+    def revalidate(item_id, **kwargs):
+        return pricing_cache.revalidate(item_id, datacenter, pricing_columns, cached.get(item_id), **kwargs)
+    
+    for idx, pricing_data in fetch_pricing_concurrently(expired, datacenter, pricing_columns, fetch=revalidate):
+        store(idx, pricing_data)
+    
+    if stale:
+        pricing_cache.revalidate_in_background(stale, datacenter, pricing_columns, cached, on_result=refresh)
+    
+    # Save to CSV and MongoDB, dropping items no longer in the catalog
     df_combined.to_csv(output_csv, index=False)
-    db.resource_pricing.delete_many({})
-    db.resource_pricing.insert_many(df_combined.to_dict('records'))
+    fetched = {idx for idx, _ in items}
+    skipped = [record for idx, record in zip(df_combined.index, df_combined.to_dict('records')) if idx not in fetched]
+    if skipped:
+        db.resource_pricing.bulk_write([
+            UpdateOne({"Item Name": record["Item Name"]}, {"$set": record}, upsert=True)
+            for record in skipped
+        ], ordered=False)
+        for record in skipped:
+            PrometheusMetrics.BUSINESS_METRICS.update_pricing(record)
+    db.resource_pricing.delete_many({"Item Name": {"$nin": df_combined["Item Name"].tolist()}})
+    PrometheusMetrics.BUSINESS_METRICS.retain_pricing(df_combined["Item Name"].tolist())
     logger.info(f"Resource pricing data saved to {output_csv} and MongoDB")
     
     return df_combined
 
 # --- Prometheus Metrics Export ---
 
+def load_business_metrics():
+    """Utilization and pricing records that seed the business metrics collector"""
+    utilization = list(db.resource_utilization.find({}, {'_id': 0, 'Resource': 1, 'Utilization': 1}))
+    pricing = list(db.resource_pricing.find(
+        {}, {'_id': 0, 'Item Name': 1, 'Category': 1, 'negotiated_price': 1, 'monthly_usage': 1}
+    ))
+    return utilization, pricing
+
+PrometheusMetrics.BUSINESS_METRICS.loader = load_business_metrics
+
 def export_prometheus_metrics():
-    """Export metrics for Prometheus scraping"""
-    # Get all resource utilization data
-    resources = list(db.resource_utilization.find({}))
-    
-    # Create metrics output
-    metrics = []
-    
-    # Resource utilization metrics
-    for resource in resources:
-        resource_name = resource.get('Resource', '').replace(' ', '_').lower()
-        utilization = resource.get('Utilization', 0)
-        metrics.append(f'bank_resource_utilization{{resource="{resource_name}"}} {utilization}')
-    
-    # Resource pricing metrics
-    pricing_data = list(db.resource_pricing.find({}))
-    for item in pricing_data:
-        item_name = item.get('Item Name', '').replace(' ', '_').lower()
-        category = item.get('Category', '')
-        
-        if item.get('negotiated_price'):
-            metrics.append(f'bank_resource_price{{item="{item_name}",category="{category}"}} {item.get("negotiated_price")}')
-        
-        if item.get('monthly_usage'):
-            metrics.append(f'bank_resource_monthly_usage{{item="{item_name}",category="{category}"}} {item.get("monthly_usage")}')
+    """
+    Write the business metrics to prometheus_metrics/resource_metrics.prom.
+    
+    The same series are served live on /metrics by PrometheusMetrics.BUSINESS_METRICS;
+    this renders its in-memory snapshot, so no collections are read.
+    """
+    metrics = PrometheusMetrics.BUSINESS_METRICS.lines()
     
     # Write metrics to file for Prometheus to scrape
     metrics_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prometheus_metrics', 'resource_metrics.prom')
@@ -350,4 +1107,4 @@ def export_prometheus_metrics():
         f.write('\n'.join(metrics))
     
     logger.info(f"Prometheus metrics exported to {metrics_path}")
-    return metrics
\ No newline at end of file
+    return metrics
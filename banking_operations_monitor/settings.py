@@ -4,6 +4,7 @@ Django settings for banking_operations_monitor project.
 Generated by 'django-admin startproject' using Django 5.1.7.
 """
 import os
+import json
 import pymongo
 from pathlib import Path
 
@@ -72,6 +73,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # Mongo documents (ObjectId, datetime) are encoded by orjson rather than the stdlib encoder
+    'DEFAULT_RENDERER_CLASSES': [
+        'banking_operations_monitor.renderers.MongoJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
@@ -84,6 +90,102 @@ MONGODB_DATABASE = os.environ.get('MONGODB_DATABASE', 'banking_operations_monito
 MONGODB_USERNAME = os.environ.get('MONGODB_USERNAME', '')
 MONGODB_PASSWORD = os.environ.get('MONGODB_PASSWORD', '')
 
+# MongoDB connection pool shared by every module (see database.py); timeouts are in
+# milliseconds, and compressors is a comma-separated list such as 'zstd,zlib' (empty disables)
+MONGODB_MAX_POOL_SIZE = int(os.environ.get('MONGODB_MAX_POOL_SIZE', 100))
+MONGODB_MIN_POOL_SIZE = int(os.environ.get('MONGODB_MIN_POOL_SIZE', 0))
+MONGODB_MAX_IDLE_TIME_MS = int(os.environ.get('MONGODB_MAX_IDLE_TIME_MS', 0)) or None
+MONGODB_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGODB_CONNECT_TIMEOUT_MS', 20000))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 30000))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGODB_SOCKET_TIMEOUT_MS', 0)) or None
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGODB_WAIT_QUEUE_TIMEOUT_MS', 0)) or None
+MONGODB_COMPRESSORS = os.environ.get('MONGODB_COMPRESSORS', '')
+
+# Timeout in seconds for the health check ping
+HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', 1))
+
+# In-process LRU cache for ResourceManager/ServiceManager find_by_id and find_by_name:
+# entries per cache (0, the default, disables it) and seconds before an entry expires.
+# Writes through the managers invalidate entries in their own process; other processes'
+# writes are only seen after the TTL unless ENTITY_CACHE_CHANGE_STREAM is on (requires a
+# replica set)
+ENTITY_CACHE_SIZE = int(os.environ.get('ENTITY_CACHE_SIZE', 0))
+ENTITY_CACHE_TTL = float(os.environ.get('ENTITY_CACHE_TTL', 30))
+ENTITY_CACHE_CHANGE_STREAM = os.environ.get('ENTITY_CACHE_CHANGE_STREAM', 'false').lower() in ('1', 'true', 'yes')
+
+# Serve the read-heavy endpoints (resource/service detail, alert and pricing lists, health)
+# as async views on AsyncMongoClient. Only enable under an ASGI server, e.g.
+# uvicorn banking_operations_monitor.asgi:application
+ASYNC_API_VIEWS = os.environ.get('ASYNC_API_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+
+# Vendor pricing API settings
+# Rate limit is in requests per second (0 disables it); timeout is per request in seconds
+PRICING_API_URL = os.environ.get('PRICING_API_URL', 'https://pricing.internal-api.bank/v2/pricing')
+PRICING_FETCH_MAX_IN_FLIGHT = int(os.environ.get('PRICING_FETCH_MAX_IN_FLIGHT', 16))
+PRICING_FETCH_RATE_LIMIT = float(os.environ.get('PRICING_FETCH_RATE_LIMIT', 20))
+PRICING_FETCH_BURST = int(os.environ.get('PRICING_FETCH_BURST', 20))
+PRICING_FETCH_TIMEOUT = float(os.environ.get('PRICING_FETCH_TIMEOUT', 10))
+
+# Vendor pricing cache: entries are fresh for PRICING_CACHE_TTL seconds, then served
+# stale for up to PRICING_CACHE_STALE_TTL more seconds while they are revalidated
+PRICING_CACHE_TTL = int(os.environ.get('PRICING_CACHE_TTL', 86400))
+PRICING_CACHE_STALE_TTL = int(os.environ.get('PRICING_CACHE_STALE_TTL', 3600))
+
+# Resource report consolidation: process pool size and files handed to each task
+RESOURCE_REPORT_WORKERS = int(os.environ.get('RESOURCE_REPORT_WORKERS', os.cpu_count() or 1))
+RESOURCE_REPORT_CHUNK_SIZE = int(os.environ.get('RESOURCE_REPORT_CHUNK_SIZE', 8))
+
+# Incremental report ingestion counts a file's unterminated last line once the file has
+# not been modified for this many seconds
+RESOURCE_REPORT_SETTLE_SECONDS = float(os.environ.get('RESOURCE_REPORT_SETTLE_SECONDS', 300))
+
+# Lease serializing resource requirement writes across processes: seconds a holder keeps
+# it, and seconds a writer waits for it before failing
+REQUIREMENTS_LEASE_TTL = int(os.environ.get('REQUIREMENTS_LEASE_TTL', 120))
+REQUIREMENTS_LEASE_TIMEOUT = float(os.environ.get('REQUIREMENTS_LEASE_TIMEOUT', 10))
+
+# Documents per insert batch when publishing a collection snapshot
+SNAPSHOT_BATCH_SIZE = int(os.environ.get('SNAPSHOT_BATCH_SIZE', 5000))
+
+# Days of raw usage history kept in the usage_history time-series collection
+USAGE_HISTORY_RETENTION_DAYS = int(os.environ.get('USAGE_HISTORY_RETENTION_DAYS', 90))
+
+# Usage telemetry ingest: buffered samples are flushed once this many are waiting
+# or the oldest has waited this many seconds; a failed batch is retried with backoff
+# up to USAGE_INGEST_MAX_ATTEMPTS writes before it is dropped
+USAGE_INGEST_FLUSH_SIZE = int(os.environ.get('USAGE_INGEST_FLUSH_SIZE', 5000))
+USAGE_INGEST_FLUSH_INTERVAL = float(os.environ.get('USAGE_INGEST_FLUSH_INTERVAL', 1.0))
+USAGE_INGEST_MAX_ATTEMPTS = int(os.environ.get('USAGE_INGEST_MAX_ATTEMPTS', 5))
+
+# Capacity forecasting: resources trending to total_capacity within the horizon are
+# reported, fitted over the lookback window of usage rollups (minute, hour or day);
+# those within the alert threshold get CAPACITY alerts
+CAPACITY_FORECAST_HORIZON_DAYS = float(os.environ.get('CAPACITY_FORECAST_HORIZON_DAYS', 30))
+CAPACITY_FORECAST_LOOKBACK_DAYS = float(os.environ.get('CAPACITY_FORECAST_LOOKBACK_DAYS', 14))
+CAPACITY_FORECAST_GRANULARITY = os.environ.get('CAPACITY_FORECAST_GRANULARITY', 'day')
+CAPACITY_ALERT_THRESHOLD_DAYS = float(os.environ.get('CAPACITY_ALERT_THRESHOLD_DAYS', 14))
+
+# Alert rules evaluated over all resources by /api/v1/alerts/evaluate/, as a JSON list of
+# {name, metric (utilization_pct, current_utilization or total_capacity), op, threshold,
+# category (optional), severity, alert_type} objects
+ALERT_RULES = json.loads(os.environ.get('ALERT_RULES', 'null')) or [
+    {'name': 'compute-utilization-high', 'metric': 'utilization_pct', 'op': '>', 'threshold': 90,
+     'category': 'COMPUTE', 'severity': 'HIGH'},
+    {'name': 'storage-utilization-high', 'metric': 'utilization_pct', 'op': '>', 'threshold': 85,
+     'category': 'STORAGE', 'severity': 'HIGH'},
+    {'name': 'utilization-over-capacity', 'metric': 'utilization_pct', 'op': '>=', 'threshold': 100,
+     'severity': 'CRITICAL'},
+]
+
+# Seconds after which /metrics reloads the business metrics snapshot from MongoDB
+BUSINESS_METRICS_REFRESH_INTERVAL = float(os.environ.get('BUSINESS_METRICS_REFRESH_INTERVAL', 60))
+
+# Request instrumentation: latency histogram buckets in seconds (comma-separated,
+# empty uses the prometheus_client defaults) and paths left uninstrumented,
+# e.g. PROMETHEUS_SKIP_PATHS=/metrics/,/health/
+PROMETHEUS_LATENCY_BUCKETS = [float(bucket) for bucket in os.environ.get('PROMETHEUS_LATENCY_BUCKETS', '').split(',') if bucket.strip()]
+PROMETHEUS_SKIP_PATHS = [path.strip() for path in os.environ.get('PROMETHEUS_SKIP_PATHS', '').split(',') if path.strip()]
+
 # Django requires a database setting, even if you're using PyMongo directly
 # We can use SQLite for Django's internal operations (admin, sessions, etc.)
 DATABASES = {
@@ -1,8 +1,25 @@
-from django.urls import path, include
+from django.urls import path, include, register_converter
+from django.conf import settings
 from django.contrib import admin
 from rest_framework.documentation import include_docs_urls
 from banking_operations_monitor.metrics import PrometheusMetrics
-from . import views
+from . import views, async_views
+
+class ObjectIdConverter:
+    """Path segment holding a 24-hex ObjectId, so ids never shadow literal routes"""
+    regex = '[0-9a-fA-F]{24}'
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return str(value)
+
+
+register_converter(ObjectIdConverter, 'objectid')
+
+# Read-heavy endpoints served by async views on the async Mongo driver (ASGI deployments)
+read_views = async_views if getattr(settings, 'ASYNC_API_VIEWS', False) else views
 
 # API URL patterns
 api_patterns = [
@@ -11,25 +28,30 @@ api_patterns = [
     
     # Resource management endpoints
     path('resources/', views.resource_list, name='resource-list'),
-    path('resources/<int:pk>/', views.resource_detail, name='resource-detail'),
+    path('resources/<objectid:pk>/', read_views.resource_detail, name='resource-detail'),
+    path('resources/capacity-forecast/', views.capacity_forecast, name='capacity-forecast'),
+    path('resources/<objectid:pk>/usage/', views.resource_usage, name='resource-usage'),
+    path('usage/ingest/', views.ingest_usage, name='ingest-usage'),
     path('resources/import/', views.import_resources, name='import-resources'),
     path('resources/process-reports/', views.process_resource_reports, name='process-resource-reports'),
     
     # Service management endpoints
     path('services/', views.service_list, name='service-list'),
-    path('services/<int:pk>/', views.service_detail, name='service-detail'),
+    path('services/<objectid:pk>/', read_views.service_detail, name='service-detail'),
     path('services/import/', views.import_services, name='import-services'),
     path('services/analyze-dependencies/', views.analyze_dependencies, name='analyze-dependencies'),
+    path('services/demand/', views.update_service_demand, name='update-service-demand'),
     
     # Pricing and cost analysis endpoints
-    path('pricing/', views.pricing_list, name='pricing-list'),
+    path('pricing/', read_views.pricing_list, name='pricing-list'),
     path('pricing/update/', views.update_pricing, name='update-pricing'),
-    path('services/<int:pk>/cost-analysis/', views.service_cost_analysis, name='service-cost-analysis'),
+    path('services/<objectid:pk>/cost-analysis/', views.service_cost_analysis, name='service-cost-analysis'),
     
     # Application metrics and monitoring endpoints
     path('metrics/export/', views.export_metrics, name='export-metrics'),
-    path('alerts/', views.alerts_list, name='alerts-list'),
-    path('alerts/<int:pk>/resolve/', views.resolve_alert, name='resolve-alert'),
+    path('alerts/', read_views.alerts_list, name='alerts-list'),
+    path('alerts/evaluate/', views.evaluate_alert_rules, name='evaluate-alert-rules'),
+    path('alerts/<objectid:pk>/resolve/', views.resolve_alert, name='resolve-alert'),
 ]
 
 urlpatterns = [
@@ -37,5 +59,5 @@ urlpatterns = [
     path('api/v1/', include(api_patterns)),
     path('api/docs/', include_docs_urls(title='Banking IT Ops API', public=True)),
     path('metrics/', PrometheusMetrics.metrics_view, name='prometheus_metrics'),
-    path('health/', views.health_check, name='health-check'),
+    path('health/', read_views.health_check, name='health-check'),
 ]
\ No newline at end of file
@@ -11,7 +11,7 @@ import pandas as pd
 import json
 import logging
 from bson import ObjectId
-from datetime import datetime
+from datetime import timedelta
 from bson.json_util import dumps, loads
 
 # Import our PyMongo model managers
@@ -21,38 +21,63 @@ from .models import (
     DependencyManager, 
     PricingManager, 
     UsageHistoryManager, 
-    AlertManager
+    AlertManager,
+    usage_ingest_buffer
 )
 from .services import (
     consolidate_resource_reports,
+    ingest_resource_reports,
     generate_dependency_chain,
     get_service_list,
     fetch_pricing_for_all_resources,
-    export_prometheus_metrics
+    export_prometheus_metrics,
+    update_top_level_demand,
+    RequirementsStaleError
 )
+from .ingest import parse_usage_timestamp, parse_usage_samples
+from .dependency_graph import DependencyCycleError
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .fieldsets import parse_fields, wants, sparse
 
 logger = logging.getLogger(__name__)
 
 # Helper function to serialize MongoDB documents
 def serialize_document(doc):
-    """Convert MongoDB document to JSON-serializable dict"""
+    """
+    Expose a MongoDB document's _id as a string id. ObjectId, datetime and other BSON
+    values are left for MongoJSONRenderer to encode.
+    """
     if doc is None:
         return None
         
     # Handle ObjectId
     if '_id' in doc:
-        doc['id'] = str(doc['_id'])
-        del doc['_id']
-    
-    # Handle datetime objects
-    for key, value in doc.items():
-        if isinstance(value, datetime):
-            doc[key] = value.isoformat()
-        elif isinstance(value, ObjectId):
-            doc[key] = str(value)
+        doc['id'] = str(doc.pop('_id'))
     
     return doc
 
+def page_params(params):
+    """(limit, cursor, fields) from the query params, raising ValueError for bad values"""
+    limit = params.get('limit', str(DEFAULT_PAGE_SIZE))
+    if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be an integer between 1 and {MAX_PAGE_SIZE}')
+    cursor = params.get('cursor', None) or None
+    return int(limit), cursor, parse_fields(params.get('fields', None))
+
+def next_page_link(request, params, next_cursor):
+    """Link header value pointing at the page after next_cursor"""
+    params = params.copy()
+    params['cursor'] = next_cursor
+    next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    return f'<{next_url}>; rel="next"'
+
+def paginated_response(request, data, next_cursor):
+    """Response for one page, linking to the next page (if any) in a Link header"""
+    response = Response(data)
+    if next_cursor:
+        response['Link'] = next_page_link(request, request.query_params, next_cursor)
+    return response
+
 @api_view(['GET'])
 def api_root(request):
     """
@@ -72,65 +97,167 @@ def api_root(request):
 @api_view(['GET'])
 def resource_list(request):
     """
-    List all resources or filter by category
+    List resources, optionally filtered by category, one page (limit, default 100) at a
+    time; the next page is linked in the Link header. fields=a,b returns only those fields
     """
     category = request.query_params.get('category', None)
     
-    resources = ResourceManager.find_all(category=category)
+    try:
+        limit, cursor, fields = page_params(request.query_params)
+        resources, next_cursor = ResourceManager.find_page(category=category, limit=limit, cursor=cursor,
+                                                           fields=fields)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     data = []
     for resource in resources:
         resource_dict = serialize_document(resource)
         # Add utilization percentage
-        resource_dict['utilization_pct'] = ResourceManager.utilization_percentage(resource)
-        data.append(resource_dict)
+        if wants(fields, 'utilization_pct'):
+            resource_dict['utilization_pct'] = ResourceManager.utilization_percentage(resource)
+        data.append(sparse(resource_dict, fields))
     
-    return Response(data)
+    return paginated_response(request, data, next_cursor)
 
 @api_view(['GET'])
 def resource_detail(request, pk):
     """
-    Get detailed information about a specific resource
+    Get detailed information about a specific resource (fields=a,b for only those fields)
     """
     try:
-        resource = ResourceManager.find_by_id(pk)
+        fields = parse_fields(request.query_params.get('fields', None))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        # Resource, pricing and dependent services come back from one aggregation
+        resource = ResourceManager.find_detail(pk, fields=fields)
         if not resource:
             return Response(status=status.HTTP_404_NOT_FOUND)
         
-        # Get pricing information if available
-        pricing = PricingManager.find_by_resource(resource['_id'])
+        pricing = resource.pop('pricing', None)
         pricing_data = serialize_document(pricing) if pricing else None
-        
-        # Get dependent services
-        dependencies = DependencyManager.find_by_resource(resource['_id'])
-        service_data = []
-        
-        for dep in dependencies:
-            service = ServiceManager.find_by_id(dep['service_id'])
-            if service:
-                service_data.append({
-                    'service_id': str(service['_id']),
-                    'service_name': service['name'],
-                    'quantity_required': dep['quantity_required'],
-                    'is_critical': dep['is_critical'],
-                    'service_criticality': service.get('criticality', 'MEDIUM')
-                })
+        service_data = resource.pop('dependent_services', [])
         
         # Serialize the resource
         data = serialize_document(resource)
         
         # Add utilization percentage
-        data['utilization_pct'] = ResourceManager.utilization_percentage(resource)
+        if wants(fields, 'utilization_pct'):
+            data['utilization_pct'] = ResourceManager.utilization_percentage(resource)
         
         # Add related data
         data['pricing'] = pricing_data
         data['dependent_services'] = service_data
         
-        return Response(data)
+        return Response(sparse(data, fields))
     except Exception as e:
         logger.error(f"Error retrieving resource details: {str(e)}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+def resource_usage(request, pk):
+    """
+    Usage series for a resource, read from the minute/hour/day rollups.
+    
+    Query params: start and end (ISO 8601, default the last 24 hours), max_points and
+    granularity (minute, hour or day; picked from the window when omitted).
+    """
+    try:
+        # Both bounds as naive UTC, like the stored samples
+        end_time = parse_usage_timestamp(request.query_params.get('end', None))
+        start_time = (parse_usage_timestamp(request.query_params['start']) if 'start' in request.query_params
+                      else end_time - timedelta(days=1))
+        max_points = int(request.query_params.get('max_points', UsageHistoryManager.SERIES_MAX_POINTS))
+        granularity = request.query_params.get('granularity', None)
+        if start_time >= end_time or max_points < 1:
+            raise ValueError
+        if granularity is not None and granularity not in UsageHistoryManager.ROLLUP_GRANULARITIES:
+            raise ValueError
+    except (ValueError, OverflowError):
+        return Response({'error': 'start must precede end (ISO 8601), max_points must be a positive integer '
+                                  'and granularity one of minute, hour or day'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        series = UsageHistoryManager.series(pk, start_time, end_time, max_points=max_points, granularity=granularity)
+        if series is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        
+        return Response(series)
+    except Exception as e:
+        logger.error(f"Error retrieving resource usage: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET', 'POST'])
+@csrf_exempt
+def capacity_forecast(request):
+    """
+    Resources forecast to reach total_capacity within horizon_days (default 30), fitted
+    over the last lookback_days of usage rollups. POST also raises CAPACITY alerts for
+    resources within threshold_days.
+    """
+    params = request.query_params if request.method == 'GET' else request.data
+    try:
+        horizon_days = float(params.get('horizon_days', ResourceManager.FORECAST_HORIZON_DAYS))
+        lookback_days = float(params.get('lookback_days', ResourceManager.FORECAST_LOOKBACK_DAYS))
+        threshold_days = params.get('threshold_days', None)
+        threshold_days = float(threshold_days) if threshold_days is not None else None
+        if horizon_days < 0 or lookback_days <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return Response({'error': 'horizon_days, lookback_days and threshold_days must be positive numbers'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        forecasts = ResourceManager.forecast_exhaustion(horizon_days=horizon_days, lookback_days=lookback_days)
+        # Alerts are raised from the forecasts as returned, before anything is serialized
+        alerts_created = AlertManager.raise_capacity_alerts(forecasts, threshold_days) if request.method == 'POST' else None
+        data = {
+            'horizon_days': horizon_days,
+            'resources': [serialize_document(dict(forecast)) for forecast in forecasts]
+        }
+        if alerts_created is not None:
+            data['alerts_created'] = alerts_created
+        
+        return Response(data)
+    except Exception as e:
+        logger.error(f"Error forecasting capacity: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET', 'POST'])
+@csrf_exempt
+def ingest_usage(request):
+    """
+    Batch ingest of usage samples.
+    
+    POST a body of resource_id,utilization,timestamp rows as NDJSON, or as CSV with
+    Content-Type text/csv. Samples are buffered and written in batches; pass ?flush=true
+    to write them before responding. GET reports the buffer state and ingest lag.
+    """
+    try:
+        if request.method == 'POST':
+            try:
+                samples, rejected = parse_usage_samples(request.body, request.content_type)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            usage_ingest_buffer.add(samples)
+            PrometheusMetrics.track_usage_ingest(len(samples), rejected)
+            if request.query_params.get('flush', 'false').lower() == 'true':
+                usage_ingest_buffer.flush()
+            response_status = status.HTTP_202_ACCEPTED
+            data = {'accepted': len(samples), 'rejected': rejected}
+        else:
+            response_status = status.HTTP_200_OK
+            data = {}
+        
+        data['buffered'] = usage_ingest_buffer.pending()
+        data['lag_seconds'] = usage_ingest_buffer.lag()
+        return Response(data, status=response_status)
+    except Exception as e:
+        logger.error(f"Error ingesting usage samples: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['POST'])
 @csrf_exempt
 def import_resources(request):
@@ -146,43 +273,15 @@ def import_resources(request):
         # Read the CSV file
         df = pd.read_csv(file)
         
-        # Process the data
-        resources_created = 0
-        resources_updated = 0
-        
-        for _, row in df.iterrows():
-            resource_name = row['Resource']
-            
-            # Check if resource exists
-            existing_resource = ResourceManager.find_by_name(resource_name)
-            
-            if existing_resource:
-                # Update existing resource
-                ResourceManager.update(
-                    existing_resource['_id'],
-                    resource_id=row.get('Resource_ID', None),
-                    category=row.get('Category', 'OTHER'),
-                    current_utilization=row.get('Utilization', 0),
-                    total_capacity=row.get('Capacity', 0),
-                    unit=row.get('Unit', 'count')
-                )
-                resources_updated += 1
-            else:
-                # Create new resource
-                ResourceManager.create(
-                    name=resource_name,
-                    resource_id=row.get('Resource_ID', None),
-                    category=row.get('Category', 'OTHER'),
-                    current_utilization=row.get('Utilization', 0),
-                    total_capacity=row.get('Capacity', 0),
-                    unit=row.get('Unit', 'count')
-                )
-                resources_created += 1
+        # Validate and upsert the whole file in bulk batches
+        summary = ResourceManager.bulk_import(df)
         
         return Response({
-            'message': f'Import successful. Created {resources_created} new resources and updated {resources_updated} existing resources.',
-            'created': resources_created,
-            'updated': resources_updated
+            'message': f'Import successful. Created {summary["created"]} new resources, updated {summary["updated"]} existing resources and rejected {summary["rejected"]} rows.',
+            'created': summary['created'],
+            'updated': summary['updated'],
+            'rejected': summary['rejected'],
+            'batches': summary['batches']
         })
         
     except Exception as e:
@@ -195,7 +294,13 @@ def process_resource_reports(request):
     Trigger processing of resource utilization reports
     """
     try:
-        result = consolidate_resource_reports()
+        # Incremental ingestion by default; full=true rebuilds from every file
+        full = str(request.data.get('full', 'false')).lower() == 'true'
+        parallel = str(request.data.get('parallel', 'false')).lower() == 'true'
+        if full or parallel:
+            result = consolidate_resource_reports(parallel=parallel)
+        else:
+            result = ingest_resource_reports()
         if result is not None:
             return Response({
                 'message': 'Resource reports processed successfully',
@@ -215,45 +320,39 @@ def process_resource_reports(request):
 @api_view(['GET'])
 def service_list(request):
     """
-    List all services or filter by criticality
+    List services, optionally filtered by criticality, one page at a time
     """
     criticality = request.query_params.get('criticality', None)
     
-    services = ServiceManager.find_all(criticality=criticality)
+    try:
+        limit, cursor, fields = page_params(request.query_params)
+        services, next_cursor = ServiceManager.find_page(criticality=criticality, limit=limit, cursor=cursor,
+                                                         fields=fields)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    data = [serialize_document(service) for service in services]
+    data = [sparse(serialize_document(service), fields) for service in services]
     
-    return Response(data)
+    return paginated_response(request, data, next_cursor)
 
 @api_view(['GET'])
 def service_detail(request, pk):
     """
-    Get detailed information about a specific service
+    Get detailed information about a specific service (fields=a,b for only those fields)
     """
     try:
-        service = ServiceManager.find_by_id(pk)
+        fields = parse_fields(request.query_params.get('fields', None))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        # Service, resource dependencies and active alerts come back from one aggregation
+        service = ServiceManager.find_detail(pk, fields=fields)
         if not service:
             return Response(status=status.HTTP_404_NOT_FOUND)
         
-        # Get resource dependencies
-        dependencies = DependencyManager.find_by_service(service['_id'])
-        resource_data = []
-        
-        for dep in dependencies:
-            resource = ResourceManager.find_by_id(dep['resource_id'])
-            if resource:
-                resource_data.append({
-                    'resource_id': str(resource['_id']),
-                    'resource_name': resource['name'],
-                    'resource_category': resource.get('category', 'OTHER'),
-                    'quantity_required': dep['quantity_required'],
-                    'is_critical': dep['is_critical'],
-                    'utilization': resource.get('current_utilization', 0),
-                    'capacity': resource.get('total_capacity', 0)
-                })
-        
-        # Get active alerts for this service
-        alerts = AlertManager.find_by_service(service['_id'], resolved=False)
+        resource_data = service.pop('resource_dependencies', [])
+        alerts = service.pop('active_alerts', [])
         alert_data = [serialize_document(alert) for alert in alerts]
         
         # Serialize the service
@@ -263,7 +362,7 @@ def service_detail(request, pk):
         data['resource_dependencies'] = resource_data
         data['active_alerts'] = alert_data
         
-        return Response(data)
+        return Response(sparse(data, fields))
     except Exception as e:
         logger.error(f"Error retrieving service details: {str(e)}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -282,64 +381,20 @@ def import_services(request):
         # Read the CSV file
         df = pd.read_csv(file)
         
-        # Process the data
-        services_created = 0
-        services_updated = 0
-        dependencies_created = 0
+        # Upsert services and all dependency edges in bulk
+        summary = ServiceManager.bulk_import(df)
         
-        for _, row in df.iterrows():
-            service_name = row['Service']
-            
-            # Check if service exists
-            existing_service = ServiceManager.find_by_name(service_name)
-            
-            if existing_service:
-                # Update existing service
-                ServiceManager.update(
-                    existing_service['_id'],
-                    criticality=row.get('Criticality', 'MEDIUM'),
-                    status='OPERATIONAL'
-                )
-                service_id = existing_service['_id']
-                services_updated += 1
-            else:
-                # Create new service
-                service_id = ServiceManager.create(
-                    name=service_name,
-                    criticality=row.get('Criticality', 'MEDIUM'),
-                    status='OPERATIONAL'
-                )
-                services_created += 1
-            
-            # Process dependencies
-            for i in range(1, 10, 2):  # Assuming dependency columns are in pairs
-                dep_col = f'Dependency{i}'
-                qty_col = f'Quantity{i}'
-                
-                if dep_col in row and qty_col in row and pd.notna(row[dep_col]):
-                    resource_name = row[dep_col]
-                    quantity = float(row[qty_col]) if pd.notna(row[qty_col]) else 1.0
-                    
-                    # Find resource by name
-                    resource = ResourceManager.find_by_name(resource_name)
-                    
-                    if resource:
-                        # Create dependency
-                        DependencyManager.create(
-                            service_id=service_id,
-                            resource_id=resource['_id'],
-                            quantity_required=quantity,
-                            is_critical=row.get('Criticality', 'MEDIUM') == 'CRITICAL'
-                        )
-                        dependencies_created += 1
-                    else:
-                        logger.warning(f"Resource '{resource_name}' not found for service '{service_name}'")
+        for resource_name in summary['missing_resources']:
+            logger.warning(f"Resource '{resource_name}' not found during service import")
         
         return Response({
-            'message': f'Import successful. Created {services_created} new services, updated {services_updated} existing services, and created {dependencies_created} dependencies.',
-            'services_created': services_created,
-            'services_updated': services_updated,
-            'dependencies_created': dependencies_created
+            'message': f'Import successful. Created {summary["services_created"]} new services, updated {summary["services_updated"]} existing services, and created {summary["dependencies_created"]} dependencies.',
+            'services_created': summary['services_created'],
+            'services_updated': summary['services_updated'],
+            'dependencies_created': summary['dependencies_created'],
+            'dependencies_updated': summary['dependencies_updated'],
+            'rejected': summary['rejected'],
+            'missing_resources': summary['missing_resources']
         })
         
     except Exception as e:
@@ -369,36 +424,73 @@ def analyze_dependencies(request):
             return Response({
                 'message': 'Dependency analysis failed or no data found',
             }, status=status.HTTP_400_BAD_REQUEST)
+    except DependencyCycleError as e:
+        logger.error(f"Error in dependency analysis: {str(e)}")
+        return Response({
+            'error': f'Analysis failed: {str(e)}',
+            'cycle': e.cycle
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error in dependency analysis: {str(e)}")
         return Response({
             'error': f'Analysis failed: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+def update_service_demand(request):
+    """
+    Change the top-level demand for a service and update resource requirements incrementally
+    """
+    service_name = request.data.get('service')
+    quantity = request.data.get('quantity')
+    
+    if not service_name or quantity is None:
+        return Response({'error': 'service and quantity are required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        changes = update_top_level_demand(service_name, float(quantity))
+        if changes is None:
+            return Response({
+                'message': 'No dependency analysis has been run yet, run analyze-dependencies first',
+            }, status=status.HTTP_409_CONFLICT)
+        
+        return Response({
+            'message': 'Resource requirements updated',
+            'requirements_changed': len(changes)
+        })
+    except ValueError:
+        return Response({'error': 'quantity must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    except RequirementsStaleError as e:
+        return Response({'message': f'{str(e)}; run analyze-dependencies'}, status=status.HTTP_409_CONFLICT)
+    except Exception as e:
+        logger.error(f"Error updating service demand: {str(e)}")
+        return Response({
+            'error': f'Update failed: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 # Pricing and cost analysis endpoints
 @api_view(['GET'])
 def pricing_list(request):
     """
-    List pricing information for all resources
+    List pricing information for all resources, one page at a time
     """
     resource_category = request.query_params.get('category', None)
     
-    pricing_data = PricingManager.find_all()
-    data = []
+    try:
+        limit, cursor, fields = page_params(request.query_params)
+        # Join with resources and apply the category filter inside MongoDB
+        pricing_data, next_cursor = PricingManager.find_with_resources(
+            category=resource_category,
+            limit=limit,
+            cursor=cursor,
+            fields=fields
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    for pricing in pricing_data:
-        resource = ResourceManager.find_by_id(pricing['resource_id'])
-        if resource:
-            # Skip if category filter is applied and doesn't match
-            if resource_category and resource.get('category') != resource_category:
-                continue
-                
-            pricing_entry = serialize_document(pricing)
-            pricing_entry['resource_name'] = resource['name']
-            pricing_entry['category'] = resource.get('category', 'OTHER')
-            data.append(pricing_entry)
+    data = [sparse(serialize_document(pricing), fields) for pricing in pricing_data]
     
-    return Response(data)
+    return paginated_response(request, data, next_cursor)
 
 @api_view(['POST'])
 def update_pricing(request):
@@ -520,31 +612,40 @@ def export_metrics(request):
 @api_view(['GET'])
 def alerts_list(request):
     """
-    List all active alerts
+    List active (or, with resolved=true, resolved) alerts, newest first, one page at a time
     """
     severity = request.query_params.get('severity', None)
     resolved = request.query_params.get('resolved', 'false').lower() == 'true'
     
-    alerts = AlertManager.find_all(resolved=resolved, severity=severity)
+    try:
+        limit, cursor, fields = page_params(request.query_params)
+        alerts, next_cursor = AlertManager.find_page(resolved=resolved, severity=severity, limit=limit, cursor=cursor,
+                                                     fields=fields)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    data = []
-    for alert in alerts:
-        alert_dict = serialize_document(alert)
-        
-        # Add resource/service names
-        if alert.get('resource_id'):
-            resource = ResourceManager.find_by_id(alert['resource_id'])
-            if resource:
-                alert_dict['resource_name'] = resource['name']
-        
-        if alert.get('service_id'):
-            service = ServiceManager.find_by_id(alert['service_id'])
-            if service:
-                alert_dict['service_name'] = service['name']
-                
-        data.append(alert_dict)
+    # Resolve resource/service names in bulk
+    if wants(fields, 'resource_name') or wants(fields, 'service_name'):
+        AlertManager.attach_names(alerts)
     
-    return Response(data)
+    data = [sparse(serialize_document(alert), fields) for alert in alerts]
+    
+    return paginated_response(request, data, next_cursor)
+
+@api_view(['POST'])
+def evaluate_alert_rules(request):
+    """
+    Evaluate the alert rules over all resources, opening and resolving alerts.
+    A 'rules' list in the body replaces settings.ALERT_RULES for this run.
+    """
+    try:
+        result = AlertManager.evaluate_rules(request.data.get('rules', None))
+        return Response(result)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error evaluating alert rules: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
 def resolve_alert(request, pk):
@@ -587,19 +688,13 @@ def health_check(request):
     Health check endpoint that checks system health and updates Prometheus metrics
     """
     try:
-        # Check MongoDB connection
-        from pymongo import MongoClient
-        import os
-        
-        client = MongoClient(
-            host=os.environ.get('MONGODB_HOST', 'mongodb'),
-            port=int(os.environ.get('MONGODB_PORT', 27017)),
-            username=os.environ.get('MONGODB_USERNAME'),
-            password=os.environ.get('MONGODB_PASSWORD'),
-            serverSelectionTimeoutMS=1000  # Quick timeout for health check
-        )
-        # Test the connection
-        client.admin.command('ping')
+        # Check MongoDB connection through the shared pool, bounded by a short timeout
+        import pymongo
+        from django.conf import settings
+        from .database import client
+        
+        with pymongo.timeout(getattr(settings, 'HEALTH_CHECK_TIMEOUT', 1)):
+            client.admin.command('ping')
         
         # Update MongoDB status to healthy
         PrometheusMetrics.update_mongodb_status(status=True)
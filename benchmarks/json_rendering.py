@@ -0,0 +1,103 @@
+"""
+Time to turn a page of MongoDB documents into a JSON response body: the previous
+serialize_document (which converted every ObjectId/datetime value in Python) followed
+by DRF's JSONRenderer, compared with the current serialize_document and MongoJSONRenderer.
+
+Runs without MongoDB on generated resource-like documents:
+
+    python benchmarks/json_rendering.py [documents]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+from django.conf import settings
+
+settings.configure(DEBUG=False)
+django.setup()
+
+import orjson
+from bson import ObjectId
+from rest_framework.renderers import JSONRenderer
+
+from banking_operations_monitor.renderers import MongoJSONRenderer
+from banking_operations_monitor.views import serialize_document
+
+
+def legacy_serialize_document(doc):
+    """serialize_document as it was: every top-level value type-checked and converted"""
+    if doc is None:
+        return None
+
+    if '_id' in doc:
+        doc['id'] = str(doc['_id'])
+        del doc['_id']
+
+    for key, value in doc.items():
+        if isinstance(value, datetime):
+            doc[key] = value.isoformat()
+        elif isinstance(value, ObjectId):
+            doc[key] = str(value)
+
+    return doc
+
+
+def documents(count):
+    now = datetime(2025, 3, 1, 12, 0, 0, 123000)
+    categories = ['COMPUTE', 'STORAGE', 'NETWORK', 'LICENSE', 'SERVICE', 'OTHER']
+    return [
+        {
+            '_id': ObjectId(),
+            'name': f'resource-{i:06d}',
+            'category': categories[i % len(categories)],
+            'resource_id': f'RES-{i:06d}',
+            'location': 'eu-west-1',
+            'description': 'Core banking capacity unit',
+            'total_capacity': 1000.0,
+            'current_utilization': float(i % 1000),
+            'unit_of_measure': 'vCPU',
+            'owner_id': ObjectId(),
+            'utilization_sampled_at': now - timedelta(seconds=i),
+            'created_at': now - timedelta(days=30),
+            'updated_at': now,
+        }
+        for i in range(count)
+    ]
+
+
+def run(serialize, renderer, pages, accepted_media_type='application/json'):
+    # Best of several runs over fresh copies, since serialize_document mutates documents
+    timings = []
+    for page in pages:
+        start = time.perf_counter()
+        body = renderer.render([serialize(doc) for doc in page], accepted_media_type, {})
+        timings.append(time.perf_counter() - start)
+    return min(timings), body
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = 5
+    source = documents(count)
+
+    def pages():
+        return [[dict(doc) for doc in source] for _ in range(repeat)]
+
+    legacy, legacy_body = run(legacy_serialize_document, JSONRenderer(), pages())
+    current, current_body = run(serialize_document, MongoJSONRenderer(), pages())
+
+    # Both paths must produce the same JSON values
+    assert orjson.loads(legacy_body) == orjson.loads(current_body)
+
+    print(f"{count} documents per response")
+    print(f"  serialize_document + JSONRenderer:      {legacy * 1e3:8.2f} ms, {len(legacy_body)} bytes")
+    print(f"  serialize_document + MongoJSONRenderer: {current * 1e3:8.2f} ms, {len(current_body)} bytes")
+    print(f"  speedup: {legacy / current:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
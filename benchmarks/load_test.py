@@ -0,0 +1,80 @@
+"""
+Closed-loop HTTP load test for a running server: each of `concurrency` clients sends
+its next GET as soon as the previous one returns, for `duration` seconds, cycling
+through the given paths. Reports throughput and latency percentiles.
+
+Compare the sync and async request paths on the same MongoDB data, one process each:
+
+    python manage.py runserver --noreload 8000
+    ASYNC_API_VIEWS=true uvicorn banking_operations_monitor.asgi:application --port 8001 --workers 1
+
+    PATHS="/api/v1/alerts/ /api/v1/pricing/ /api/v1/resources/<resource id>/ /api/v1/services/<service id>/"
+    python benchmarks/load_test.py http://127.0.0.1:8000 $PATHS -c 64 -d 30
+    python benchmarks/load_test.py http://127.0.0.1:8001 $PATHS -c 64 -d 30
+
+The detail paths take ObjectIds of documents in the database under test. Results from a
+run against a simulated MongoDB are in the README.
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def client(host, port, paths, deadline, results, offset):
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    latencies, errors, i = [], 0, offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+    connection.close()
+    results.append((latencies, errors))
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('base_url')
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('-c', '--concurrency', type=int, default=32)
+    parser.add_argument('-d', '--duration', type=float, default=20)
+    args = parser.parse_args()
+
+    url = urlsplit(args.base_url)
+    results = []
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=client, args=(url.hostname, url.port or 80, args.paths, deadline, results, i))
+        for i in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    errors = sum(client_errors for _, client_errors in results)
+    print(f"{args.base_url} with {args.concurrency} concurrent clients for {args.duration:g}s")
+    print(f"  requests: {len(latencies)} ({len(latencies) / args.duration:.1f}/s), errors: {errors}")
+    print(f"  latency p50 {percentile(latencies, 0.5) * 1e3:.1f} ms, p95 {percentile(latencies, 0.95) * 1e3:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1e3:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Connection pool checkout metrics from PoolMetricsListener under contention.
+
+Runs without MongoDB: a stub server speaks just enough of the wire protocol (hello and
+any other command, answered with ok: 1 after a fixed delay) for the driver's real
+connection pool to run. More threads than pool connections send commands, so
+checkouts wait, and a second phase with a short wait queue timeout makes some fail:
+
+    python benchmarks/pool_metrics.py [threads] [pool size] [command delay ms]
+"""
+import os
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+
+OP_REPLY, OP_QUERY, OP_MSG = 1, 2004, 2013
+COMMAND_DELAY = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.005
+HELLO = {
+    'ismaster': True, 'isWritablePrimary': True, 'helloOk': True,
+    'minWireVersion': 0, 'maxWireVersion': 21, 'maxBsonObjectSize': 16 * 1024 * 1024,
+    'maxMessageSizeBytes': 48000000, 'maxWriteBatchSize': 100000, 'ok': 1.0,
+}
+
+
+class StubMongoHandler(socketserver.BaseRequestHandler):
+    """Answers OP_QUERY and OP_MSG commands on one connection"""
+
+    def read(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('closed')
+            data += chunk
+        return data
+
+    def handle(self):
+        try:
+            while True:
+                length, request_id, _, opcode = struct.unpack('<iiii', self.read(16))
+                body = self.read(length - 16)
+                if opcode == OP_QUERY:
+                    # flags, collection name, skip, limit, then the command document
+                    name_end = body.index(b'\0', 4)
+                    command = bson.decode(body[name_end + 9:])
+                    self.reply(request_id, OP_REPLY, struct.pack('<iqii', 0, 0, 0, 1), command)
+                else:
+                    # flags, then a kind 0 section holding the command document
+                    command = bson.decode(body[5:5 + struct.unpack('<i', body[5:9])[0]])
+                    self.reply(request_id, OP_MSG, struct.pack('<IB', 0, 0), command)
+        except ConnectionError:
+            pass
+
+    def reply(self, request_id, opcode, prefix, command):
+        name = next(iter(command)).lower()
+        if name in ('hello', 'ismaster'):
+            document = HELLO
+        else:
+            time.sleep(COMMAND_DELAY)
+            document = {'ok': 1.0}
+        payload = prefix + bson.encode(document)
+        self.request.sendall(struct.pack('<iiii', 16 + len(payload), 0, request_id, opcode) + payload)
+
+
+class StubMongoServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+server = StubMongoServer(('127.0.0.1', 0), StubMongoHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+import django
+from django.conf import settings
+
+settings.configure(
+    MONGODB_HOST='127.0.0.1',
+    MONGODB_PORT=server.server_address[1],
+    MONGODB_MAX_POOL_SIZE=int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+)
+django.setup()
+
+from prometheus_client import REGISTRY
+
+from banking_operations_monitor.database import create_client
+
+
+def sample(name, labels=None):
+    return REGISTRY.get_sample_value(name, labels or {}) or 0
+
+
+def run(client, threads, commands):
+    """Send `commands` pings from each of `threads` threads; returns (elapsed, errors, peak waiting)"""
+    errors = []
+    peak = [0]
+
+    def worker():
+        for _ in range(commands):
+            try:
+                client.admin.command('ping')
+            except Exception as e:
+                errors.append(type(e).__name__)
+
+    def watch():
+        while any(thread.is_alive() for thread in workers):
+            peak[0] = max(peak[0], sample('app_mongodb_pool_checkouts_waiting'))
+            time.sleep(0.001)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    watch()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, errors, peak[0]
+
+
+def report(title, elapsed, errors, peak, before):
+    count = sample('app_mongodb_pool_checkout_seconds_count') - before[0]
+    total = sample('app_mongodb_pool_checkout_seconds_sum') - before[1]
+    failed = sample('app_mongodb_pool_checkout_failures_total', {'reason': 'timeout'}) - before[2]
+    print(f"{title}")
+    print(f"  {count:.0f} checkouts in {elapsed:.2f}s, mean wait {total / max(count, 1) * 1000:.2f} ms")
+    # Little's law: the wait recorded per checkout times the checkout rate
+    print(f"  mean waiting implied by the histogram {total / elapsed:.1f}")
+    print(f"  {failed:.0f} timed out ({len(errors)} errors raised), peak waiting {peak:.0f}, "
+          f"waiting after {sample('app_mongodb_pool_checkouts_waiting'):.0f}")
+
+
+def snapshot():
+    return (sample('app_mongodb_pool_checkout_seconds_count'), sample('app_mongodb_pool_checkout_seconds_sum'),
+            sample('app_mongodb_pool_checkout_failures_total', {'reason': 'timeout'}))
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    commands = 50
+    print(f"{threads} threads, pool of {settings.MONGODB_MAX_POOL_SIZE}, {COMMAND_DELAY * 1000:.1f} ms per command")
+
+    client = create_client(serverSelectionTimeoutMS=5000)
+    client.admin.command('ping')
+    before = snapshot()
+    elapsed, errors, peak = run(client, threads, commands)
+    report('no wait queue timeout', elapsed, errors, peak, before)
+    client.close()
+
+    client = create_client(serverSelectionTimeoutMS=5000, waitQueueTimeoutMS=max(1, int(COMMAND_DELAY * 1000)))
+    client.admin.command('ping')
+    before = snapshot()
+    elapsed, errors, peak = run(client, threads, commands)
+    report(f'wait queue timeout {max(1, int(COMMAND_DELAY * 1000))} ms', elapsed, errors, peak, before)
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
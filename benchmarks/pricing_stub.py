@@ -0,0 +1,149 @@
+"""
+fetch_pricing_concurrently against a local stub of the vendor pricing API.
+
+The stub answers GET {datacenter}/{resource_id} with a fixed pricing document after a
+configurable delay, and records when each request arrived and how many were in flight.
+Three runs check the fetcher's limits:
+
+- rate limit: request rate after the initial burst, against rate_limit
+- in-flight cap: peak concurrent requests at the stub, against max_in_flight
+- timeout: requests the stub answers too slowly come back as empty pricing
+
+    python benchmarks/pricing_stub.py [items]
+
+To point the application itself at the stub, run it on its own and set
+PRICING_API_URL=http://127.0.0.1:<port>:
+
+    python benchmarks/pricing_stub.py serve [port] [delay ms]
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PRICING = {'results': [{'standard': {
+    'listPrice': 120.0, 'ourPrice': 100.0, 'recentPurchase': 98.0,
+    'recentQuote': 101.0, 'marketAverage': 110.0, 'monthlyUsage': 42,
+}}]}
+
+
+class StubPricingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, delay=0.0, slow_delay=1.0):
+        super().__init__(address, StubPricingHandler)
+        self.delay = delay
+        self.slow_delay = slow_delay
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.arrivals = []
+            self.in_flight = 0
+            self.peak_in_flight = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubPricingHandler(BaseHTTPRequestHandler):
+    """Answers every GET with PRICING; resource ids starting with 'slow' take slow_delay"""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; keep Nagle from delaying the body
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.arrivals.append(time.monotonic())
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        try:
+            slow = self.path.rsplit('/', 1)[-1].startswith('slow')
+            time.sleep(server.slow_delay if slow else server.delay)
+            body = json.dumps(PRICING).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting
+            pass
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, delay):
+    server = StubPricingServer(('127.0.0.1', port), delay=delay)
+    print(f"Stub pricing API on {server.url}, {delay * 1000:.0f} ms per request")
+    server.serve_forever()
+
+
+def fetch(server, item_ids, **options):
+    """Fetch item_ids through fetch_pricing_concurrently; returns (elapsed, results)"""
+    from banking_operations_monitor.services import fetch_pricing_concurrently
+
+    server.reset()
+    started = time.monotonic()
+    results = dict(fetch_pricing_concurrently(
+        [(item_id, item_id) for item_id in item_ids], 'PRIMARY', ['negotiated_price'],
+        base_url=server.url, **options
+    ))
+    return time.monotonic() - started, results
+
+
+def main():
+    import django
+    from django.conf import settings
+
+    settings.configure(LOGGING_CONFIG=None)
+    django.setup()
+
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    server = StubPricingServer(('127.0.0.1', 0), delay=0.01, slow_delay=1.0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    rate, burst = 20, 5
+    elapsed, results = fetch(server, [f"r{i}" for i in range(items)],
+                             rate_limit=rate, burst=burst, max_in_flight=16)
+    arrivals = server.arrivals
+    steady = (len(arrivals) - burst - 1) / (arrivals[-1] - arrivals[burst])
+    print(f"rate limit {rate}/s, burst {burst}, 16 in flight, 10 ms per request")
+    print(f"  {len(results)} items in {elapsed:.2f}s, {steady:.1f} requests/s after the burst")
+
+    server.delay = 0.1
+    cap = 4
+    elapsed, results = fetch(server, [f"r{i}" for i in range(items // 2)], rate_limit=0, max_in_flight=cap)
+    print(f"no rate limit, {cap} in flight, 100 ms per request")
+    print(f"  {len(results)} items in {elapsed:.2f}s, peak {server.peak_in_flight} in flight at the stub, "
+          f"at least {math.ceil((items // 2) / cap) * 0.1:.2f}s with the cap")
+
+    timeout = 0.2
+    item_ids = [f"slow{i}" if i % 4 == 0 else f"r{i}" for i in range(20)]
+    elapsed, results = fetch(server, item_ids, rate_limit=0, max_in_flight=20, timeout=timeout)
+    empty = [item_id for item_id, pricing in results.items() if pricing['negotiated_price'] is None]
+    slow = [item_id for item_id in item_ids if item_id.startswith('slow')]
+    print(f"timeout {timeout}s, stub takes 1s for {len(slow)} of {len(item_ids)} items")
+    print(f"  {len(results)} items in {elapsed:.2f}s, {len(empty)} empty, "
+          f"all empty ones slow: {sorted(empty) == sorted(slow)}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve(int(sys.argv[2]) if len(sys.argv) > 2 else 8089,
+              float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.05)
+    else:
+        main()
@@ -0,0 +1,116 @@
+"""
+Per-request overhead of PrometheusMiddleware compared with the previous raw-path,
+time.time() instrumentation, and the number of latency series each one creates.
+
+Runs without MongoDB against a stand-in URLconf that mirrors the detail routes:
+
+    python benchmarks/request_metrics.py [requests] [distinct ids]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+from django.conf import settings
+
+settings.configure(
+    DEBUG=False,
+    ALLOWED_HOSTS=['*'],
+    ROOT_URLCONF=__name__,
+    PROMETHEUS_SKIP_PATHS=['/metrics/', '/health/'],
+)
+django.setup()
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import path, resolve
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+from banking_operations_monitor.metrics import PrometheusMetrics
+from banking_operations_monitor.middleware import PrometheusMiddleware
+
+
+def view(request, pk=None):
+    return HttpResponse('OK')
+
+
+urlpatterns = [
+    path('api/v1/resources/<int:pk>/', view, name='resource-detail'),
+    path('api/v1/services/<int:pk>/', view, name='service-detail'),
+    path('health/', view, name='health-check'),
+]
+
+
+class LegacyPrometheusMiddleware:
+    """The middleware as it was: raw request.path labels and time.time()"""
+
+    registry = CollectorRegistry()
+    REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP requests count',
+                            ['method', 'endpoint', 'status_code'], registry=registry)
+    REQUEST_LATENCY = Histogram('http_request_latency_seconds', 'HTTP request latency in seconds',
+                                ['method', 'endpoint'], registry=registry)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start_time = time.time()
+        response = self.get_response(request)
+        self.REQUEST_COUNT.labels(method=request.method, endpoint=request.path,
+                                  status_code=response.status_code).inc()
+        self.REQUEST_LATENCY.labels(method=request.method, endpoint=request.path).observe(time.time() - start_time)
+        return response
+
+
+def handler(request):
+    # Django's handler resolves the URL before calling the view
+    request.resolver_match = resolve(request.path)
+    return request.resolver_match.func(request, *request.resolver_match.args, **request.resolver_match.kwargs)
+
+
+def run(middleware, requests, repeat=3):
+    # Best of several runs, to keep scheduler noise out of the comparison
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for request in requests:
+            middleware(request)
+        timings.append((time.perf_counter() - start) / len(requests))
+    return min(timings)
+
+
+def series(histogram):
+    return len({sample.labels['endpoint'] for metric in histogram.collect() for sample in metric.samples})
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    factory = RequestFactory()
+    requests = [
+        factory.get(f"/api/v1/{'resources' if i % 2 else 'services'}/{i % distinct}/")
+        for i in range(total)
+    ]
+    health = [factory.get('/health/') for _ in range(total)]
+
+    # Warm up each path once so first-call costs are excluded
+    for middleware in (handler, LegacyPrometheusMiddleware(handler), PrometheusMiddleware(handler)):
+        run(middleware, requests[:1000], repeat=1)
+
+    baseline = run(handler, requests)
+    legacy = run(LegacyPrometheusMiddleware(handler), requests)
+    current = run(PrometheusMiddleware(handler), requests)
+    skipped = run(PrometheusMiddleware(handler), health) - run(handler, health)
+
+    print(f"{total} requests over {distinct} distinct ids")
+    print(f"  legacy middleware:  {(legacy - baseline) * 1e6:7.2f} us/request, "
+          f"{series(LegacyPrometheusMiddleware.REQUEST_LATENCY)} latency series")
+    print(f"  current middleware: {(current - baseline) * 1e6:7.2f} us/request, "
+          f"{series(PrometheusMetrics.REQUEST_LATENCY)} latency series")
+    print(f"  skipped path:       {skipped * 1e6:7.2f} us/request")
+
+
+if __name__ == '__main__':
+    main()